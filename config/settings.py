@@ -80,10 +80,14 @@ SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 
 #cache configuration
+# Shared by every gunicorn worker and the worker/mailer processes, so a
+# version bump or delete in one process is seen by all of them
+# (create the table with `python manage.py createcachetable`)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-session-cache',
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cshaw_cache',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
     }
 }
 
@@ -230,6 +234,14 @@ FROM_EMAIL_ADDRESS = 'info@cshaw.co.za'
 DEFAULT_FROM_EMAIL = f"C-SHAW Hub <{FROM_EMAIL_ADDRESS}>"
 SERVER_EMAIL = DEFAULT_FROM_EMAIL
 
+# Email students when they reach a new hours milestone badge
+MILESTONE_EMAILS_ENABLED = config('MILESTONE_EMAILS_ENABLED', default=False, cast=bool)
+
+# Announce new events in a periodic digest (send_event_digest) instead of one email per event
+EVENT_DIGEST_ENABLED = config('EVENT_DIGEST_ENABLED', default=False, cast=bool)
+# A digest goes out once its oldest event has waited this long
+EVENT_DIGEST_WINDOW_HOURS = config('EVENT_DIGEST_WINDOW_HOURS', default=24, cast=int)
+
 # Security settings
 RECAPTCHA_SITE_KEY = config('RECAPTCHA_SITE_KEY')
 RECAPTCHA_SECRET_KEY = config('RECAPTCHA_SECRET_KEY')
@@ -3088,7 +3088,7 @@ function renderExecutiveAttendancePage() {
                         </div>
                         
                         <div style="display:flex; gap:10px;">
-                            <button onclick="window.location.href='/api/reports/event/${eventId}/download/'" 
+                            <button onclick="downloadReport('/api/reports/event/${eventId}/download/', this)" 
                                 style="background:#fff; border:1px solid #2c3e50; color:#2c3e50; padding:8px 12px; border-radius:4px; cursor:pointer; font-weight:600; display:flex; align-items:center; gap:5px;">
                                 Download PDF ⬇️
                             </button>
@@ -3186,6 +3186,54 @@ function renderExecutiveAttendancePage() {
         }
     }
 
+    // Downloads a report PDF. Stored reports come straight back; reports that
+    // need (re)rendering return 202 with a job we poll until the PDF is ready.
+    async function downloadReport(url, button) {
+        const originalLabel = button ? button.innerHTML : null;
+        if (button) {
+            button.disabled = true;
+            button.innerHTML = "Preparing PDF...";
+        }
+
+        try {
+            const response = await fetch(url);
+
+            if (response.status === 202) {
+                let job = await response.json();
+                while (job.status === 'PENDING' || job.status === 'RUNNING') {
+                    await new Promise(resolve => setTimeout(resolve, 2000));
+                    const poll = await fetch(job.status_url || `/api/reports/jobs/${job.job_id}/`);
+                    job = await poll.json();
+                }
+                if (job.status !== 'DONE') throw new Error(job.error || "PDF Generation Error");
+                window.location.href = job.download_url;
+            } else if (response.ok) {
+                const blob = await response.blob();
+                const disposition = response.headers.get('Content-Disposition') || '';
+                const match = disposition.match(/filename="(.+)"/);
+                const link = document.createElement('a');
+                link.href = URL.createObjectURL(blob);
+                link.download = match ? match[1] : 'report.pdf';
+                document.body.appendChild(link);
+                link.click();
+                link.remove();
+                URL.revokeObjectURL(link.href);
+            } else {
+                const data = await response.json();
+                throw new Error(data.error || "Failed to download report");
+            }
+        } catch (err) {
+            console.error(err);
+            alert("Error: " + err.message);
+        } finally {
+            if (button) {
+                button.disabled = false;
+                button.innerHTML = originalLabel;
+            }
+        }
+    }
+    window.downloadReport = downloadReport;
+
     let currentShareId = null; // Renamed from currentShareEventId to be generic
     let shareType = 'EVENT';   // New variable to track what we are sharing
 
@@ -3404,7 +3452,7 @@ function renderExecutiveAttendancePage() {
                      <h3 style="margin:0;">Yearly Overview: ${year}</h3>
                      
                      <div style="display:flex; gap:10px;">
-                         <button onclick="window.location.href='/api/reports/quarterly/download/?year=${year}'" 
+                         <button onclick="downloadReport('/api/reports/quarterly/download/?year=${year}', this)" 
                             style="background:#fff; border:1px solid #2c3e50; color:#2c3e50; padding:8px 12px; border-radius:4px; cursor:pointer; font-weight:600; display:flex; align-items:center; gap:5px;">
                             Download Report ⬇️
                          </button>
@@ -1,10 +1,13 @@
 from django.contrib import admin
 
-from core.models import VolunteerActivity, ActivityRole, ActivitySignup, Feedback
+from core.models import VolunteerActivity, ActivityRole, ActivitySignup, Feedback, PowerScoreWeights, WaitlistEntry
+from core.ledger import hours_changed
+from core.utils import bump_cache_version
 
 from django import forms
 from django.contrib.admin import widgets
 from django.utils import timezone
+from django.db import transaction
 from datetime import timedelta
 
 class VolunteerActivityAdminForm(forms.ModelForm):
@@ -64,5 +67,79 @@ class VolunteerActivityAdmin(admin.ModelAdmin):
             return obj.date_time + timedelta(hours=float(obj.duration_hours))
         return None
     get_end_time.short_description = 'End Time'
-admin.site.register(ActivitySignup)
+
+    # The event date decides the ledger year of signups without a sign-out,
+    # punctuality and the quarterly rollups, so moving an event touches attendees
+    def save_model(self, request, obj, form, change):
+        old_date = VolunteerActivity.objects.filter(pk=obj.pk).values_list('date_time', flat=True).first() if change else None
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            if old_date and old_date != obj.date_time:
+                user_ids = list(obj.signups.filter(attended=True).values_list('user_id', flat=True))
+                hours_changed(user_ids, since=[old_date, obj.date_time])
+
+    # Deleting events cascades to their signups, which changes attendees' hours
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            user_ids = list(obj.signups.filter(attended=True).values_list('user_id', flat=True))
+            super().delete_model(request, obj)
+            hours_changed(user_ids, since=obj.date_time)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            user_ids = list(ActivitySignup.objects.filter(activity__in=queryset, attended=True).values_list('user_id', flat=True))
+            dates = list(queryset.values_list('date_time', flat=True))
+            super().delete_queryset(request, queryset)
+            hours_changed(user_ids, since=dates)
+
+@admin.register(ActivitySignup)
+class ActivitySignupAdmin(admin.ModelAdmin):
+    list_display = ('user', 'activity', 'attended', 'hours_earned')
+    list_filter = ('attended',)
+    search_fields = ('user__email', 'user__first_name', 'user__last_name', 'activity__title')
+
+    # Hand edits to attendance must keep the hours ledger in sync
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            user_ids = [obj.user_id]
+            dates = [obj.activity.date_time]
+            # Moving a signup to another activity also touches the old activity's date
+            if change and 'activity' in form.changed_data:
+                dates += VolunteerActivity.objects.filter(pk=form.initial.get('activity')).values_list('date_time', flat=True)
+            # Reassigning it to another student takes the hours away from the old one
+            if change and 'user' in form.changed_data and form.initial.get('user'):
+                user_ids.append(form.initial['user'])
+            hours_changed(user_ids, since=dates)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            hours_changed([obj.user_id], since=obj.activity.date_time)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            user_ids = list(queryset.values_list('user_id', flat=True))
+            dates = list(queryset.values_list('activity__date_time', flat=True).distinct())
+            super().delete_queryset(request, queryset)
+            hours_changed(user_ids, since=dates)
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'activity', 'created_at')
+    search_fields = ('user__email', 'activity__title')
+
+@admin.register(PowerScoreWeights)
+class PowerScoreWeightsAdmin(admin.ModelAdmin):
+    list_display = ('hours_weight', 'events_weight', 'points_weight', 'punctuality_weight', 'updated_at')
+
+    # The live awards screen caches its scores, so drop them when the weights change
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        transaction.on_commit(lambda: bump_cache_version('live-awards'))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        transaction.on_commit(lambda: bump_cache_version('live-awards'))
+
 admin.site.register(Feedback)
@@ -0,0 +1,292 @@
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .ledger import hours_changed
+from .models import ActivitySignup, AttendanceSyncAction
+
+# Rows per UPDATE ... CASE statement written by bulk_update
+ATTENDANCE_UPDATE_BATCH_SIZE = 500
+
+SIGN_IN_FIELDS = ['sign_in_time', 'sign_in_facilitator']
+SIGN_OUT_FIELDS = ['sign_out_time', 'session_history', 'hours_earned', 'sign_out_facilitator', 'attended']
+
+SYNC_ACTIONS = ('signin', 'signout', 'resignin')
+# Most actions one sync request may carry
+SYNC_MAX_ACTIONS = 500
+# Scanner clocks may run a little fast; times this far ahead of the server are still accepted
+SYNC_CLOCK_SKEW = timedelta(minutes=5)
+
+
+def event_window(activity):
+    """(start, end) of the activity in local time."""
+    start = timezone.localtime(activity.date_time)
+    return start, start + timedelta(hours=float(activity.duration_hours or 0))
+
+
+def parse_action_time(activity, manual_time=None):
+    """
+    The time an attendance action is logged at: now, or "HH:MM" on the
+    event's date. Raises ValueError with a user-facing message.
+    """
+    now = timezone.localtime(timezone.now())
+    if not manual_time:
+        return now
+    start, _ = event_window(activity)
+    try:
+        hour, minute = map(int, manual_time.split(':'))
+        action_time = start.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    except ValueError:
+        raise ValueError("Invalid time format.")
+    if action_time > now:
+        raise ValueError(f"Cannot log future time. The current time is {now.strftime('%H:%M')}.")
+    return action_time
+
+
+def close_session(signup, sign_out_time, event_start):
+    """
+    Signs the student out of their current session: records the session
+    chunk and adds its hours (bounded by the event start) to their total.
+    Only changes the instance; returns the session's hours.
+    """
+    signup.sign_out_time = sign_out_time
+    effective_sign_in = max(signup.sign_in_time, event_start)
+    actual_hours = max(0.0, (sign_out_time - effective_sign_in).total_seconds() / 3600)
+
+    if not isinstance(signup.session_history, list):
+        signup.session_history = []
+    signup.session_history.append({
+        "in": effective_sign_in.isoformat(),
+        "out": sign_out_time.isoformat(),
+        "hours": round(actual_hours, 2)
+    })
+    signup.hours_earned = round(float(signup.hours_earned) + actual_hours, 2)
+    signup.attended = True
+    return actual_hours
+
+
+def _result(signup, status, **extra):
+    user = signup.user
+    return {
+        'signup_id': signup.id,
+        'user_id': user.id,
+        'name': f"{user.first_name} {user.last_name}".strip() or user.email,
+        'student_number': user.student_number,
+        'status': status,
+        **extra,
+    }
+
+
+def bulk_sign_out(activity, facilitator, sign_out_time=None):
+    """
+    Signs out every student still signed in to `activity` at
+    `sign_out_time` (default: the official end time). Hours are worked out
+    in one pass and written with a single bulk_update of the attendance
+    columns. Returns one result per student.
+    """
+    start, end = event_window(activity)
+    sign_out_time = sign_out_time or end
+
+    with transaction.atomic():
+        signups = list(
+            ActivitySignup.objects.select_for_update(of=('self',)).select_related('user').filter(
+                activity=activity, sign_in_time__isnull=False, sign_out_time__isnull=True
+            )
+        )
+        results = []
+        for signup in signups:
+            hours = close_session(signup, sign_out_time, start)
+            signup.sign_out_facilitator = facilitator
+            results.append(_result(signup, 'signed_out', hours=round(hours, 2), total_hours=signup.hours_earned))
+
+        ActivitySignup.objects.bulk_update(signups, SIGN_OUT_FIELDS, batch_size=ATTENDANCE_UPDATE_BATCH_SIZE)
+        if signups:
+            hours_changed([s.user_id for s in signups], since=activity.date_time)
+
+    return results
+
+
+def bulk_sign_in(activity, facilitator, signup_ids, sign_in_time):
+    """
+    Signs in a queue of walk-up students at `sign_in_time`, which the
+    caller has already checked against the event window. Signups that are
+    unknown, already signed in, or the facilitator's own are skipped with
+    a reason. Returns one result per requested signup.
+    """
+    with transaction.atomic():
+        signups = {
+            s.id: s for s in ActivitySignup.objects.select_for_update(of=('self',)).select_related('user').filter(
+                activity=activity, id__in=signup_ids
+            )
+        }
+        results, signed_in = [], []
+        for signup_id in dict.fromkeys(signup_ids):
+            signup = signups.get(signup_id)
+            if signup is None:
+                results.append({'signup_id': signup_id, 'status': 'skipped', 'error': "Signup not found for this event."})
+            elif signup.user_id == facilitator.id:
+                results.append(_result(signup, 'skipped', error="You cannot sign yourself in."))
+            elif signup.sign_in_time:
+                results.append(_result(signup, 'skipped', error="Student already signed in."))
+            else:
+                signup.sign_in_time = sign_in_time
+                signup.sign_in_facilitator = facilitator
+                signed_in.append(signup)
+                results.append(_result(signup, 'signed_in', time=sign_in_time))
+
+        ActivitySignup.objects.bulk_update(signed_in, SIGN_IN_FIELDS, batch_size=ATTENDANCE_UPDATE_BATCH_SIZE)
+
+    return results
+
+
+def _parse_sync_item(item):
+    """(action_id, signup_id, action, time) from one uploaded action. Raises ValueError."""
+    if not isinstance(item, dict):
+        raise ValueError("Each action must be an object.")
+    try:
+        action_id = uuid.UUID(str(item.get('action_id')))
+    except ValueError:
+        raise ValueError("Missing or invalid action_id.")
+    try:
+        signup_id = int(item.get('signup_id'))
+    except (TypeError, ValueError):
+        raise ValueError("Missing or invalid signup_id.")
+    action = item.get('action')
+    if action not in SYNC_ACTIONS:
+        raise ValueError(f"Invalid action. Use one of: {', '.join(SYNC_ACTIONS)}.")
+    try:
+        action_time = parse_datetime(str(item.get('time')))
+    except ValueError:
+        action_time = None
+    if action_time is None:
+        raise ValueError("Missing or invalid time.")
+    if timezone.is_naive(action_time):
+        action_time = timezone.make_aware(action_time)
+    return action_id, signup_id, action, timezone.localtime(action_time)
+
+
+def apply_attendance_action(signup, action, action_time, event_start, event_end, facilitator):
+    """
+    Applies one action ('signin', 'signout' or 'resignin') to the signup
+    instance with the same rules as a live sign-in/out. Raises ValueError
+    when it can't be applied; returns extra result fields otherwise.
+    """
+    if signup.user_id == facilitator.id:
+        raise ValueError("Accountability Lock 🔒: You cannot sign yourself in or out.")
+
+    if action == 'signin':
+        if signup.sign_in_time:
+            raise ValueError("Student already signed in.")
+        if action_time.date() != event_start.date():
+            raise ValueError(f"Date mismatch. Event is on {event_start.strftime('%d %B')}.")
+        if action_time < event_start:
+            raise ValueError(f"Cannot sign in before event starts at {event_start.strftime('%H:%M')}.")
+        if action_time > event_end:
+            raise ValueError(f"Cannot sign in after event ended at {event_end.strftime('%H:%M')}.")
+        signup.sign_in_time = action_time
+        signup.sign_in_facilitator = facilitator
+        return {'time': action_time.isoformat()}
+
+    if action == 'signout':
+        if not signup.sign_in_time:
+            raise ValueError("Cannot sign out. Student never signed in.")
+        if signup.sign_out_time:
+            raise ValueError("Student already signed out.")
+        # Late sign-outs snap back to the event end time
+        action_time = min(action_time, event_end)
+        if action_time <= signup.sign_in_time:
+            raise ValueError("Sign-out time cannot be before or equal to Sign-in time.")
+        close_session(signup, action_time, event_start)
+        signup.sign_out_facilitator = facilitator
+        return {'time': action_time.isoformat(), 'hours': float(signup.hours_earned)}
+
+    # resignin
+    if not signup.sign_out_time:
+        raise ValueError("Student must be signed out first before re-signing in.")
+    if action_time < event_start or action_time > event_end:
+        raise ValueError("Cannot re-sign in outside of official event hours.")
+    if action_time <= signup.sign_out_time:
+        raise ValueError("Re-sign in time must be after their last sign-out time.")
+    signup.sign_in_time = action_time
+    signup.sign_out_time = None
+    return {'time': action_time.isoformat()}
+
+
+def sync_attendance(activity, facilitator, items):
+    """
+    Applies a batch of attendance actions recorded offline by a scanner.
+    Each item is {"action_id": uuid, "signup_id", "action", "time": ISO}.
+
+    The activity's signups are fetched and locked once, actions are applied
+    in the order they were recorded, and everything is written in one
+    transaction. Action ids that were already applied return their stored
+    result (marked `duplicate`) without being applied again. They are read
+    after the lock, so a retry racing the original upload waits for it and
+    then sees its results. Returns one result per item, in request order.
+    """
+    results = [None] * len(items)
+    parsed = []
+    for index, item in enumerate(items):
+        try:
+            parsed.append((index, *_parse_sync_item(item)))
+        except ValueError as e:
+            action_id = item.get('action_id') if isinstance(item, dict) else None
+            results[index] = {'action_id': action_id, 'status': 'rejected', 'error': str(e)}
+
+    event_start, event_end = event_window(activity)
+    latest_allowed = timezone.now() + SYNC_CLOCK_SKEW
+
+    with transaction.atomic():
+        signups = {
+            s.id: s for s in ActivitySignup.objects.select_for_update(of=('self',)).select_related('user').filter(
+                activity=activity, id__in={p[2] for p in parsed}
+            )
+        }
+        stored = {
+            a.action_id: a.result
+            for a in AttendanceSyncAction.objects.filter(action_id__in=[p[1] for p in parsed])
+        }
+        pending, seen = [], set()
+        for index, action_id, signup_id, action, action_time in parsed:
+            if action_id in stored:
+                results[index] = {**stored[action_id], 'duplicate': True}
+            elif action_id in seen:
+                results[index] = {'action_id': str(action_id), 'status': 'rejected', 'error': "Repeated action_id in this batch."}
+            else:
+                seen.add(action_id)
+                pending.append((index, action_id, signup_id, action, action_time))
+
+        changed, hours_user_ids, applied = {}, set(), []
+        for index, action_id, signup_id, action, action_time in sorted(pending, key=lambda p: p[4]):
+            signup = signups.get(signup_id)
+            result = {'action_id': str(action_id), 'signup_id': signup_id, 'action': action}
+            try:
+                if signup is None:
+                    raise ValueError("Signup not found for this event.")
+                if action_time > latest_allowed:
+                    raise ValueError("Cannot log future time.")
+                result.update(apply_attendance_action(signup, action, action_time, event_start, event_end, facilitator), status='applied')
+            except ValueError as e:
+                results[index] = {**result, 'status': 'rejected', 'error': str(e)}
+                continue
+
+            results[index] = result
+            changed[signup.id] = signup
+            if action != 'signin':
+                hours_user_ids.add(signup.user_id)
+            applied.append(AttendanceSyncAction(
+                action_id=action_id, activity=activity, signup=signup, facilitator=facilitator,
+                action=action, recorded_at=action_time, result=result,
+            ))
+
+        ActivitySignup.objects.bulk_update(
+            changed.values(), [*SIGN_IN_FIELDS, *SIGN_OUT_FIELDS], batch_size=ATTENDANCE_UPDATE_BATCH_SIZE
+        )
+        AttendanceSyncAction.objects.bulk_create(applied)
+        if hours_user_ids:
+            hours_changed(list(hours_user_ids), since=activity.date_time)
+
+    return results
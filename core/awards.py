@@ -0,0 +1,132 @@
+import heapq
+from array import array
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import DecimalField, IntegerField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import PowerScoreWeights
+from .utils import versioned_cache_key
+
+# Hours, quiz points, weights and volunteer status bump the 'live-awards'
+# version. The TTL only covers what has no hook: new students and profile
+# edits (names, campus), which the screen can show half a minute late
+LIVE_AWARDS_CACHE_TTL = 30
+LIVE_AWARDS_TOP_K = 5
+
+
+def _scaled(values, weight):
+    """Normalises a column against its maximum and scales it to weight * 100."""
+    peak = max(values, default=0.0) or 1.0
+    factor = 100 * weight / peak
+    return array('d', (v * factor for v in values))
+
+
+def compute_live_awards(year=None):
+    """
+    Scores every student from one grouped query over the hours ledger.
+    Metrics are kept as parallel arrays (one per column), scored column by
+    column, and the overall/newcomer top 5 are picked with heaps rather
+    than sorting the whole population.
+    """
+    User = get_user_model()
+    year = year or timezone.now().year
+    weights = PowerScoreWeights.current()
+
+    this_year = Q(hours_ledger__year=year)
+    rows = list(
+        User.objects.filter(role=User.Roles.STUDENT).annotate(
+            year_hours=Coalesce(Sum('hours_ledger__activity_hours', filter=this_year), Value(Decimal('0.00')), output_field=DecimalField()),
+            year_events=Coalesce(Sum('hours_ledger__events_count', filter=this_year), Value(0), output_field=IntegerField()),
+            year_early=Coalesce(Sum('hours_ledger__early_count', filter=this_year), Value(0), output_field=IntegerField()),
+        ).values_list(
+            'id', 'first_name', 'last_name', 'campus', 'volunteer_status',
+            'points', 'manual_bonus_hours', 'year_hours', 'year_events', 'year_early'
+        )
+    )
+
+    hours = array('d', (float(r[7]) + float(r[6] or 0.0) for r in rows))
+    events = array('d', (r[8] for r in rows))
+    points = array('d', (r[5] or 0 for r in rows))
+    early = array('d', (r[9] for r in rows))
+    punctuality_pct = array('d', (e / n * 100 if n > 0 else 0.0 for e, n in zip(early, events)))
+
+    score_hours = _scaled(hours, float(weights.hours_weight))
+    score_events = _scaled(events, float(weights.events_weight))
+    score_points = _scaled(points, float(weights.points_weight))
+    score_punctuality = array('d', (p * float(weights.punctuality_weight) for p in punctuality_pct))
+    power = array('d', (round(sum(parts), 2) for parts in zip(score_hours, score_events, score_points, score_punctuality)))
+
+    def entry(i):
+        r = rows[i]
+        return {
+            'id': r[0],
+            'name': f"{r[1]} {r[2]}",
+            'campus': r[3],
+            'volunteer_status': r[4],
+            'hours': hours[i],
+            'events': int(events[i]),
+            'points': int(points[i]),
+            'early_count': int(early[i]),
+            'punctuality_pct': round(punctuality_pct[i], 1),
+            'score_hours': round(score_hours[i], 2),
+            'score_events': round(score_events[i], 2),
+            'score_points': round(score_points[i], 2),
+            'score_punctuality': round(score_punctuality[i], 2),
+            'power_score': power[i],
+        }
+
+    overall = heapq.nlargest(LIVE_AWARDS_TOP_K, range(len(rows)), key=power.__getitem__)
+    newcomers = heapq.nlargest(
+        LIVE_AWARDS_TOP_K,
+        (i for i, r in enumerate(rows) if r[4] == 'NEWCOMER'),
+        key=power.__getitem__
+    )
+
+    by_campus = {}
+    for i, r in enumerate(rows):
+        if r[3]:
+            by_campus.setdefault(r[3], []).append(i)
+
+    campus_avg = []
+    for campus, members in by_campus.items():
+        cnt = len(members)
+
+        def avg(column, digits=2, rounded=True):
+            total = sum(round(column[i], 2) if rounded else column[i] for i in members)
+            return round(total / cnt, digits)
+
+        campus_avg.append({
+            'campus': campus,
+            'avg_score': avg(power),
+            'score_hours': avg(score_hours),
+            'score_events': avg(score_events),
+            'score_points': avg(score_points),
+            'score_punctuality': avg(score_punctuality),
+            'avg_raw_hours': avg(hours, 1, rounded=False),
+            'avg_raw_events': avg(events, 1, rounded=False),
+            'avg_raw_points': avg(points, 1, rounded=False),
+        })
+    campus_avg.sort(key=lambda x: x['avg_score'], reverse=True)
+
+    return {
+        'overall': [entry(i) for i in overall],
+        'newcomers': [entry(i) for i in newcomers],
+        'campuses': campus_avg,
+    }
+
+
+def get_live_awards():
+    """
+    Cached wrapper around compute_live_awards(). hours_changed() and weight
+    edits bump the 'live-awards' cache version.
+    """
+    key = versioned_cache_key('live-awards', timezone.now().year)
+    data = cache.get(key)
+    if data is None:
+        data = compute_live_awards()
+        cache.set(key, data, LIVE_AWARDS_CACHE_TTL)
+    return data
@@ -0,0 +1,71 @@
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+
+from .attendance import apply_attendance_action, event_window, SIGN_IN_FIELDS, SIGN_OUT_FIELDS
+from .ledger import hours_changed
+from .models import ActivitySignup
+from .tickets import PIN_ALLOCATION_ATTEMPTS, draw_pins
+
+
+def checkin_qr_path(checkin_token):
+    return reverse('checkin-qr', kwargs={'checkin_token': checkin_token})
+
+
+def get_checkin_pin(signup):
+    """
+    The signup's door PIN, unique within its activity. Drawn the first time
+    the student opens their check-in code; a clash with a concurrent draw
+    for the same activity is retried.
+    """
+    for _ in range(PIN_ALLOCATION_ATTEMPTS):
+        if signup.checkin_pin:
+            return signup.checkin_pin
+        used = set(
+            ActivitySignup.objects.filter(activity_id=signup.activity_id, checkin_pin__isnull=False)
+            .values_list('checkin_pin', flat=True)
+        )
+        try:
+            with transaction.atomic():
+                ActivitySignup.objects.filter(pk=signup.pk, checkin_pin__isnull=True).update(checkin_pin=draw_pins(1, used)[0])
+        except IntegrityError:
+            continue
+        # Ours, or the one a concurrent request set first
+        signup.checkin_pin = ActivitySignup.objects.values_list('checkin_pin', flat=True).get(pk=signup.pk)
+    if not signup.checkin_pin:
+        raise IntegrityError("Could not allocate a unique check-in PIN.")
+    return signup.checkin_pin
+
+
+def next_checkin_action(signup):
+    """What a scan means for the student right now: sign in, sign out, or sign back in."""
+    if not signup.sign_in_time:
+        return 'signin'
+    if not signup.sign_out_time:
+        return 'signout'
+    return 'resignin'
+
+
+def scan_checkin(activity, facilitator, signup, action_time, action=None):
+    """
+    Applies a door scan to `signup` with the usual attendance rules.
+    `action` defaults to the student's next step. Raises ValueError with a
+    user-facing message when the scan can't be applied; returns the result.
+    """
+    event_start, event_end = event_window(activity)
+    with transaction.atomic():
+        # Re-read under a lock so two scanners at the same door can't double-apply
+        signup = ActivitySignup.objects.select_for_update(of=('self',)).select_related('user').get(pk=signup.pk)
+        action = action or next_checkin_action(signup)
+        extra = apply_attendance_action(signup, action, action_time, event_start, event_end, facilitator)
+        signup.save(update_fields=[*SIGN_IN_FIELDS, *SIGN_OUT_FIELDS])
+        if action != 'signin':
+            hours_changed([signup.user_id], since=activity.date_time)
+
+    user = signup.user
+    return {
+        'signup_id': signup.id,
+        'name': f"{user.first_name} {user.last_name}".strip() or user.email,
+        'student_number': user.student_number,
+        'action': action,
+        **extra,
+    }
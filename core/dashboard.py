@@ -0,0 +1,251 @@
+import calendar
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from users.models import VolunteerBadge
+from .models import ActivitySignup, StudentHoursLedger, attendance_date
+from .ranks import get_student_ranks
+
+TARGET_HOURS = 80.00
+
+# Sections are dropped explicitly when their data changes; the TTL covers
+# the few inputs that have no hook (profile edits, new recruits, event titles)
+DASHBOARD_CACHE_TTL = 60 * 10
+
+# Sections whose data comes from attendance, i.e. everything hours_changed() touches
+ATTENDANCE_SECTIONS = ('hours', 'punctuality', 'monthly', 'badges', 'history')
+
+
+def _motivation(total_hours, current_year):
+    if total_hours >= 80:
+        return "👑 GOAT STATUS! 80+ hours? You really left no crumbs. Absolute legend."
+    elif total_hours >= 70:
+        return "🔥 70 Hours? You're eating this up. Final stretch, champ!"
+    elif total_hours >= 60:
+        return "💅 60 Hours done. Highkey impressive."
+    elif total_hours >= 50:
+        return "✨ 50 Hours! You have officially entered your Volunteer Era."
+    elif total_hours >= 40:
+        return "🔋 Halfway Point! 40 hours locked in. Main character energy."
+    elif total_hours >= 30:
+        return "🫡 30 Hours deep. The dedication is real. We see you!"
+    elif total_hours >= 20:
+        return "👨‍🍳 20 Hours? Okay, hold up... you are cooking!"
+    elif total_hours >= 10:
+        return "⚡ Double digits (10h)! Huge W. Keep that momentum going."
+    elif total_hours > 0:
+        return "👀 You started! The first hour is always the hardest. Let's get this bread."
+    return f"👋 Welcome to {current_year}! New year, new grind. Let's get it."
+
+
+def _attended(user, year):
+    """The student's attended signups that count towards `year`, using the same year as the hours ledger."""
+    return ActivitySignup.objects.filter(user=user, attended=True).annotate(
+        counted_at=attendance_date()
+    ).annotate(counted_year=ExtractYear('counted_at')).filter(counted_year=year)
+
+
+def _hours_section(user, year):
+    # Read from the ledger, so the totals always match the rank index
+    stats = StudentHoursLedger.objects.filter(user=user, year=year).values('activity_hours', 'events_count').first() or {}
+
+    activity_hours = float(stats.get('activity_hours') or 0.00)
+    bonus_hours = float(getattr(user, 'manual_bonus_hours', 0.00))
+    total_hours = activity_hours + bonus_hours
+
+    return {
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "campus": user.campus,
+        "is_executive": bool(user.executive_position),
+        # Not new: the stats endpoint has always returned the position itself,
+        # and the dashboard shows it next to the executive badge
+        "executive_position": user.executive_position,
+        "current_year": year,
+        "total_hours": total_hours,
+        "activity_hours": activity_hours,
+        "bonus_hours": bonus_hours,
+        "events_count": stats.get('events_count') or 0,
+        "recruits_count": user.recruits.count(),
+        "target": TARGET_HOURS,
+        "remaining": round(max(0, TARGET_HOURS - total_hours), 2),
+        "progress_percent": round(min(100, (total_hours / TARGET_HOURS) * 100), 1),
+        "motivation": _motivation(total_hours, year),
+    }
+
+
+def _punctuality_section(user, year):
+    punctuality_data = _attended(user, year).filter(
+        sign_in_time__isnull=False # Ensure they actually signed in
+    ).annotate(
+        is_early=Case(
+            When(sign_in_time__lte=F('activity__date_time'), then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField()
+        ),
+        is_late=Case(
+            When(sign_in_time__gt=F('activity__date_time'), then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField()
+        )
+    ).aggregate(
+        early_total=Sum('is_early'),
+        late_total=Sum('is_late')
+    )
+
+    early_count = punctuality_data['early_total'] or 0
+    late_count = punctuality_data['late_total'] or 0
+
+    if early_count > late_count:
+        punctuality_status = "Usually Early"
+        punc_color = "#10B981" # Success Green
+        punc_bg = "rgba(16, 185, 129, 0.15)"
+    elif late_count > early_count:
+        punctuality_status = "Usually Late"
+        punc_color = "#ef4444" # Danger Red
+        punc_bg = "rgba(239, 68, 68, 0.15)"
+    elif early_count == late_count and early_count > 0:
+        punctuality_status = "Perfectly Even"
+        punc_color = "#f59e0b" # Warning Orange
+        punc_bg = "rgba(245, 158, 11, 0.15)"
+    else:
+        punctuality_status = "No Data Yet"
+        punc_color = "#64748b" # Muted Slate
+        punc_bg = "rgba(100, 116, 139, 0.15)"
+
+    return {
+        "punctuality_status": punctuality_status,
+        "punctuality_color": punc_color,
+        "punctuality_bg": punc_bg,
+        "early_count": early_count,
+        "late_count": late_count,
+    }
+
+
+def _monthly_section(user, year):
+    monthly_data = _attended(user, year).annotate(
+        month=ExtractMonth('counted_at')
+    ).values('month').annotate(
+        hours=Sum('hours_earned')
+    ).order_by('-month')
+
+    return {
+        "monthly": [
+            {'name': calendar.month_name[item['month']], 'hours': item['hours']}
+            for item in monthly_data
+        ]
+    }
+
+
+def _badges_section(user, year):
+    awards_data = [
+        {'name': a.name, 'icon': a.icon, 'color': a.color, 'description': a.description, 'date_awarded': a.date_awarded}
+        for a in user.awards.all()
+    ]
+
+    # Badges are awarded by core.milestones when hours change, so this stays read-only
+    badges_data = [
+        {'type': b.badge_type, 'date_earned': b.date_earned.strftime("%b %d, %Y")}
+        for b in VolunteerBadge.objects.filter(user=user)
+    ]
+    return {"awards": awards_data, "badges": badges_data}
+
+
+def _learning_section(user, year):
+    from lms.models import StudentProgress
+    accolades = StudentProgress.objects.filter(user=user, score=100.0).select_related('quiz')
+    return {
+        "learning_accolades": [
+            {
+                'quiz_title': acc.quiz.title,
+                'date_completed': acc.completed_at.strftime("%b %d, %Y")
+            } for acc in accolades
+        ]
+    }
+
+
+def _history_section(user, year):
+    recent_events = _attended(user, year).select_related('activity').order_by('-counted_at')
+
+    return {
+        "history": [{
+            'title': e.activity.title,
+            'date': e.sign_out_time,
+            'hours': e.hours_earned,
+            'session_history': e.session_history
+        } for e in recent_events]
+    }
+
+
+SECTION_BUILDERS = {
+    'hours': _hours_section,
+    'punctuality': _punctuality_section,
+    'monthly': _monthly_section,
+    'badges': _badges_section,
+    'learning': _learning_section,
+    'history': _history_section,
+}
+
+
+def _section_key(user_id, section):
+    return f"dashboard:{user_id}:{section}"
+
+
+def _etag(data):
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.md5(body.encode()).hexdigest()
+
+
+def parse_sections(value):
+    """
+    Turns ?sections=hours,badges into a tuple of section names.
+    Raises ValueError for unknown names. No value means every section.
+    """
+    if not value:
+        return tuple(SECTION_BUILDERS)
+    sections = tuple(dict.fromkeys(s.strip() for s in value.split(',') if s.strip()))
+    unknown = [s for s in sections if s not in SECTION_BUILDERS]
+    if unknown or not sections:
+        raise ValueError(f"Unknown section(s): {', '.join(unknown)}. Choose from {', '.join(SECTION_BUILDERS)}.")
+    return sections
+
+
+def get_dashboard_section(user, section):
+    """
+    Returns (data, etag) for one dashboard section, from the cache if present.
+    Ranks are looked up on every call (they move when anyone else's hours
+    change) and are folded into the 'hours' section.
+    """
+    year = timezone.now().year
+    key = _section_key(user.id, section)
+    cached = cache.get(key)
+    if cached is None or cached[0] != year:
+        cached = (year, SECTION_BUILDERS[section](user, year))
+        cache.set(key, cached, DASHBOARD_CACHE_TTL)
+
+    data = cached[1]
+    if section == 'hours':
+        rank_global, rank_campus = get_student_ranks(user, data['total_hours'], year)
+        data = {**data, "rank_global": rank_global, "rank_campus": rank_campus}
+    return data, _etag(data)
+
+
+def build_dashboard(user, sections):
+    """
+    Merges the requested sections into one flat payload.
+    Returns (payload, {section: etag}).
+    """
+    payload, etags = {}, {}
+    for section in sections:
+        data, etags[section] = get_dashboard_section(user, section)
+        payload.update(data)
+    return payload, etags
+
+
+def invalidate_dashboard(user_ids, sections=ATTENDANCE_SECTIONS):
+    cache.delete_many([_section_key(uid, section) for uid in user_ids for section in sections])
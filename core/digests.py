@@ -0,0 +1,76 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from users.audience import Audience
+from users.models import User
+from users.outbox import MERGE_BATCH_SIZE, merged_outbound_emails, queue_emails, render_merge_template
+from .models import PendingEventDigest, VolunteerActivity
+
+
+def digest_event(activity):
+    """Records a new event for the next digest instead of emailing it now."""
+    PendingEventDigest.objects.get_or_create(activity=activity)
+
+
+def _queue_campus_digest(campus, events):
+    """
+    Queues one digest per opted-in student on `campus` (or with no campus),
+    rendered once and merged per recipient. Returns the number of students.
+    """
+    subject = (
+        f"New Event: {events[0].title} 📅" if len(events) == 1
+        else f"{len(events)} New Volunteer Events 📅"
+    )
+    started = time.monotonic()
+    html_content = render_merge_template('core/emails/event_digest.html', {
+        'events': events,
+        'link': "https://cshaw.co.za/",
+    }, ['first_name'])
+    render_seconds = time.monotonic() - started
+
+    queued = 0
+    audience = Audience(role=User.Roles.STUDENT, campus=campus)
+    for batch in audience.batches('email', 'first_name', batch_size=MERGE_BATCH_SIZE):
+        merge_data = {email: {'first_name': first_name} for _, email, first_name in batch}
+        queue_emails(merged_outbound_emails(subject, html_content, merge_data), source='event-digest', render_seconds=render_seconds)
+        queued += len(merge_data)
+        render_seconds = 0.0
+    return queued
+
+
+def send_event_digest(force=False):
+    """
+    Queues one email per student listing every pending event for their
+    campus (campus events plus 'ALL' events), then clears the pending rows.
+    Nothing is sent until the oldest pending event has waited
+    EVENT_DIGEST_WINDOW_HOURS, unless `force` is set.
+    Returns the number of students emailed, or None when no digest was due.
+    """
+    now = timezone.now()
+    window = timedelta(hours=settings.EVENT_DIGEST_WINDOW_HOURS)
+
+    with transaction.atomic():
+        pending = list(PendingEventDigest.objects.select_for_update().select_related('activity').order_by('created_at'))
+        if not pending or (not force and pending[0].created_at > now - window):
+            return None
+
+        # Events that started while waiting are dropped from the digest
+        events = sorted(
+            (p.activity for p in pending if p.activity.date_time >= now),
+            key=lambda activity: activity.date_time
+        )
+
+        queued = 0
+        for campus in [*User.Campuses.values, Audience.NO_CAMPUS]:
+            campus_events = [e for e in events if e.campus in (VolunteerActivity.Campuses.ALL, campus)]
+            if campus_events:
+                queued += _queue_campus_digest(campus, campus_events)
+
+        PendingEventDigest.objects.filter(pk__in=[p.pk for p in pending]).delete()
+
+    print(f"📬 Event digest: {len(events)} event(s) queued for {queued} student(s)")
+    return queued
@@ -1,9 +1,4 @@
 import uuid
-import random
-import threading
-import io
-import qrcode
-from django.core.files.base import ContentFile
 from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -11,61 +6,15 @@ from rest_framework import status
 from django.shortcuts import render
 from django.contrib.auth import get_user_model
 from django.conf import settings
-from django.template.loader import render_to_string
 from .models import ExcursionTicket, ExcursionLeaderboardSnapshot
-from users.services import BackgroundEmailService
-from django.http import HttpResponseForbidden
+from .ledger import get_total_hours
+from .tickets import create_tickets, get_qr_png, issue_tickets, qr_etag, ticket_qr_path
+from .utils import etag_matches
+from django.http import Http404, HttpResponse, HttpResponseForbidden, HttpResponseGone, HttpResponseNotModified
+from django.utils.http import quote_etag
 
 User = get_user_model()
 
-def generate_and_email_tickets(tickets_data):
-    for data in tickets_data:
-        user = data['user']
-        ticket = data['ticket']
-        
-        # Generate QR Code image
-        qr = qrcode.QRCode(version=1, box_size=10, border=4)
-        qr.add_data(str(ticket.ticket_uuid))
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Save to memory
-        buffer = io.BytesIO()
-        img.save(buffer, format="PNG")
-        
-        # Save ImageField to ticket (Google Cloud Storage handles it)
-        ticket.qr_code.save(f"ticket_{ticket.ticket_uuid}.png", ContentFile(buffer.getvalue()), save=True)
-        
-        # Get public URL
-        qr_url = ticket.qr_code.url if ticket.qr_code else ""
-        
-        attendee_name = f"{user.first_name} {user.last_name}".strip() or user.email
-        campus_name = getattr(user, 'campus', '') or 'UJ Campus'
-        hours_val = ticket.locked_hours if ticket.locked_hours > 0 else getattr(user, 'total_hours', 0.0)
-        
-        context = {
-            'first_name': user.first_name,
-            'attendee_name': attendee_name,
-            'campus': campus_name,
-            'hours': f"{hours_val:.1f}",
-            'pin': ticket.fallback_pin,
-            'qr_url': qr_url,
-            'event_title': 'EMPOWERMENT HIKE',
-            'event_date': '28 August 2026',
-            'event_time': '08:00 – 16:00',
-            'location': 'UJ APK Gate 2',
-        }
-        
-        # Render HTML content
-        html_content = render_to_string('core/excursion_ticket_email.html', context)
-        
-        # Send Email via BackgroundEmailService
-        BackgroundEmailService._send_async(
-            subject="🎉 You're Invited! Your Official C-SHAW Excursion Ticket is Inside! 🚌",
-            to_emails=[user.email],
-            html_content=html_content
-        )
-
 class GenerateTicketsAPIView(APIView):
     def post(self, request):
         if request.user.role != 'COORDINATOR':
@@ -76,10 +25,12 @@ class GenerateTicketsAPIView(APIView):
         # 1. Check if snapshot exists. If not, this is the INITIAL click -> Lock all student hours!
         if not ExcursionLeaderboardSnapshot.objects.exists():
             all_students = list(User.objects.filter(role='STUDENT', is_active=True))
+            # One ledger query for every student instead of a SUM per student
+            hours_map = get_total_hours(all_students)
             snapshots_to_create = []
             for s in all_students:
                 snapshots_to_create.append(
-                    ExcursionLeaderboardSnapshot(user=s, locked_hours=float(s.total_hours))
+                    ExcursionLeaderboardSnapshot(user=s, locked_hours=hours_map[s.id])
                 )
             ExcursionLeaderboardSnapshot.objects.bulk_create(snapshots_to_create)
             
@@ -113,29 +64,14 @@ class GenerateTicketsAPIView(APIView):
         if not selected_snapshots:
             return Response({'message': 'No eligible students found to fill remaining seats.', 'generated': 0}, status=status.HTTP_200_OK)
             
-        tickets_data = []
-        for snap in selected_snapshots:
-            student = snap.user
-            # Generate 6-digit PIN
-            pin = ''.join(random.choices('0123456789', k=6))
-            # Ensure unique PIN
-            while ExcursionTicket.objects.filter(fallback_pin=pin).exists():
-                pin = ''.join(random.choices('0123456789', k=6))
-                
-            ticket = ExcursionTicket.objects.create(
-                user=student,
-                fallback_pin=pin,
-                status='active',
-                locked_hours=snap.locked_hours
-            )
-            tickets_data.append({'user': student, 'ticket': ticket})
+        tickets = create_tickets(selected_snapshots)
+        tickets_data = [{'user': ticket.user, 'ticket': ticket} for ticket in tickets]
             
-        # Spawn thread to generate QR and send emails
-        thread = threading.Thread(target=generate_and_email_tickets, args=(tickets_data,))
-        thread.start()
+        # Only queues the emails (QR codes are rendered on demand), so no thread is needed
+        issue_tickets(tickets_data)
         
         return Response({
-            'message': f'Successfully generated {len(tickets_data)} tickets based on locked leaderboard standing. Emails are sending in the background.',
+            'message': f'Successfully generated {len(tickets_data)} tickets based on locked leaderboard standing. Ticket emails are queued for delivery.',
             'generated': len(tickets_data)
         }, status=status.HTTP_200_OK)
 
@@ -200,6 +136,28 @@ class ValidateTicketAPIView(APIView):
             'status': 'success'
         }, status=status.HTTP_200_OK)
 
+def ticket_qr_view(request, ticket_uuid):
+    """
+    The ticket's QR code as a PNG. Public like the old storage URL, so email
+    clients can load it; the uuid itself is the secret. The image for a uuid
+    never changes, but the ticket can be revoked, so browsers and proxies
+    keep it for an hour and then revalidate against the ETag.
+    """
+    ticket_status = ExcursionTicket.objects.filter(ticket_uuid=ticket_uuid).values_list('status', flat=True).first()
+    if ticket_status is None:
+        raise Http404("Ticket not found.")
+    if ticket_status == 'revoked':
+        return HttpResponseGone("This ticket has been revoked.")
+
+    etag = qr_etag(ticket_uuid)
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(get_qr_png(ticket_uuid), content_type='image/png')
+    response['ETag'] = quote_etag(etag)
+    response['Cache-Control'] = "public, max-age=3600"
+    return response
+
 class MyHikingTicketAPIView(APIView):
     def get(self, request):
         if not request.user.is_authenticated:
@@ -222,7 +180,8 @@ class MyHikingTicketAPIView(APIView):
                 'message': 'You do not have an active hiking ticket yet. Tickets are awarded to top volunteers based on logged hours.'
             }, status=status.HTTP_200_OK)
             
-        qr_url = ticket.qr_code.url if ticket.qr_code else ""
+        # Served on demand, so it works whether or not an uploaded image exists
+        qr_url = ticket_qr_path(ticket.ticket_uuid)
         hours_display = ticket.locked_hours if ticket.locked_hours > 0 else getattr(ticket.user, 'total_hours', 0.0)
         
         return Response({
@@ -0,0 +1,107 @@
+from bisect import bisect_right
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db.models import DecimalField, F, IntegerField, Sum, Value
+from django.db.models.functions import Coalesce
+
+from users.models import User
+from .utils import versioned_cache_key
+
+# Attendance writes bump the shared version, so this only bounds how long
+# changes without an invalidation hook (names, campus moves) take to show
+LEADERBOARD_CACHE_TTL = 60 * 5
+
+
+def build_leaderboard(campus=None):
+    """
+    Builds the volunteer leaderboard with a single grouped query over the
+    hours ledger: total hours, events attended and on-time/late counters
+    for every active student, ranked from most to fewest hours.
+    """
+    students = User.objects.filter(role=User.Roles.STUDENT, is_active=True)
+    if campus:
+        students = students.filter(campus=campus)
+
+    rows = students.annotate(
+        event_hours=Coalesce(Sum('hours_ledger__activity_hours'), Value(Decimal('0.00')), output_field=DecimalField()),
+        events_attended=Coalesce(Sum('hours_ledger__events_count'), Value(0), output_field=IntegerField()),
+        on_time=Coalesce(Sum('hours_ledger__on_time_count'), Value(0), output_field=IntegerField()),
+        late=Coalesce(Sum('hours_ledger__late_count'), Value(0), output_field=IntegerField()),
+    ).annotate(
+        grand_total=F('event_hours') + F('manual_bonus_hours')
+    ).order_by('-grand_total', 'id').values(
+        'id', 'first_name', 'last_name', 'campus', 'grand_total', 'events_attended', 'on_time', 'late'
+    )
+
+    campus_labels = dict(User.Campuses.choices)
+    rankings, keys = [], []
+    total_hours = 0.0
+
+    for rank, row in enumerate(rows, start=1):
+        student_total_hours = float(row['grand_total'] or 0.0)
+        total_hours += student_total_hours
+        keys.append((-row['grand_total'], row['id']))
+        rankings.append({
+            'rank': rank,
+            'user_id': row['id'],
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+            'campus': campus_labels.get(row['campus'], row['campus']),
+            'total_hours': round(student_total_hours, 1),
+            'events_attended': row['events_attended'],
+            'on_time_count': row['on_time'],
+            'late_count': row['late'],
+        })
+
+    return {
+        'summary': {
+            'volunteers': len(rankings),
+            'hours': round(total_hours, 1)
+        },
+        'rankings': rankings,
+        # (-exact hours, user id) per row, ascending; where keyset cursors land
+        'keys': keys,
+    }
+
+
+def get_leaderboard(campus=None):
+    """
+    Cached wrapper around build_leaderboard(). The key carries the
+    'leaderboard' cache version, which hours_changed() bumps on every write.
+    """
+    key = versioned_cache_key('leaderboard', campus or 'ALL')
+    data = cache.get(key)
+    if data is None:
+        data = build_leaderboard(campus)
+        cache.set(key, data, LEADERBOARD_CACHE_TTL)
+    return data
+
+
+def encode_cursor(key):
+    """Cursor pointing just past the row with this (-hours, user id) key."""
+    neg_hours, user_id = key
+    return f"{-neg_hours}:{user_id}"
+
+
+def decode_cursor(cursor):
+    """(-hours, user id) from a cursor. Raises ValueError when it is malformed."""
+    try:
+        hours, user_id = cursor.split(':')
+        return -Decimal(hours), int(user_id)
+    except (InvalidOperation, ValueError):
+        raise ValueError("Invalid cursor.")
+
+
+def page_rankings(leaderboard, limit=None, cursor=None):
+    """
+    (rows, next_cursor) for one page of the rankings. The cursor holds the
+    last row's exact hours and user id, so a page starts after that row
+    even if the ranking changed in between: nobody is skipped or repeated
+    because someone above them moved.
+    """
+    rankings, keys = leaderboard['rankings'], leaderboard['keys']
+    start = bisect_right(keys, decode_cursor(cursor)) if cursor else 0
+    end = start + limit if limit else len(rankings)
+    next_cursor = encode_cursor(keys[end - 1]) if end < len(rankings) else None
+    return rankings[start:end], next_cursor
@@ -0,0 +1,160 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import ExtractYear
+
+from .models import ActivitySignup, StudentHoursLedger, attendance_date
+from .dashboard import invalidate_dashboard
+from .race import invalidate_race_snapshots
+from .ranks import invalidate_rank_index
+from .utils import bump_cache_version
+
+# Sign-ins up to this long after the start time still count as "on time"
+PUNCTUALITY_GRACE_PERIOD = timedelta(minutes=5)
+
+
+def _ledger_totals(user_ids=None):
+    """
+    Aggregates attended signups into (user, year) buckets.
+    The year comes from the sign-out time, falling back to the event date
+    for signups that were marked attended without a sign-out.
+    """
+    signups = ActivitySignup.objects.filter(attended=True)
+    if user_ids is not None:
+        signups = signups.filter(user_id__in=user_ids)
+
+    return signups.annotate(
+        year=ExtractYear(attendance_date())
+    ).values('user_id', 'year').annotate(
+        activity_hours=Sum('hours_earned'),
+        events_count=Count('id'),
+        early_count=Count('id', filter=Q(sign_in_time__lte=F('activity__date_time'))),
+        on_time_count=Count('id', filter=Q(sign_in_time__lte=F('activity__date_time') + PUNCTUALITY_GRACE_PERIOD)),
+        late_count=Count('id', filter=Q(sign_in_time__gt=F('activity__date_time') + PUNCTUALITY_GRACE_PERIOD)),
+    ).order_by()
+
+
+def _build_rows(totals):
+    return [
+        StudentHoursLedger(
+            user_id=row['user_id'],
+            year=row['year'],
+            activity_hours=row['activity_hours'] or Decimal('0.00'),
+            events_count=row['events_count'],
+            early_count=row['early_count'],
+            on_time_count=row['on_time_count'],
+            late_count=row['late_count'],
+        )
+        for row in totals
+    ]
+
+
+def refresh_hours_ledger(user_ids):
+    """
+    Recomputes the ledger rows of the given students from their signups.
+    Runs in its own transaction (or joins the caller's one), locking the
+    user rows so two concurrent refreshes for a student cannot interleave.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+
+    User = get_user_model()
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(id__in=user_ids).values_list('id', flat=True))
+        rows = _build_rows(_ledger_totals(user_ids))
+        StudentHoursLedger.objects.filter(user_id__in=user_ids).delete()
+        StudentHoursLedger.objects.bulk_create(rows)
+
+
+def rebuild_hours_ledger():
+    """
+    Drops and recomputes the whole ledger. Returns the number of rows written.
+    """
+    with transaction.atomic():
+        rows = _build_rows(_ledger_totals())
+        StudentHoursLedger.objects.all().delete()
+        StudentHoursLedger.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def verify_hours_ledger():
+    """
+    Compares the stored ledger with a fresh aggregate.
+    Returns a list of (user_id, year, expected, stored) for every mismatch.
+    """
+    counters = ('events_count', 'early_count', 'on_time_count', 'late_count')
+    expected = {
+        (row['user_id'], row['year']): (row['activity_hours'] or Decimal('0.00'),) + tuple(row[c] for c in counters)
+        for row in _ledger_totals()
+    }
+    stored = {
+        (row['user_id'], row['year']): (row['activity_hours'],) + tuple(row[c] for c in counters)
+        for row in StudentHoursLedger.objects.values('user_id', 'year', 'activity_hours', *counters)
+    }
+
+    mismatches = []
+    for key in sorted(expected.keys() | stored.keys()):
+        if expected.get(key) != stored.get(key):
+            mismatches.append((key[0], key[1], expected.get(key), stored.get(key)))
+    return mismatches
+
+
+def get_activity_hours(user_ids, year=None):
+    """
+    Returns {user_id: activity hours} for the given students, summed over
+    every year (or just `year`) with a single ledger query.
+    """
+    ledger = StudentHoursLedger.objects.filter(user_id__in=user_ids)
+    if year is not None:
+        ledger = ledger.filter(year=year)
+
+    totals = ledger.values('user_id').annotate(hours=Sum('activity_hours')).order_by()
+    return {row['user_id']: float(row['hours'] or 0.0) for row in totals}
+
+
+def get_total_hours(users, year=None):
+    """
+    Returns {user_id: activity hours + manual bonus hours} for an iterable of
+    User objects, using one ledger query for the whole batch.
+    """
+    users = list(users)
+    activity_hours = get_activity_hours([u.id for u in users], year=year)
+    return {
+        u.id: activity_hours.get(u.id, 0.0) + float(u.manual_bonus_hours or 0.0)
+        for u in users
+    }
+
+
+def hours_changed(user_ids, since=None):
+    """
+    Single entry point for anything that changes a student's hours or
+    punctuality (sign-outs, re-sign-ins, bulk sign-outs, manual allocations,
+    bonus edits, deletions).
+    `since` is the datetime of the affected activity, or a list of them when
+    several are touched (a moved event's old and new date, a bulk delete);
+    leave it as None when every day is affected, e.g. for bonus hours.
+    Call it inside the same transaction as the write.
+    """
+    from .milestones import award_milestones
+    from .rollups import rollups_changed
+
+    dates = [d for d in (since if isinstance(since, (list, tuple)) else [since]) if d]
+    refresh_hours_ledger(user_ids)
+    award_milestones(user_ids)
+    invalidate_race_snapshots(min(dates) if dates else None)
+    # Bonus hours (since=None) are not part of the per-quarter attendance rollups
+    if dates:
+        rollups_changed(*dates)
+    # Only invalidate once the write is visible, or a concurrent read could re-cache stale totals
+    def after_commit():
+        bump_cache_version('leaderboard')
+        bump_cache_version('live-awards')
+        bump_cache_version('quarterly-report')
+        invalidate_rank_index()
+        invalidate_dashboard(user_ids)
+
+    transaction.on_commit(after_commit)
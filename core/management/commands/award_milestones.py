@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from core.milestones import award_milestones
+
+
+class Command(BaseCommand):
+    help = "Awards the hours milestone badges every user has already earned this year (backfill)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--email',
+            action='store_true',
+            help="Also email the congratulation message to newly awarded users."
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        year = timezone.now().year
+        # Only users with some hours this year can have reached a milestone
+        user_ids = list(
+            User.objects.filter(Q(hours_ledger__year=year) | Q(manual_bonus_hours__gt=0))
+            .distinct().order_by('id').values_list('id', flat=True)
+        )
+
+        awarded = 0
+        batch_size = options['batch_size']
+        for i in range(0, len(user_ids), batch_size):
+            awarded += len(award_milestones(user_ids[i:i + batch_size], year=year, notify=options['email']))
+
+        self.stdout.write(self.style.SUCCESS(f"Checked {len(user_ids)} users, awarded {awarded} badge(s)."))
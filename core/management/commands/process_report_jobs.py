@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.race import update_race_snapshots
+from core.report_jobs import process_report_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders queued report PDFs (and emails them) and catches up the leaderboard race "
+        "snapshots after hours changes. Runs forever unless --once is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit.")
+        parser.add_argument('--sleep', type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+
+    def handle(self, *args, **options):
+        while True:
+            # A long-lived worker must drop connections the database has closed
+            close_old_connections()
+            try:
+                processed = process_report_jobs()
+                if processed:
+                    self.stdout.write(f"Processed {processed} report job(s).")
+                # Hours changes drop snapshots from the affected day on; rebuild them
+                # here so the race endpoint never writes during a request
+                written = update_race_snapshots()
+                if written:
+                    self.stdout.write(f"Wrote {written} race snapshot(s).")
+            except Exception as e:
+                # One bad run (e.g. the database restarting) must not stop the worker
+                if options['once']:
+                    raise
+                self.stderr.write(f"❌ Report job run failed: {e}")
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
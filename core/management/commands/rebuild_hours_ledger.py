@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.ledger import rebuild_hours_ledger, verify_hours_ledger
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the per-student hours ledger from attendance records, or verifies it with --verify."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help="Only compare the ledger with the signups and report mismatches. Exits non-zero if any are found."
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            mismatches = verify_hours_ledger()
+            for user_id, year, expected, stored in mismatches:
+                self.stdout.write(f"user={user_id} year={year} expected={expected} stored={stored}")
+            if mismatches:
+                raise CommandError(f"Hours ledger has {len(mismatches)} mismatched row(s). Run without --verify to rebuild.")
+            self.stdout.write(self.style.SUCCESS("Hours ledger is in sync."))
+            return
+
+        written = rebuild_hours_ledger()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt hours ledger ({written} rows)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.rollups import rebuild_quarterly_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the per-quarter, per-campus attendance rollups used by the quarterly reports."
+
+    def handle(self, *args, **options):
+        written = rebuild_quarterly_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt quarterly rollups ({written} rows)."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.digests import send_event_digest
+
+
+class Command(BaseCommand):
+    help = "Emails students a digest of newly added events. Run it from a scheduler (e.g. hourly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Send now, even if the digest window has not elapsed.")
+
+    def handle(self, *args, **options):
+        queued = send_event_digest(force=options['force'])
+        if queued is None:
+            self.stdout.write("No event digest due.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Event digest queued for {queued} student(s)."))
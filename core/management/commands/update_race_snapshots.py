@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.race import update_race_snapshots
+
+
+class Command(BaseCommand):
+    help = "Appends the missing daily leaderboard race snapshots up to today. Meant to run daily (e.g. just after midnight)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help="Drop every stored snapshot and rebuild the whole timeline."
+        )
+
+    def handle(self, *args, **options):
+        written = update_race_snapshots(rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} race snapshot(s)."))
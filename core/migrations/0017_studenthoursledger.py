@@ -0,0 +1,55 @@
+# Generated by Django 6.0 on 2026-10-18 11:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, ExtractYear
+
+
+def populate_ledger(apps, schema_editor):
+    ActivitySignup = apps.get_model('core', 'ActivitySignup')
+    StudentHoursLedger = apps.get_model('core', 'StudentHoursLedger')
+
+    totals = ActivitySignup.objects.filter(attended=True).annotate(
+        year=ExtractYear(Coalesce('sign_out_time', 'activity__date_time'))
+    ).values('user_id', 'year').annotate(
+        activity_hours=Sum('hours_earned'),
+        events_count=Count('id')
+    ).order_by()
+
+    StudentHoursLedger.objects.bulk_create([
+        StudentHoursLedger(
+            user_id=row['user_id'],
+            year=row['year'],
+            activity_hours=row['activity_hours'] or 0,
+            events_count=row['events_count'],
+        )
+        for row in totals
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_excursionticket_locked_hours_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentHoursLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('activity_hours', models.DecimalField(decimal_places=2, default=0.0, max_digits=8)),
+                ('events_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hours_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'year')},
+            },
+        ),
+        migrations.RunPython(populate_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0 on 2026-10-18 11:55
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Count, F, Q
+from django.db.models.functions import Coalesce, ExtractYear
+
+
+def populate_punctuality(apps, schema_editor):
+    ActivitySignup = apps.get_model('core', 'ActivitySignup')
+    StudentHoursLedger = apps.get_model('core', 'StudentHoursLedger')
+    grace = timedelta(minutes=5)
+
+    counters = ActivitySignup.objects.filter(attended=True).annotate(
+        year=ExtractYear(Coalesce('sign_out_time', 'activity__date_time'))
+    ).values('user_id', 'year').annotate(
+        early=Count('id', filter=Q(sign_in_time__lte=F('activity__date_time'))),
+        on_time=Count('id', filter=Q(sign_in_time__lte=F('activity__date_time') + grace)),
+        late=Count('id', filter=Q(sign_in_time__gt=F('activity__date_time') + grace)),
+    ).order_by()
+    counters = {(row['user_id'], row['year']): row for row in counters}
+
+    rows = list(StudentHoursLedger.objects.all())
+    for row in rows:
+        counts = counters.get((row.user_id, row.year))
+        if counts:
+            row.early_count = counts['early']
+            row.on_time_count = counts['on_time']
+            row.late_count = counts['late']
+    StudentHoursLedger.objects.bulk_update(rows, ['early_count', 'on_time_count', 'late_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_studenthoursledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studenthoursledger',
+            name='early_count',
+            field=models.PositiveIntegerField(default=0, help_text='Signed in at or before the start time'),
+        ),
+        migrations.AddField(
+            model_name='studenthoursledger',
+            name='late_count',
+            field=models.PositiveIntegerField(default=0, help_text='Signed in after the 5 minute grace period'),
+        ),
+        migrations.AddField(
+            model_name='studenthoursledger',
+            name='on_time_count',
+            field=models.PositiveIntegerField(default=0, help_text='Signed in within the 5 minute grace period'),
+        ),
+        migrations.RunPython(populate_punctuality, migrations.RunPython.noop),
+    ]
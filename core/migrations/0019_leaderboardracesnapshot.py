@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_studenthoursledger_punctuality'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardRaceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('rankings', models.JSONField(default=list, help_text="[{'name': ..., 'hours': ...}] ordered by hours")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+    ]
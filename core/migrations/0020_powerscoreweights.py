@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 12:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_leaderboardracesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PowerScoreWeights',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hours_weight', models.DecimalField(decimal_places=2, default=0.5, max_digits=4)),
+                ('events_weight', models.DecimalField(decimal_places=2, default=0.25, max_digits=4)),
+                ('points_weight', models.DecimalField(decimal_places=2, default=0.1, max_digits=4)),
+                ('punctuality_weight', models.DecimalField(decimal_places=2, default=0.15, max_digits=4)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Power score weights',
+            },
+        ),
+    ]
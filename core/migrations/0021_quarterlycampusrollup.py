@@ -0,0 +1,67 @@
+# Generated by Django 6.0 on 2026-10-18 12:09
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, ExtractQuarter, ExtractYear
+
+
+def populate_rollups(apps, schema_editor):
+    ActivitySignup = apps.get_model('core', 'ActivitySignup')
+    QuarterlyCampusRollup = apps.get_model('core', 'QuarterlyCampusRollup')
+
+    totals = ActivitySignup.objects.annotate(
+        year=ExtractYear('activity__date_time'),
+        quarter=ExtractQuarter('activity__date_time'),
+    ).values('year', 'quarter', campus=F('user__campus')).annotate(
+        rsvps=Count('id'),
+        attended_count=Count('id', filter=Q(attended=True)),
+        ontime=Count('id', filter=Q(
+            attended=True,
+            sign_in_time__isnull=False,
+            sign_in_time__lte=F('activity__date_time') + timedelta(minutes=5)
+        )),
+        hours=Coalesce(Sum('hours_earned', filter=Q(attended=True)), Value(0), output_field=DecimalField()),
+    ).order_by()
+
+    QuarterlyCampusRollup.objects.bulk_create([
+        QuarterlyCampusRollup(
+            year=row['year'],
+            quarter=row['quarter'],
+            campus=row['campus'],
+            rsvps=row['rsvps'],
+            attended=row['attended_count'],
+            ontime=row['ontime'],
+            hours=row['hours'],
+        )
+        for row in totals
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_powerscoreweights'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuarterlyCampusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('quarter', models.PositiveSmallIntegerField()),
+                ('campus', models.CharField(blank=True, max_length=10, null=True)),
+                ('rsvps', models.PositiveIntegerField(default=0)),
+                ('attended', models.PositiveIntegerField(default=0)),
+                ('ontime', models.PositiveIntegerField(default=0, help_text='Attended and signed in within the 5 minute grace period')),
+                ('hours', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('year', 'quarter', 'campus')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
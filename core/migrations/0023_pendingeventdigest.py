@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-18 12:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_reportartifact_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingEventDigest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('activity', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pending_digest', to='core.volunteeractivity')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 12:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_attendancesyncaction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitysignup',
+            name='checkin_pin',
+            field=models.CharField(blank=True, max_length=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='activitysignup',
+            name='checkin_token',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+    ]
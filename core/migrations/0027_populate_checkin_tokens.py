@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 12:33
+
+import uuid
+
+from django.db import migrations
+
+
+def populate_checkin_tokens(apps, schema_editor):
+    ActivitySignup = apps.get_model('core', 'ActivitySignup')
+    signups = list(ActivitySignup.objects.filter(checkin_token__isnull=True).only('id'))
+    for signup in signups:
+        signup.checkin_token = uuid.uuid4()
+    ActivitySignup.objects.bulk_update(signups, ['checkin_token'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_activitysignup_checkin_token'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_checkin_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-18 12:32
+
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_populate_checkin_tokens'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activitysignup',
+            name='checkin_token',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name='activitysignup',
+            constraint=models.UniqueConstraint(fields=('activity', 'checkin_pin'), name='unique_checkin_pin_per_activity'),
+        ),
+    ]
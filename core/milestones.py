@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from users.models import VolunteerBadge
+from users.services import BackgroundEmailService
+from .ledger import get_total_hours
+
+# (hours needed in the current year, badge type)
+MILESTONES = (
+    (40, '40_hours'),
+    (80, '80_hours'),
+)
+
+
+def award_milestones(user_ids, year=None, notify=None):
+    """
+    Awards every milestone badge the given users have reached and do not
+    hold yet: one hours query, one badge query and a single bulk insert.
+    With `notify` (default: settings.MILESTONE_EMAILS_ENABLED) the new
+    badge holders are emailed once the transaction commits.
+    Returns the VolunteerBadge rows this call created.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return []
+
+    User = get_user_model()
+    year = year or timezone.now().year
+    users = {u.id: u for u in User.objects.filter(id__in=user_ids).only('id', 'email', 'first_name', 'manual_bonus_hours')}
+    totals = get_total_hours(users.values(), year=year)
+
+    held = set(VolunteerBadge.objects.filter(user_id__in=users.keys()).values_list('user_id', 'badge_type'))
+    new_badges = [
+        VolunteerBadge(user_id=user_id, badge_type=badge_type)
+        for user_id, hours in totals.items()
+        for threshold, badge_type in MILESTONES
+        if hours >= threshold and (user_id, badge_type) not in held
+    ]
+    if not new_badges:
+        return []
+
+    # A concurrent award for the same user is harmless: unique_together keeps one row
+    VolunteerBadge.objects.bulk_create(new_badges, ignore_conflicts=True)
+
+    # ignore_conflicts doesn't say which rows went in, so read back the ones
+    # carrying our own date_earned; a badge another request won isn't ours to announce
+    ours = {(b.user_id, b.badge_type, b.date_earned) for b in new_badges}
+    created = [
+        b for b in VolunteerBadge.objects.filter(
+            user_id__in={b.user_id for b in new_badges}, badge_type__in={b.badge_type for b in new_badges}
+        )
+        if (b.user_id, b.badge_type, b.date_earned) in ours
+    ]
+
+    if created and (notify if notify is not None else settings.MILESTONE_EMAILS_ENABLED):
+        emails = [(users[b.user_id], b.get_badge_type_display()) for b in created]
+        transaction.on_commit(lambda: _send_milestone_emails(emails))
+    return created
+
+
+def _send_milestone_emails(emails):
+    for user, badge_name in emails:
+        html_content = render_to_string('core/emails/milestone_badge.html', {
+            'first_name': user.first_name,
+            'badge_name': badge_name,
+        })
+        BackgroundEmailService._send_async(
+            subject=f"You've earned a new badge: {badge_name} 🏅",
+            to_emails=[user.email],
+            html_content=html_content
+        )
@@ -1,6 +1,7 @@
 import uuid
 
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from config.gcloud import GoogleCloudMediaFileStorage
 
@@ -66,6 +67,15 @@ class ActivityRole(models.Model):
         return f"{self.role_type} for {self.activity.title}"
     
 
+def attendance_date():
+    """
+    When an attended signup counts: its sign-out time, or the event date for
+    signups marked attended without a sign-out. Every per-year figure (the
+    hours ledger, ranks, the dashboard) takes its year from this.
+    """
+    return Coalesce('sign_out_time', 'activity__date_time')
+
+
 class ActivitySignup(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     sign_in_facilitator = models.ForeignKey(
@@ -90,14 +100,218 @@ class ActivitySignup(models.Model):
     sign_out_time = models.DateTimeField(null=True, blank=True)
     hours_earned = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
     session_history = models.JSONField(default=list, blank=True)
+    # Door check-in: the QR code encodes the token, the PIN is the typed fallback (see core.checkin)
+    checkin_token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    checkin_pin = models.CharField(max_length=6, null=True, blank=True)
 
     class Meta:
         unique_together = ('user', 'activity') 
+        constraints = [
+            models.UniqueConstraint(fields=['activity', 'checkin_pin'], name='unique_checkin_pin_per_activity'),
+        ]
 
     def __str__(self):
         return f"{self.user.first_name} -> {self.activity.title}"
     
+
+class WaitlistEntry(models.Model):
+    """
+    A student queued for a fully booked activity (see core.rsvp). Entries
+    are promoted to signups in id order (first come, first served) as
+    spots free up.
+    """
+    activity = models.ForeignKey(VolunteerActivity, on_delete=models.CASCADE, related_name='waitlist')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='waitlist_entries')
+    # Roles picked when joining, applied to the signup on promotion
+    role_ids = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        unique_together = ('user', 'activity')
+        indexes = [models.Index(fields=['activity', 'id'])]
+
+    def __str__(self):
+        return f"{self.user.email} waiting for {self.activity.title}"
+
     
+class AttendanceSyncAction(models.Model):
+    """
+    An attendance action uploaded by a scanner device and applied (see
+    core.attendance.sync_attendance), keyed by the id the device generated.
+    Re-sending the same action returns the stored result instead of
+    applying it twice. Rejected actions are not stored, so they can be
+    re-sent once the problem is fixed.
+    """
+    action_id = models.UUIDField(unique=True)
+    activity = models.ForeignKey(VolunteerActivity, on_delete=models.CASCADE, related_name='sync_actions')
+    signup = models.ForeignKey(ActivitySignup, on_delete=models.SET_NULL, null=True, blank=True, related_name='sync_actions')
+    facilitator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    action = models.CharField(max_length=10)
+    recorded_at = models.DateTimeField(help_text="When the device recorded the action")
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.action} {self.action_id}"
+
+
+class StudentHoursLedger(models.Model):
+    """
+    Materialised per-student, per-year total of attended activity hours.
+    Kept in sync by core.ledger whenever attendance changes, so reading a
+    student's hours is an indexed row fetch instead of a SUM over signups.
+    Manual bonus hours stay on the User and are added on top.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='hours_ledger')
+    year = models.PositiveSmallIntegerField()
+    activity_hours = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
+    events_count = models.PositiveIntegerField(default=0)
+    # Punctuality counters, measured against the event start time
+    early_count = models.PositiveIntegerField(default=0, help_text="Signed in at or before the start time")
+    on_time_count = models.PositiveIntegerField(default=0, help_text="Signed in within the 5 minute grace period")
+    late_count = models.PositiveIntegerField(default=0, help_text="Signed in after the 5 minute grace period")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'year')
+
+    def __str__(self):
+        return f"{self.user_id} - {self.year}: {self.activity_hours}h"
+
+
+class LeaderboardRaceSnapshot(models.Model):
+    """
+    One frame of the leaderboard race: the top 10 volunteers (bonus hours
+    included) at the end of a day. Appended by core.race and dropped from
+    the affected date onwards whenever hours change.
+    """
+    date = models.DateField(unique=True)
+    rankings = models.JSONField(default=list, help_text="[{'name': ..., 'hours': ...}] ordered by hours")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"Race snapshot {self.date}"
+
+
+class QuarterlyCampusRollup(models.Model):
+    """
+    Attendance counters per quarter and per student campus ("ALL" events
+    are credited to each attendee's own campus), read by the quarterly
+    reports. Maintained by core.rollups whenever signups change.
+    """
+    year = models.PositiveSmallIntegerField()
+    quarter = models.PositiveSmallIntegerField()
+    campus = models.CharField(max_length=10, null=True, blank=True)
+    rsvps = models.PositiveIntegerField(default=0)
+    attended = models.PositiveIntegerField(default=0)
+    ontime = models.PositiveIntegerField(default=0, help_text="Attended and signed in within the 5 minute grace period")
+    hours = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('year', 'quarter', 'campus')
+
+    def __str__(self):
+        return f"{self.year} Q{self.quarter} {self.campus}"
+
+
+class PendingEventDigest(models.Model):
+    """
+    A new event waiting for the next digest email (see core.digests).
+    The row is deleted once the digest that announces it is queued.
+    """
+    activity = models.OneToOneField(VolunteerActivity, on_delete=models.CASCADE, related_name='pending_digest')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"Digest pending: {self.activity.title}"
+
+
+class ReportArtifact(models.Model):
+    """
+    A rendered report PDF. Keyed by the hash of the data it was rendered
+    from, so downloads and emails reuse it until that data changes.
+    Stored in the database rather than the public media bucket because
+    reports are only for executives and coordinators.
+    """
+    class ReportTypes(models.TextChoices):
+        EVENT = 'EVENT', 'Event Report'
+        ANNUAL = 'ANNUAL', 'Annual Report'
+
+    report_type = models.CharField(max_length=10, choices=ReportTypes.choices)
+    object_key = models.CharField(max_length=20, help_text="Activity id for event reports, year for annual reports")
+    data_hash = models.CharField(max_length=64)
+    filename = models.CharField(max_length=255)
+    pdf = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('report_type', 'object_key', 'data_hash')
+
+    def __str__(self):
+        return f"{self.filename} ({self.data_hash[:8]})"
+
+
+class ReportJob(models.Model):
+    """
+    A queued PDF render, picked up by the process_report_jobs worker.
+    Jobs with recipients email the PDF once it is ready.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        RUNNING = 'RUNNING', 'Running'
+        DONE = 'DONE', 'Done'
+        FAILED = 'FAILED', 'Failed'
+
+    report_type = models.CharField(max_length=10, choices=ReportArtifact.ReportTypes.choices)
+    object_key = models.CharField(max_length=20)
+    data_hash = models.CharField(max_length=64)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    email_to = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    artifact = models.ForeignKey(ReportArtifact, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.get_report_type_display()} {self.object_key} - {self.status}"
+
+
+class PowerScoreWeights(models.Model):
+    """
+    Weights of the four metrics in the live awards power score. Only the
+    most recently saved row is used; without one the defaults apply.
+    """
+    hours_weight = models.DecimalField(max_digits=4, decimal_places=2, default=0.50)
+    events_weight = models.DecimalField(max_digits=4, decimal_places=2, default=0.25)
+    points_weight = models.DecimalField(max_digits=4, decimal_places=2, default=0.10)
+    punctuality_weight = models.DecimalField(max_digits=4, decimal_places=2, default=0.15)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Power score weights"
+
+    @classmethod
+    def current(cls):
+        return cls.objects.order_by('-updated_at', '-id').first() or cls()
+
+    def __str__(self):
+        return f"Hours {self.hours_weight} / Events {self.events_weight} / Points {self.points_weight} / Punctuality {self.punctuality_weight}"
+
+
 class Feedback(models.Model):
     class FeedbackTypes(models.TextChoices):
         REVIEW = 'REVIEW', 'Review'
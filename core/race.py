@@ -0,0 +1,137 @@
+import heapq
+from datetime import datetime, time, timedelta
+from operator import itemgetter
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ActivitySignup, LeaderboardRaceSnapshot
+
+# Each day of the race only shows the leading pack
+RACE_TOP_K = 10
+
+# Browsers may reuse a race payload this long before revalidating with the ETag
+RACE_CACHE_MAX_AGE = 60
+
+
+def _display_name(user):
+    name = f"{user['first_name']} {user['last_name']}".strip()
+    return name or 'Unknown'
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def invalidate_race_snapshots(since=None):
+    """
+    Drops every snapshot from `since` (a date or datetime) onwards, or all of
+    them when it is None. The next update_race_snapshots() call rebuilds them.
+    """
+    snapshots = LeaderboardRaceSnapshot.objects.all()
+    if since is not None:
+        snapshots = snapshots.filter(date__gte=_as_date(since))
+    snapshots.delete()
+
+
+def _race_start_date(signups):
+    first = signups.order_by('activity__date_time').values_list('activity__date_time', flat=True).first()
+    if first is not None:
+        return _as_date(first)
+    # No events yet, but someone may have bonus hours: start the timeline a week ago
+    return timezone.localdate() - timedelta(days=7)
+
+
+def update_race_snapshots(rebuild=False):
+    """
+    Appends the missing daily top-10 snapshots up to today.
+
+    Only days after the last stored snapshot are computed: the running totals
+    at that point come from one grouped query, then the remaining signups are
+    replayed day by day and a top-k heap picks each day's leaders. Days on
+    which nobody earned hours reuse the previous day's rankings.
+    Returns the number of snapshots written.
+    """
+    User = get_user_model()
+    today = timezone.localdate()
+    signups = ActivitySignup.objects.filter(attended=True, hours_earned__gt=0)
+
+    with transaction.atomic():
+        if rebuild:
+            invalidate_race_snapshots()
+
+        last = LeaderboardRaceSnapshot.objects.order_by('-date').first()
+        if last is not None and last.date >= today:
+            return 0
+
+        bonus = dict(User.objects.filter(manual_bonus_hours__gt=0).values_list('id', 'manual_bonus_hours'))
+        if last is None and not bonus and not signups.exists():
+            return 0
+
+        start = last.date + timedelta(days=1) if last else _race_start_date(signups)
+
+        # Running totals as they stood at the end of the day before `start`
+        totals = {user_id: float(hours) for user_id, hours in bonus.items()}
+        earlier = signups.filter(activity__date_time__lt=_day_start(start)).values('user_id').annotate(
+            hours=Sum('hours_earned')
+        ).order_by()
+        for row in earlier:
+            totals[row['user_id']] = totals.get(row['user_id'], 0.0) + float(row['hours'])
+
+        # Hours earned per day over the window still to be computed
+        daily = {}
+        pending = signups.filter(activity__date_time__gte=_day_start(start)).annotate(
+            day=TruncDate('activity__date_time')
+        ).values('day', 'user_id').annotate(hours=Sum('hours_earned')).order_by()
+        for row in pending:
+            daily.setdefault(row['day'], []).append((row['user_id'], float(row['hours'])))
+
+        names = {
+            u['id']: _display_name(u)
+            for u in User.objects.filter(id__in=totals.keys() | {uid for rows in daily.values() for uid, _ in rows})
+            .values('id', 'first_name', 'last_name')
+        }
+
+        snapshots = []
+        rankings = last.rankings if last else None
+        current = start
+        while current <= today:
+            changes = daily.get(current)
+            if changes:
+                for user_id, hours in changes:
+                    totals[user_id] = totals.get(user_id, 0.0) + hours
+            if changes or rankings is None:
+                leaders = heapq.nlargest(
+                    RACE_TOP_K, ((hours, uid) for uid, hours in totals.items() if hours > 0), key=itemgetter(0)
+                )
+                rankings = [{"name": names.get(uid, 'Unknown'), "hours": hours} for hours, uid in leaders]
+            snapshots.append(LeaderboardRaceSnapshot(date=current, rankings=rankings))
+            current += timedelta(days=1)
+
+        # Another request may be catching up at the same time; its rows are identical
+        LeaderboardRaceSnapshot.objects.bulk_create(snapshots, batch_size=500, ignore_conflicts=True)
+    return len(snapshots)
+
+
+def get_race_timeline(start=None, end=None):
+    """
+    Returns the stored race frames between `start` and `end` (inclusive).
+    Read-only: missing days are written by the background worker (see
+    process_report_jobs) and the daily update_race_snapshots command.
+    """
+    snapshots = LeaderboardRaceSnapshot.objects.order_by('date')
+    if start:
+        snapshots = snapshots.filter(date__gte=start)
+    if end:
+        snapshots = snapshots.filter(date__lte=end)
+    return snapshots
+
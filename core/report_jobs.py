@@ -0,0 +1,205 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ReportArtifact, ReportJob, VolunteerActivity
+from .reports import get_comparative_stats, get_detailed_quarterly_stats, get_event_stats, get_or_create_ai_insight
+from .utils import render_to_pdf, versioned_cache_key
+
+ReportTypes = ReportArtifact.ReportTypes
+
+# A RUNNING job older than this belongs to a worker that died mid-render
+REPORT_JOB_STALE_AFTER = timedelta(minutes=15)
+# Attendance and RSVP changes bump the 'report-data' version; the TTL only
+# bounds how long edits without that hook (titles, spot counts) take to show
+REPORT_HASH_TTL = 60 * 5
+
+
+def _report_data(report_type, object_key):
+    """
+    The data a report is rendered from, minus the AI insight: that is
+    derived from the stats and stored on the activity once generated.
+    """
+    if report_type == ReportTypes.EVENT:
+        return {
+            'stats': get_event_stats(int(object_key)),
+            'comparison': get_comparative_stats(int(object_key)),
+        }
+    year = int(object_key)
+    return {'year': year, 'report_data': get_detailed_quarterly_stats(year)}
+
+
+def _data_hash(data):
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _hash_key(report_type, object_key):
+    return versioned_cache_key('report-data', report_type, object_key)
+
+
+def _current_hash(report_type, object_key):
+    """
+    The report's data hash, remembered in the cache so a download only
+    recomputes the report data after that data has changed.
+    """
+    key = _hash_key(report_type, object_key)
+    data_hash = cache.get(key)
+    if data_hash is None:
+        data_hash = _data_hash(_report_data(report_type, object_key))
+        cache.set(key, data_hash, REPORT_HASH_TTL)
+    return data_hash
+
+
+def _live_jobs():
+    """Jobs a worker will still finish: pending, or running and not abandoned."""
+    return Q(status=ReportJob.Status.PENDING) | Q(
+        status=ReportJob.Status.RUNNING, started_at__gte=timezone.now() - REPORT_JOB_STALE_AFTER
+    )
+
+
+def _render(report_type, object_key, data):
+    """Returns (filename, template context, template) for a report."""
+    if report_type == ReportTypes.EVENT:
+        activity = VolunteerActivity.objects.get(pk=int(object_key))
+        stats, comparison = data['stats'], data['comparison']
+        context = {
+            'stats': stats,
+            'comparison': comparison,
+            'ai_analysis': get_or_create_ai_insight(activity, stats, comparison),
+        }
+        return f"Report_{stats['title'].replace(' ', '_')}.pdf", context, 'core/pdf_report.html'
+    return f"Annual_Report_{data['year']}.pdf", data, 'core/quarterly_pdf.html'
+
+
+def _email_subject_and_message(job, data):
+    if job.report_type == ReportTypes.EVENT:
+        stats = data['stats']
+        return (
+            f"Event Report: {stats['title']}",
+            f"Please find attached the performance report for the event '{stats['title']}' held on {stats['date']}."
+        )
+    return (
+        f"Annual Volunteer Report: {data['year']}",
+        f"Please find attached the quarterly breakdown and campus performance report for the year {data['year']}."
+    )
+
+
+def request_report(report_type, object_key, user, email_to=None):
+    """
+    Returns (artifact, job) for a report request. A download whose data has
+    not changed since the last render gets the stored artifact and no job.
+    Otherwise a job is queued, or an identical one a worker is still on is
+    reused. Raises VolunteerActivity.DoesNotExist for unknown event reports.
+    """
+    object_key = str(object_key)
+    data_hash = _current_hash(report_type, object_key)
+
+    if not email_to:
+        artifact = ReportArtifact.objects.filter(
+            report_type=report_type, object_key=object_key, data_hash=data_hash
+        ).first()
+        if artifact:
+            return artifact, None
+
+        job = ReportJob.objects.filter(
+            _live_jobs(), report_type=report_type, object_key=object_key, data_hash=data_hash, email_to=[]
+        ).first()
+        if job:
+            return None, job
+
+    job = ReportJob.objects.create(
+        report_type=report_type,
+        object_key=object_key,
+        data_hash=data_hash,
+        requested_by=user,
+        email_to=email_to or [],
+    )
+    return None, job
+
+
+def run_report_job(job):
+    """
+    Renders (or reuses) the job's PDF, emails it if requested and records
+    the outcome on the job.
+    """
+    try:
+        hash_key = _hash_key(job.report_type, job.object_key)
+        data = _report_data(job.report_type, job.object_key)
+        data_hash = _data_hash(data)
+        # Fresher than whatever hash the request saw, so downloads find this artifact
+        cache.set(hash_key, data_hash, REPORT_HASH_TTL)
+
+        artifact = ReportArtifact.objects.filter(
+            report_type=job.report_type, object_key=job.object_key, data_hash=data_hash
+        ).first()
+        if artifact is None:
+            filename, context, template = _render(job.report_type, job.object_key, data)
+            pdf = render_to_pdf(template, context)
+            if not pdf:
+                raise RuntimeError("PDF Generation Error")
+            artifact, _ = ReportArtifact.objects.get_or_create(
+                report_type=job.report_type, object_key=job.object_key, data_hash=data_hash,
+                defaults={'filename': filename, 'pdf': pdf}
+            )
+            # Older renders of this report can never be served again
+            ReportArtifact.objects.filter(
+                report_type=job.report_type, object_key=job.object_key
+            ).exclude(pk=artifact.pk).delete()
+
+        if job.email_to:
+            subject, message = _email_subject_and_message(job, data)
+            email = EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, job.email_to)
+            email.attach(artifact.filename, bytes(artifact.pdf), 'application/pdf')
+            email.send()
+
+        job.artifact = artifact
+        job.data_hash = data_hash
+        job.status = ReportJob.Status.DONE
+    except Exception as e:
+        print(f"❌ Report job {job.pk} failed: {e}")
+        job.status = ReportJob.Status.FAILED
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['artifact', 'data_hash', 'status', 'error', 'finished_at'])
+    return job
+
+
+def claim_next_report_job():
+    """
+    Marks the oldest pending job as running and returns it, or None.
+    A RUNNING job whose worker died is reclaimed. SKIP LOCKED lets several
+    workers poll the queue without colliding.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = ReportJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status=ReportJob.Status.PENDING) |
+            Q(status=ReportJob.Status.RUNNING, started_at__lt=now - REPORT_JOB_STALE_AFTER)
+        ).order_by('created_at').first()
+        if job is None:
+            return None
+        job.status = ReportJob.Status.RUNNING
+        job.started_at = now
+        job.save(update_fields=['status', 'started_at'])
+    return job
+
+
+def process_report_jobs(limit=None):
+    """Runs pending jobs until the queue is empty (or `limit` is reached). Returns the count."""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_report_job()
+        if job is None:
+            break
+        run_report_job(job)
+        processed += 1
+    return processed
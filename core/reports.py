@@ -1,8 +1,14 @@
 import re
-from django.db.models import Sum, Count, Q
+import json
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import Sum, Count, Q, F, OuterRef, Subquery, Value, DecimalField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.conf import settings
 from openai import OpenAI
 from .models import VolunteerActivity, ActivitySignup
+from .utils import versioned_cache_key
 from collections import defaultdict
 from django.db.models import Q
 
@@ -140,66 +146,50 @@ def get_comparative_stats(activity_id):
         })
     return comparison_data
 def get_detailed_quarterly_stats(year):
+    """
+    Per-quarter event lists and campus attendance stats for the quarterly
+    PDF reports. Campus counters come from the QuarterlyCampusRollup rows
+    (at most 4 quarters x a few campuses), not from the signups themselves.
+    """
+    from .models import QuarterlyCampusRollup
+
     # 1. Setup Structure
     quarters = {
-        1: {"label": "Q1 (Jan-Mar)", "events": [], "campuses": defaultdict(lambda: {"rsvps": 0, "attended": 0, "ontime": 0})},
-        2: {"label": "Q2 (Apr-Jun)", "events": [], "campuses": defaultdict(lambda: {"rsvps": 0, "attended": 0, "ontime": 0})},
-        3: {"label": "Q3 (Jul-Sep)", "events": [], "campuses": defaultdict(lambda: {"rsvps": 0, "attended": 0, "ontime": 0})},
-        4: {"label": "Q4 (Oct-Dec)", "events": [], "campuses": defaultdict(lambda: {"rsvps": 0, "attended": 0, "ontime": 0})},
+        1: {"label": "Q1 (Jan-Mar)", "events": [], "campuses": []},
+        2: {"label": "Q2 (Apr-Jun)", "events": [], "campuses": []},
+        3: {"label": "Q3 (Jul-Sep)", "events": [], "campuses": []},
+        4: {"label": "Q4 (Oct-Dec)", "events": [], "campuses": []},
     }
 
-    # 2. Fetch Activities for the Year
-    activities = VolunteerActivity.objects.filter(date_time__year=year).prefetch_related('signups__user')
+    # 2. Event list per quarter (activity rows only, no signups)
+    activities = VolunteerActivity.objects.filter(date_time__year=year).order_by('date_time')
+    for activity in activities.values('title', 'date_time', 'campus'):
+        local_time = timezone.localtime(activity['date_time'])
+        quarters[(local_time.month - 1) // 3 + 1]["events"].append({
+            "title": activity['title'],
+            "date": local_time.strftime("%d %b"),
+            "campus": activity['campus']
+        })
 
-    for activity in activities:
-        # Determine Quarter (1-4)
-        q_num = (activity.date_time.month - 1) // 3 + 1
-        target_q = quarters[q_num]
+    # 3. Campus stats from the rollup table (the STUDENT'S campus, so "ALL" events credit each campus)
+    rollups = QuarterlyCampusRollup.objects.filter(year=year).order_by('quarter', 'campus')
+    for metrics in rollups:
+        # Avoid division by zero
+        att_rate = (metrics.attended / metrics.rsvps * 100) if metrics.rsvps > 0 else 0
+        punc_rate = (metrics.ontime / metrics.attended * 100) if metrics.attended > 0 else 0
 
-        # A. Add to Event List
-        target_q["events"].append({
-            "title": activity.title,
-            "date": activity.date_time.strftime("%d %b"),
-            "campus": activity.campus
+        quarters[metrics.quarter]["campuses"].append({
+            "name": metrics.campus,
+            "rsvps": metrics.rsvps,
+            "attended": metrics.attended,
+            "attendance_rate": round(att_rate, 1),
+            "punctuality_rate": round(punc_rate, 1)
         })
 
-        # B. Calculate Campus Stats (Iterate through students)
-        signups = activity.signups.all()
-        
-        for signup in signups:
-            # We track the STUDENT'S campus, not just the event campus
-            # This handles "ALL" events correctly (APB students get credit for APB)
-            student_campus = signup.user.campus if hasattr(signup.user, 'campus') else 'Unknown'
-            
-            stats = target_q["campuses"][student_campus]
-            stats["rsvps"] += 1
-            
-            if signup.attended:
-                stats["attended"] += 1
-                
-                # Check Punctuality (On Time = Not > 5 mins late)
-                if signup.sign_in_time:
-                    diff_mins = (signup.sign_in_time - activity.date_time).total_seconds() / 60
-                    if diff_mins <= 5: 
-                        stats["ontime"] += 1
-
-    # 3. Format Data for Frontend (Calculate Percentages)
+    # 4. Format Data for Frontend
     final_report = []
     for q_num, data in quarters.items():
-        campus_list = []
-        for campus_name, metrics in data["campuses"].items():
-            # Avoid division by zero
-            att_rate = (metrics["attended"] / metrics["rsvps"] * 100) if metrics["rsvps"] > 0 else 0
-            punc_rate = (metrics["ontime"] / metrics["attended"] * 100) if metrics["attended"] > 0 else 0
-            
-            campus_list.append({
-                "name": campus_name,
-                "rsvps": metrics["rsvps"],
-                "attended": metrics["attended"],
-                "attendance_rate": round(att_rate, 1),
-                "punctuality_rate": round(punc_rate, 1)
-            })
-        
+        campus_list = data["campuses"]
         # Sort Campuses by Attendance Rate (Leaderboard style)
         campus_list.sort(key=lambda x: x['attendance_rate'], reverse=True)
 
@@ -211,6 +201,118 @@ def get_detailed_quarterly_stats(year):
 
     return final_report
 
+QUARTERLY_REPORT_CACHE_TTL = 60 * 10
+REPORT_CAMPUSES = ['APB', 'DFC', 'APK', 'SWC']
+
+
+def build_quarterly_report_context():
+    """
+    Everything the quarterly report page shows, in four queries: users
+    grouped by campus, past events annotated with RSVP/attended counts,
+    one signup aggregate for attendance and punctuality, and the feedback.
+    """
+    from users.models import User
+    from .models import Feedback, StudentHoursLedger
+
+    now = timezone.now()
+    is_student = Q(role=User.Roles.STUDENT)
+
+    # Each user's all-time event hours, from the hours ledger
+    ledger_hours = StudentHoursLedger.objects.filter(user=OuterRef('pk')).values('user').annotate(
+        hours=Sum('activity_hours')
+    ).values('hours')
+
+    # "True active" students have more than 5 combined (event + bonus) hours
+    by_campus = User.objects.annotate(
+        event_hours=Coalesce(Subquery(ledger_hours), Value(Decimal('0.00')), output_field=DecimalField())
+    ).alias(
+        grand_total=F('event_hours') + F('manual_bonus_hours')
+    ).values('campus').annotate(
+        registered=Count('id', filter=is_student & Q(is_superuser=False)),
+        active=Count('id', filter=is_student & Q(is_superuser=False, grand_total__gt=5)),
+        # Event hours count every attendee of the campus; bonus hours only students
+        campus_event_hours=Sum('event_hours'),
+        campus_manual_hours=Sum('manual_bonus_hours', filter=is_student),
+    ).order_by()
+
+    totals = {'registered': 0, 'active': 0, 'hours': 0.0}
+    campus_context = {}
+    for row in by_campus:
+        camp_hours = float(row['campus_event_hours'] or 0.0) + float(row['campus_manual_hours'] or 0.0)
+        totals['registered'] += row['registered']
+        totals['active'] += row['active']
+        totals['hours'] += camp_hours
+
+        if row['campus'] in REPORT_CAMPUSES:
+            prefix = row['campus'].lower()
+            avg_hours = (camp_hours / row['active']) if row['active'] > 0 else 0.0
+            campus_context[f'{prefix}_total_count'] = row['registered']
+            campus_context[f'{prefix}_active_count'] = row['active']
+            campus_context[f'{prefix}_total_hours'] = round(camp_hours, 1)
+            campus_context[f'{prefix}_avg_hours'] = round(avg_hours, 1)
+
+    for camp in REPORT_CAMPUSES:
+        prefix = camp.lower()
+        campus_context.setdefault(f'{prefix}_total_count', 0)
+        campus_context.setdefault(f'{prefix}_active_count', 0)
+        campus_context.setdefault(f'{prefix}_total_hours', 0.0)
+        campus_context.setdefault(f'{prefix}_avg_hours', 0.0)
+
+    # Turnout per completed event, oldest to newest ('Expected' = RSVPs, 'Actual' = attended)
+    past_events = list(
+        VolunteerActivity.objects.filter(date_time__lte=now).order_by('date_time').annotate(
+            rsvps=Count('signups'),
+            attended=Count('signups', filter=Q(signups__attended=True)),
+        ).values_list('title', 'rsvps', 'attended')
+    )
+
+    signups = ActivitySignup.objects.aggregate(
+        total_rsvps=Count('id'),
+        total_attended=Count('id', filter=Q(attended=True)),
+        # Anyone marked attended without a sign-in time gets the benefit of the doubt
+        total_late=Count('id', filter=Q(attended=True, sign_in_time__isnull=False, sign_in_time__gt=F('activity__date_time'))),
+    )
+    attendance_rate = round((signups['total_attended'] / signups['total_rsvps']) * 100) if signups['total_rsvps'] > 0 else 0
+
+    feedbacks = [
+        {'message': message}
+        for message in Feedback.objects.order_by('-created_at').values_list('message', flat=True)
+    ]
+
+    return {
+        'total_hours': round(totals['hours'], 1),
+        'total_events': len(past_events),
+        'total_registered': totals['registered'],
+        'active_peers': totals['active'],
+        'attendance_rate': attendance_rate,
+        # Javascript Charts
+        'chart_labels': json.dumps([title for title, _, _ in past_events]),
+        'chart_expected': [rsvps for _, rsvps, _ in past_events],
+        'chart_actual': [attended for _, _, attended in past_events],
+
+        'punctuality_on_time': signups['total_attended'] - signups['total_late'],
+        'punctuality_late': signups['total_late'],
+        'punctuality_excused': signups['total_rsvps'] - signups['total_attended'],
+
+        'feedbacks': feedbacks,
+        **campus_context,
+    }
+
+
+def get_quarterly_report_context():
+    """
+    Cached wrapper around build_quarterly_report_context(). The report
+    covers all time, so there is a single entry. Attendance writes and new
+    feedback bump the 'quarterly-report' cache version; the TTL covers
+    RSVPs and events moving into the past.
+    """
+    key = versioned_cache_key('quarterly-report', 'all-time')
+    context = cache.get(key)
+    if context is None:
+        context = build_quarterly_report_context()
+        cache.set(key, context, QUARTERLY_REPORT_CACHE_TTL)
+    return context
+
 def get_or_create_ai_insight(activity, stats, comparison):
     if activity.ai_insight: return activity.ai_insight
 
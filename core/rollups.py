@@ -0,0 +1,110 @@
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, ExtractQuarter, ExtractYear
+from django.utils import timezone
+
+from .ledger import PUNCTUALITY_GRACE_PERIOD
+from .models import ActivitySignup, QuarterlyCampusRollup
+from .utils import bump_cache_version
+
+# First key of the (namespace, quarter) advisory lock that serialises refreshes
+ROLLUP_LOCK_NAMESPACE = 4101
+
+
+def _quarter_of(moment):
+    local = timezone.localtime(moment)
+    return local.year, (local.month - 1) // 3 + 1
+
+
+def _quarter_start(year, quarter):
+    return timezone.make_aware(datetime(year, (quarter - 1) * 3 + 1, 1))
+
+
+def _next_quarter(year, quarter):
+    return (year + 1, 1) if quarter == 4 else (year, quarter + 1)
+
+
+def _rollup_totals(signups):
+    return signups.values('year', 'quarter', campus=F('user__campus')).annotate(
+        rsvps=Count('id'),
+        attended_count=Count('id', filter=Q(attended=True)),
+        ontime=Count('id', filter=Q(
+            attended=True,
+            sign_in_time__isnull=False,
+            sign_in_time__lte=F('activity__date_time') + PUNCTUALITY_GRACE_PERIOD
+        )),
+        hours=Coalesce(Sum('hours_earned', filter=Q(attended=True)), Value(0), output_field=DecimalField()),
+    ).order_by()
+
+
+def _build_rows(totals):
+    return [
+        QuarterlyCampusRollup(
+            year=row['year'],
+            quarter=row['quarter'],
+            campus=row['campus'],
+            rsvps=row['rsvps'],
+            attended=row['attended_count'],
+            ontime=row['ontime'],
+            hours=row['hours'],
+        )
+        for row in totals
+    ]
+
+
+def _lock_quarter(year, quarter):
+    """
+    Holds a per-quarter lock until the transaction ends. Only needed on
+    PostgreSQL; SQLite already lets one writer in at a time.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [ROLLUP_LOCK_NAMESPACE, year * 10 + quarter])
+
+
+def refresh_quarterly_rollup(year, quarter):
+    """
+    Recomputes the campus rows of one quarter with a single grouped query.
+    Concurrent refreshes of the same quarter queue on a lock, and each one
+    counts the signups only once it holds it, so the last one in writes
+    totals that include every earlier commit.
+    """
+    start = _quarter_start(year, quarter)
+    end = _quarter_start(*_next_quarter(year, quarter))
+    signups = ActivitySignup.objects.filter(
+        activity__date_time__gte=start, activity__date_time__lt=end
+    ).annotate(year=Value(year), quarter=Value(quarter))
+
+    with transaction.atomic():
+        _lock_quarter(year, quarter)
+        rows = _build_rows(_rollup_totals(signups))
+        QuarterlyCampusRollup.objects.filter(year=year, quarter=quarter).delete()
+        QuarterlyCampusRollup.objects.bulk_create(rows)
+
+
+def rollups_changed(*dates):
+    """
+    Refreshes the quarters that contain `dates`, the dates of the affected
+    activities. A moved event passes both its old and its new date.
+    Quarters are refreshed in order, so two callers never take their
+    locks in opposite orders.
+    """
+    for year, quarter in sorted({_quarter_of(moment) for moment in dates if moment}):
+        refresh_quarterly_rollup(year, quarter)
+    # Report PDFs are rendered from these figures (and the same signups)
+    transaction.on_commit(lambda: bump_cache_version('report-data'))
+
+
+def rebuild_quarterly_rollups():
+    """Drops and recomputes every rollup row. Returns the number of rows written."""
+    signups = ActivitySignup.objects.annotate(
+        year=ExtractYear('activity__date_time'),
+        quarter=ExtractQuarter('activity__date_time'),
+    )
+    with transaction.atomic():
+        rows = _build_rows(_rollup_totals(signups))
+        QuarterlyCampusRollup.objects.all().delete()
+        QuarterlyCampusRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
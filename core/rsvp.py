@@ -0,0 +1,81 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+
+from users.services import send_waitlist_promotion_email
+from .models import ActivityRole, ActivitySignup, VolunteerActivity, WaitlistEntry
+from .rollups import rollups_changed
+
+
+def reserve_spot(activity_id):
+    """
+    Takes one spot with a single conditional UPDATE, so concurrent RSVPs
+    can never push spots_taken past total_spots. Unlimited events always
+    succeed. Returns False when the event is full. Call inside the
+    transaction that creates the signup, so a failed insert gives the spot back.
+    """
+    has_room = Q(total_spots__isnull=True) | Q(spots_taken__lt=F('total_spots'))
+    return VolunteerActivity.objects.filter(has_room, pk=activity_id).update(spots_taken=F('spots_taken') + 1) == 1
+
+
+def release_spot(activity_id):
+    """Gives one spot back without touching the rest of the row."""
+    VolunteerActivity.objects.filter(pk=activity_id, spots_taken__gt=0).update(spots_taken=F('spots_taken') - 1)
+
+
+def _count_in_line(**filters):
+    return Subquery(
+        WaitlistEntry.objects.filter(activity_id=OuterRef('activity_id'), **filters)
+        .order_by().values('activity_id').annotate(n=Count('id')).values('n')
+    )
+
+
+def waitlist_positions(user):
+    """
+    The user's waitlist entries annotated with `position` (1 = next in
+    line) and `waitlist_size`, in one query.
+    """
+    return WaitlistEntry.objects.filter(user=user).select_related('activity').annotate(
+        position=_count_in_line(id__lte=OuterRef('id')),
+        waitlist_size=_count_in_line(),
+    )
+
+
+def promote_waitlist(activity_id):
+    """
+    Turns waitlist entries into signups, in order, for as long as spots are
+    free. Each promotion reserves its spot with reserve_spot, so this is
+    safe to run next to RSVPs and other promotions. Returns the new signups.
+    """
+    promoted = []
+    with transaction.atomic():
+        while True:
+            entry = (
+                WaitlistEntry.objects.select_for_update(skip_locked=True)
+                .select_related('user').filter(activity_id=activity_id).first()
+            )
+            if entry is None:
+                break
+            if ActivitySignup.objects.filter(user_id=entry.user_id, activity_id=activity_id).exists():
+                entry.delete()
+                continue
+            if not reserve_spot(activity_id):
+                break
+
+            signup = ActivitySignup.objects.create(user=entry.user, activity_id=activity_id)
+            # Roles have no capacity of their own (RSVPs don't limit them
+            # either), so the chosen ones are applied as they are
+            if entry.role_ids:
+                signup.roles.set(ActivityRole.objects.filter(activity_id=activity_id, id__in=entry.role_ids))
+            entry.delete()
+            promoted.append(signup)
+    return promoted
+
+
+def handle_promotions(activity, signups):
+    """
+    Follow-up once promotions are committed: one merged "you're in" email
+    for everyone promoted together, and fresh signup rollups.
+    """
+    if signups:
+        send_waitlist_promotion_email(activity, [signup.user for signup in signups])
+        rollups_changed(activity.date_time)
@@ -49,7 +49,12 @@ class VolunteerActivitySerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         role_types = validated_data.pop('role_types', None)
-        instance = super().update(instance, validated_data)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # Only the edited columns: spots_taken belongs to reserve_spot/release_spot,
+        # and this request's copy of it may already be stale
+        if validated_data:
+            instance.save(update_fields=list(validated_data))
         
         if role_types is not None:
             
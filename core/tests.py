@@ -1,3 +1,1335 @@
-from django.test import TestCase
+import threading
+import uuid
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib import admin
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from lms.models import Choice, LearningUnit, Question, Quiz, Topic
+from users.models import EmailCampaign, OutboundEmail, User, VolunteerBadge
+from . import dashboard, ranks, tickets
+from .attendance import bulk_sign_out, sync_attendance
+from .awards import LIVE_AWARDS_TOP_K, compute_live_awards, get_live_awards
+from .checkin import get_checkin_pin, scan_checkin
+from .race import RACE_TOP_K, invalidate_race_snapshots, update_race_snapshots
+from .leaderboard import build_leaderboard, page_rankings
+from .ledger import PUNCTUALITY_GRACE_PERIOD, _ledger_totals, hours_changed, rebuild_hours_ledger, refresh_hours_ledger, verify_hours_ledger
+from .milestones import award_milestones
+from .models import (
+    ActivityRole, ActivitySignup, ExcursionTicket, Feedback, LeaderboardRaceSnapshot, PendingEventDigest, PowerScoreWeights, QuarterlyCampusRollup,
+    ReportArtifact, ReportJob, StudentHoursLedger, VolunteerActivity, WaitlistEntry,
+)
+from .reports import build_quarterly_report_context, get_quarterly_report_context
+from .report_jobs import REPORT_JOB_STALE_AFTER, claim_next_report_job, process_report_jobs, request_report, run_report_job
+from .rollups import _quarter_of, refresh_quarterly_rollup, rollups_changed
+from .rsvp import promote_waitlist, release_spot, reserve_spot, waitlist_positions
+from .serializers import VolunteerActivitySerializer
+from .utils import bump_cache_version, cache_version, versioned_cache_key
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class RSVPCapacityStressTest(TransactionTestCase):
+    """
+    Many students RSVP for the last few spots at the same moment.
+    Needs a database with row-level locking (Postgres); SQLite's shared
+    in-memory test database locks whole tables between threads.
+    """
+
+    SPOTS = 5
+    STUDENTS = 30
+
+    def setUp(self):
+        coordinator = User.objects.create_user(email='coord@example.com', password='pw', role='COORDINATOR')
+        self.activity = VolunteerActivity.objects.create(
+            title='Popular Event', campus='ALL', description='d', details='d',
+            date_time=timezone.now() + timedelta(days=7), duration_hours=2,
+            total_spots=self.SPOTS, created_by=coordinator,
+        )
+        self.students = [
+            User.objects.create_user(email=f'student{i}@example.com', password='pw', role='STUDENT', campus='APB')
+            for i in range(self.STUDENTS)
+        ]
+
+    def _rsvp_concurrently(self, students):
+        barrier = threading.Barrier(len(students))
+        statuses = []
+
+        def rsvp(student):
+            client = APIClient()
+            client.force_authenticate(student)
+            try:
+                barrier.wait()
+                response = client.post('/api/activities/signup/', {'activity': self.activity.pk}, format='json')
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=rsvp, args=(student,)) for student in students]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    def test_rsvp_rush_never_oversells(self):
+        statuses = self._rsvp_concurrently(self.students)
+
+        self.activity.refresh_from_db()
+        signups = ActivitySignup.objects.filter(activity=self.activity).count()
+        self.assertEqual(statuses.count(201), self.SPOTS)
+        self.assertEqual(statuses.count(400), self.STUDENTS - self.SPOTS)
+        self.assertEqual(signups, self.SPOTS)
+        self.assertEqual(self.activity.spots_taken, self.SPOTS)
+
+    def test_duplicate_rsvps_take_one_spot(self):
+        statuses = self._rsvp_concurrently([self.students[0]] * 10)
+
+        self.activity.refresh_from_db()
+        self.assertEqual(statuses.count(201), 1)
+        self.assertEqual(ActivitySignup.objects.filter(activity=self.activity).count(), 1)
+        self.assertEqual(self.activity.spots_taken, 1)
+
+    def test_rsvp_rush_keeps_the_rollup_in_step(self):
+        # Every successful RSVP refreshes the same quarter straight after its commit
+        self._rsvp_concurrently(self.students[:10])
+
+        rollup = QuarterlyCampusRollup.objects.get(campus='APB')
+        self.assertEqual(rollup.rsvps, self.SPOTS)
+
+
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        self.coordinator = User.objects.create_user(email='coord@example.com', password='pw', role='COORDINATOR')
+        self.students = {}
+        # name: (campus, bonus hours, [(year, hours, events, on time, late)])
+        for name, campus, bonus, ledger in [
+            ('Ann', 'APB', 0, [(2025, '4.50', 2, 1, 1), (2026, '3.00', 1, 1, 0)]),
+            ('Ben', 'APB', 2, [(2026, '5.00', 2, 2, 0)]),
+            ('Cat', 'DFC', 0, [(2026, '10.25', 3, 2, 1)]),
+            ('Dan', 'DFC', 1, []),
+            ('Eve', 'APK', 0, [(2026, '7.50', 2, 0, 2)]),
+        ]:
+            student = User.objects.create_user(
+                email=f'{name.lower()}@example.com', password='pw', role='STUDENT',
+                campus=campus, first_name=name, manual_bonus_hours=bonus,
+            )
+            for year, hours, events, on_time, late in ledger:
+                StudentHoursLedger.objects.create(
+                    user=student, year=year, activity_hours=hours, events_count=events,
+                    on_time_count=on_time, late_count=late,
+                )
+            self.students[name] = student
+
+    def test_totals_are_summed_across_years_with_bonus_hours(self):
+        rankings = build_leaderboard()['rankings']
+
+        self.assertEqual([r['first_name'] for r in rankings], ['Cat', 'Ann', 'Eve', 'Ben', 'Dan'])
+        ann = rankings[1]
+        self.assertEqual(ann['total_hours'], 7.5)
+        self.assertEqual((ann['events_attended'], ann['on_time_count'], ann['late_count']), (3, 2, 1))
+        # A student with no ledger rows still ranks on bonus hours alone
+        self.assertEqual(rankings[-1]['total_hours'], 1.0)
+        self.assertEqual(rankings[-1]['events_attended'], 0)
+
+    def test_ties_are_ordered_by_user_id(self):
+        rankings = build_leaderboard()['rankings']
+
+        # Ann and Eve both have 7.5 hours
+        self.assertEqual([r['user_id'] for r in rankings[1:3]], [self.students['Ann'].id, self.students['Eve'].id])
+
+    def test_campus_filter(self):
+        leaderboard = build_leaderboard('DFC')
+
+        self.assertEqual([r['first_name'] for r in leaderboard['rankings']], ['Cat', 'Dan'])
+        self.assertEqual(leaderboard['summary'], {'volunteers': 2, 'hours': 11.2})
+
+    def test_paging_walks_every_row_once(self):
+        client = APIClient()
+        client.force_authenticate(self.coordinator)
+
+        names, cursor = [], ''
+        while cursor is not None:
+            response = client.get('/api/users/leaderboard/', {'limit': 2, 'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['summary']['volunteers'], 5)
+            names += [r['first_name'] for r in response.data['rankings']]
+            cursor = response.data['next_cursor']
+
+        self.assertEqual(names, ['Cat', 'Ann', 'Eve', 'Ben', 'Dan'])
+
+    def test_cursor_survives_rows_above_it_moving(self):
+        _, cursor = page_rankings(build_leaderboard(), limit=2)
+
+        # Ben overtakes everyone after the first page was served
+        StudentHoursLedger.objects.filter(user=self.students['Ben']).update(activity_hours='20.00')
+        rows, next_cursor = page_rankings(build_leaderboard(), limit=2, cursor=cursor)
+
+        self.assertEqual([r['first_name'] for r in rows], ['Eve', 'Dan'])
+        self.assertIsNone(next_cursor)
+
+    def test_invalid_query_params(self):
+        client = APIClient()
+        client.force_authenticate(self.coordinator)
+
+        for params in [{'campus': 'XYZ'}, {'limit': 'ten'}, {'limit': 0}, {'limit': 2, 'cursor': 'abc'}]:
+            self.assertEqual(client.get('/api/users/leaderboard/', params).status_code, 400)
+
+
+class RankIndexTest(TestCase):
+    def setUp(self):
+        ranks._local_indexes.clear()
+        self.students = {
+            name: User.objects.create_user(
+                email=f'{name.lower()}@example.com', password='pw', role='STUDENT',
+                campus=campus, manual_bonus_hours=hours,
+            )
+            for name, campus, hours in [('Ann', 'APB', 10), ('Ben', 'APB', 6), ('Cat', 'DFC', 8), ('Dan', 'DFC', 0)]
+        }
+
+    def _ranks(self, name):
+        student = User.objects.get(pk=self.students[name].pk)
+        return ranks.get_student_ranks(student, float(student.manual_bonus_hours))
+
+    def _set_hours(self, name, hours):
+        # Bonus hours go through hours_changed() like every other hours write
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.students[name].pk).update(manual_bonus_hours=hours)
+            hours_changed([self.students[name].pk])
+
+    def test_initial_ranks(self):
+        self.assertEqual(self._ranks('Ann'), (1, 1))
+        self.assertEqual(self._ranks('Cat'), (2, 1))
+        self.assertEqual(self._ranks('Ben'), (3, 2))
+
+    def test_student_without_hours_is_inserted(self):
+        self.assertEqual(self._ranks('Ann'), (1, 1))
+
+        self._set_hours('Dan', 9)
+
+        self.assertEqual(self._ranks('Dan'), (2, 1))
+        self.assertEqual(self._ranks('Cat'), (3, 2))
+
+    def test_student_moves_up(self):
+        self.assertEqual(self._ranks('Ben'), (3, 2))
+
+        self._set_hours('Ben', 12)
+
+        self.assertEqual(self._ranks('Ben'), (1, 1))
+        self.assertEqual(self._ranks('Ann'), (2, 2))
+        self.assertEqual(self._ranks('Cat'), (3, 1))
+
+    def test_student_dropping_to_zero_is_removed(self):
+        self.assertEqual(self._ranks('Cat'), (2, 1))
+
+        self._set_hours('Ann', 0)
+
+        self.assertEqual(self._ranks('Cat'), (1, 1))
+        self.assertEqual(self._ranks('Ben'), (2, 1))
+
+    def _user_queries(self, read):
+        with CaptureQueriesContext(connection) as queries:
+            read()
+        return [q for q in queries.captured_queries if 'users_user' in q['sql']]
+
+    def test_rebuild_is_one_query_and_shared_between_processes(self):
+        self._ranks('Ann')
+        self._set_hours('Ben', 12)
+        student = User.objects.get(pk=self.students['Ben'].pk)
+
+        def read():
+            ranks.get_student_ranks(student, 12.0)
+
+        # First read after the change: one grouped query, whatever the number of students
+        self.assertEqual(len(self._user_queries(read)), 1)
+        # Same process again: nothing to rebuild
+        self.assertEqual(self._user_queries(read), [])
+        # Another process: loads the rebuilt index from the shared cache
+        ranks._local_indexes.clear()
+        self.assertEqual(self._user_queries(read), [])
+
+    def test_stale_copy_in_another_process_is_dropped(self):
+        self.assertEqual(self._ranks('Ben'), (3, 2))
+        # What another process sees: its local copy under the old token
+        stale = dict(ranks._local_indexes)
+
+        self._set_hours('Ben', 12)
+        ranks._local_indexes.clear()
+        ranks._local_indexes.update(stale)
+
+        self.assertEqual(self._ranks('Ben'), (1, 1))
+
+
+class DashboardSectionsTest(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(
+            email='student@example.com', password='pw', role='STUDENT', campus='APB', manual_bonus_hours=3,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_parse_sections(self):
+        self.assertEqual(dashboard.parse_sections(None), tuple(dashboard.SECTION_BUILDERS))
+        self.assertEqual(dashboard.parse_sections('badges, hours,badges'), ('badges', 'hours'))
+        for value in ['hours,bogus', ' , ']:
+            with self.assertRaises(ValueError):
+                dashboard.parse_sections(value)
+
+    def test_unknown_section_is_rejected(self):
+        response = self.client.get('/api/users/stats/', {'sections': 'hours,bogus'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_requested_sections_are_returned(self):
+        response = self.client.get('/api/users/stats/', {'sections': 'badges'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'awards', 'badges'})
+        self.assertTrue(response['X-Section-ETags'].startswith('badges="'))
+
+    def test_unchanged_sections_return_304(self):
+        first = self.client.get('/api/users/stats/', {'sections': 'hours,badges'})
+        again = self.client.get('/api/users/stats/', {'sections': 'hours,badges'}, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], first['ETag'])
+
+    def test_section_etags_are_independent(self):
+        first = self.client.get('/api/users/stats/', {'sections': 'hours,badges'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.student.pk).update(manual_bonus_hours=5)
+            hours_changed([self.student.pk])
+        self.student.refresh_from_db()
+        second = self.client.get('/api/users/stats/', {'sections': 'hours,badges'}, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data['total_hours'], 5.0)
+        first_tags = dict(tag.split('=') for tag in first['X-Section-ETags'].split(', '))
+        second_tags = dict(tag.split('=') for tag in second['X-Section-ETags'].split(', '))
+        self.assertNotEqual(first_tags['hours'], second_tags['hours'])
+        self.assertEqual(first_tags['badges'], second_tags['badges'])
+
+    def test_invalidate_dashboard_drops_only_the_given_sections(self):
+        dashboard.get_dashboard_section(self.student, 'hours')
+        dashboard.get_dashboard_section(self.student, 'learning')
+        self.student.first_name = 'Renamed'
+
+        dashboard.invalidate_dashboard([self.student.pk], sections=('hours',))
+
+        hours, _ = dashboard.get_dashboard_section(self.student, 'hours')
+        self.assertEqual(hours['first_name'], 'Renamed')
+        self.assertIsNotNone(cache.get(dashboard._section_key(self.student.pk, 'learning')))
+
+
+class MilestoneAwardTest(TestCase):
+    def setUp(self):
+        self.students = [
+            User.objects.create_user(email=f'student{i}@example.com', password='pw', role='STUDENT', manual_bonus_hours=45)
+            for i in range(2)
+        ]
+        self.ids = [s.pk for s in self.students]
+
+    def test_awards_each_reached_milestone_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            created = award_milestones(self.ids, notify=True)
+            again = award_milestones(self.ids, notify=True)
+
+        self.assertEqual({(b.user_id, b.badge_type) for b in created}, {(pk, '40_hours') for pk in self.ids})
+        self.assertTrue(all(b.pk for b in created))
+        self.assertEqual(again, [])
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_badge_won_by_a_concurrent_award_is_not_announced(self):
+        real_bulk_create = VolunteerBadge.objects.bulk_create
+
+        def race(badges, **kwargs):
+            # Another request awards the first student's badge in between
+            VolunteerBadge.objects.create(user=self.students[0], badge_type='40_hours')
+            return real_bulk_create(badges, **kwargs)
+
+        with self.captureOnCommitCallbacks(execute=True), mock.patch.object(VolunteerBadge.objects, 'bulk_create', side_effect=race):
+            created = award_milestones(self.ids, notify=True)
+
+        self.assertEqual([b.user_id for b in created], [self.students[1].pk])
+        self.assertEqual(VolunteerBadge.objects.filter(user=self.students[0]).count(), 1)
+        self.assertEqual([e.to for e in OutboundEmail.objects.all()], [[self.students[1].email]])
+
+
+@mock.patch('core.report_jobs.render_to_pdf', return_value=b'%PDF-1.4 test')
+class ReportJobTest(TestCase):
+    ANNUAL = ReportArtifact.ReportTypes.ANNUAL
+
+    def setUp(self):
+        cache.clear()
+        self.coordinator = User.objects.create_user(email='coord@example.com', password='pw', role='COORDINATOR')
+        self.year = timezone.now().year
+
+    def test_job_runs_and_its_artifact_is_reused(self, render):
+        artifact, job = request_report(self.ANNUAL, self.year, self.coordinator)
+        self.assertIsNone(artifact)
+        self.assertEqual(job.status, ReportJob.Status.PENDING)
+
+        claimed = claim_next_report_job()
+        self.assertEqual((claimed.pk, claimed.status), (job.pk, ReportJob.Status.RUNNING))
+        self.assertIsNone(claim_next_report_job())
+        self.assertEqual(process_report_jobs(), 0)
+
+        run_report_job(claimed)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.Status.DONE)
+
+        artifact, again = request_report(self.ANNUAL, self.year, self.coordinator)
+        self.assertEqual(artifact, job.artifact)
+        self.assertIsNone(again)
+        self.assertEqual(render.call_count, 1)
+
+    def test_identical_download_reuses_the_pending_job(self, render):
+        _, first = request_report(self.ANNUAL, self.year, self.coordinator)
+        _, second = request_report(self.ANNUAL, self.year, self.coordinator)
+        _, emailed = request_report(self.ANNUAL, self.year, self.coordinator, email_to=['exec@example.com'])
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertNotEqual(first.pk, emailed.pk)
+
+    def test_changed_data_queues_a_new_render(self, render):
+        _, job = request_report(self.ANNUAL, self.year, self.coordinator)
+        process_report_jobs()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            VolunteerActivity.objects.create(
+                title='New Event', campus='APB', description='d', details='d',
+                date_time=timezone.now(), duration_hours=2, created_by=self.coordinator,
+            )
+            rollups_changed(timezone.now())
+        artifact, new_job = request_report(self.ANNUAL, self.year, self.coordinator)
+
+        self.assertIsNone(artifact)
+        self.assertNotEqual(new_job.data_hash, job.data_hash)
+
+    def test_abandoned_running_job_is_reclaimed_not_reused(self, render):
+        _, job = request_report(self.ANNUAL, self.year, self.coordinator)
+        claim_next_report_job()
+        ReportJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - REPORT_JOB_STALE_AFTER - timedelta(minutes=1))
+
+        _, fresh = request_report(self.ANNUAL, self.year, self.coordinator)
+        self.assertNotEqual(fresh.pk, job.pk)
+
+        reclaimed = claim_next_report_job()
+        self.assertEqual(reclaimed.pk, job.pk)
+        self.assertGreater(reclaimed.started_at, timezone.now() - timedelta(minutes=1))
+
+    def test_failed_render_marks_the_job_failed(self, render):
+        render.return_value = None
+        _, job = request_report(self.ANNUAL, self.year, self.coordinator)
+
+        process_report_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.Status.FAILED)
+        self.assertEqual(job.error, "PDF Generation Error")
+        self.assertFalse(ReportArtifact.objects.exists())
+
+
+class MultiDaySeriesTest(TestCase):
+    def setUp(self):
+        self.coordinator = User.objects.create_user(email='coord@example.com', password='pw', role='COORDINATOR')
+        User.objects.create_user(email='student@example.com', password='pw', role='STUDENT', campus='APB')
+        self.client = APIClient()
+        self.client.force_authenticate(self.coordinator)
+
+    def _create_series(self):
+        start = timezone.localdate() + timedelta(days=7)
+        return self.client.post('/api/activities/create/', {
+            'is_multi_day': 'true', 'title': 'Garden', 'campus': 'APB', 'description': 'd', 'details': 'd',
+            'start_time': '09:00', 'duration_hours': '3', 'start_date': start.isoformat(),
+            'end_date': (start + timedelta(days=2)).isoformat(),
+        })
+
+    @override_settings(EVENT_DIGEST_ENABLED=True)
+    def test_series_joins_the_digest(self):
+        response = self._create_series()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(PendingEventDigest.objects.count(), 3)
+        self.assertFalse(EmailCampaign.objects.exists())
+
+    @override_settings(EVENT_DIGEST_ENABLED=False)
+    def test_series_is_announced_once_without_digest(self):
+        response = self._create_series()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(EmailCampaign.objects.count(), 1)
+        self.assertFalse(PendingEventDigest.objects.exists())
+
+
+class TicketPinTest(TestCase):
+    def setUp(self):
+        self.snapshots = [
+            SimpleNamespace(user=User.objects.create_user(email=f'student{i}@example.com', password='pw', role='STUDENT'), locked_hours=40.0)
+            for i in range(5)
+        ]
+
+    def test_draw_pins_are_distinct_and_unused(self):
+        used = {f"{n:06d}" for n in range(0, 10 ** 6, 2)}
+
+        pins = tickets.draw_pins(100, used)
+
+        self.assertEqual(len(set(pins)), 100)
+        self.assertTrue(all(len(pin) == tickets.PIN_DIGITS and int(pin) % 2 for pin in pins))
+
+    def test_draw_pins_refuses_when_the_space_is_exhausted(self):
+        with mock.patch('core.tickets.PIN_DIGITS', 1):
+            with self.assertRaises(ValueError):
+                tickets.draw_pins(3, {str(n) for n in range(8)})
+
+    def test_tickets_get_unique_pins(self):
+        issued = tickets.create_tickets(self.snapshots)
+
+        self.assertEqual(len({t.fallback_pin for t in issued}), 5)
+        self.assertEqual(ExcursionTicket.objects.count(), 5)
+
+    def test_pin_taken_concurrently_retries_the_batch(self):
+        real_draw = tickets.draw_pins
+        other = User.objects.create_user(email='other@example.com', password='pw', role='STUDENT')
+
+        def draw(count, used):
+            pins = real_draw(count, used)
+            if not ExcursionTicket.objects.exists():
+                # Another request issues a ticket with one of our PINs first
+                ExcursionTicket.objects.create(user=other, fallback_pin=pins[0])
+            return pins
+
+        with mock.patch('core.tickets.draw_pins', side_effect=draw) as drawn:
+            issued = tickets.create_tickets(self.snapshots)
+
+        self.assertEqual(drawn.call_count, 2)
+        self.assertEqual(len(issued), 5)
+        self.assertEqual(ExcursionTicket.objects.values('fallback_pin').distinct().count(), 6)
+
+    def test_gives_up_after_repeated_collisions(self):
+        other = User.objects.create_user(email='other@example.com', password='pw', role='STUDENT')
+        ExcursionTicket.objects.create(user=other, fallback_pin='000000')
+
+        with mock.patch('core.tickets.draw_pins', side_effect=lambda count, used: ['000000'] * count):
+            with self.assertRaises(IntegrityError):
+                tickets.create_tickets(self.snapshots[:1])
+
+
+class RSVPCapacityTest(TestCase):
+    """The conditional UPDATEs behind RSVPs, one request at a time (runs on SQLite)."""
+
+    def setUp(self):
+        self.coordinator = User.objects.create_user(email='coord@example.com', password='pw', role='COORDINATOR')
+        self.activity = VolunteerActivity.objects.create(
+            title='Small Event', campus='ALL', description='d', details='d',
+            date_time=timezone.now() + timedelta(days=7), duration_hours=2,
+            total_spots=2, created_by=self.coordinator,
+        )
+
+    def _spots_taken(self):
+        self.activity.refresh_from_db()
+        return self.activity.spots_taken
+
+    def test_reserve_stops_at_capacity(self):
+        self.assertEqual([reserve_spot(self.activity.pk) for _ in range(3)], [True, True, False])
+        self.assertEqual(self._spots_taken(), 2)
+
+    def test_release_frees_a_spot_and_never_goes_negative(self):
+        reserve_spot(self.activity.pk)
+        reserve_spot(self.activity.pk)
+
+        release_spot(self.activity.pk)
+        self.assertEqual(self._spots_taken(), 1)
+        self.assertTrue(reserve_spot(self.activity.pk))
+
+        for _ in range(3):
+            release_spot(self.activity.pk)
+        self.assertEqual(self._spots_taken(), 0)
+
+    def test_unlimited_events_always_have_room(self):
+        VolunteerActivity.objects.filter(pk=self.activity.pk).update(total_spots=None)
+
+        self.assertTrue(all(reserve_spot(self.activity.pk) for _ in range(5)))
+        self.assertEqual(self._spots_taken(), 5)
+
+    def test_rsvps_past_capacity_are_refused(self):
+        statuses = []
+        for i in range(3):
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user(email=f'student{i}@example.com', password='pw', role='STUDENT', campus='APB'))
+            statuses.append(client.post('/api/activities/signup/', {'activity': self.activity.pk}, format='json').status_code)
+
+        self.assertEqual(statuses, [201, 201, 400])
+        self.assertEqual(self._spots_taken(), 2)
+
+    def test_editing_an_event_keeps_spots_taken(self):
+        stale = VolunteerActivity.objects.get(pk=self.activity.pk)
+        # An RSVP lands after the edit request loaded the event
+        reserve_spot(self.activity.pk)
+
+        serializer = VolunteerActivitySerializer(stale, data={'title': 'Renamed'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(self._spots_taken(), 1)
+        self.assertEqual(self.activity.title, 'Renamed')
+
+
+class AttendanceSyncTest(TestCase):
+    def setUp(self):
+        self.coordinator = User.objects.create_user(email='coord@example.com', password='pw', role='COORDINATOR')
+        self.start = timezone.localtime(timezone.now()).replace(second=0, microsecond=0) - timedelta(hours=2)
+        self.activity = VolunteerActivity.objects.create(
+            title='Beach Cleanup', campus='ALL', description='d', details='d',
+            date_time=self.start, duration_hours=4, created_by=self.coordinator,
+        )
+        self.student = User.objects.create_user(email='student@example.com', password='pw', role='STUDENT', campus='APB')
+        self.signup = ActivitySignup.objects.create(user=self.student, activity=self.activity)
+        self.client = APIClient()
+        self.client.force_authenticate(self.coordinator)
+
+    def _action(self, action, minutes, action_id=None):
+        return {
+            'action_id': str(action_id or uuid.uuid4()), 'signup_id': self.signup.pk,
+            'action': action, 'time': (self.start + timedelta(minutes=minutes)).isoformat(),
+        }
+
+    def _sync(self, actions):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/activities/{self.activity.pk}/attendance/sync/', {'actions': actions}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_actions_are_applied_in_recorded_order(self):
+        # Sent out of order: the sign-out was queued before the sign-in
+        data = self._sync([self._action('signout', 90), self._action('signin', 30)])
+
+        self.assertEqual(data['applied'], 2)
+        self.signup.refresh_from_db()
+        self.assertTrue(self.signup.attended)
+        self.assertEqual(float(self.signup.hours_earned), 1.0)
+
+    def test_replayed_batch_is_not_applied_twice(self):
+        actions = [self._action('signin', 0), self._action('signout', 60)]
+        self._sync(actions)
+
+        data = self._sync(actions)
+
+        self.assertEqual((data['applied'], data['duplicates']), (2, 2))
+        self.assertTrue(all(r['duplicate'] for r in data['results']))
+        self.signup.refresh_from_db()
+        self.assertEqual(float(self.signup.hours_earned), 1.0)
+        self.assertEqual(len(self.signup.session_history), 1)
+
+    def test_repeated_action_id_in_one_batch_is_rejected(self):
+        action_id = uuid.uuid4()
+
+        data = self._sync([self._action('signin', 0, action_id), self._action('signin', 5, action_id)])
+
+        self.assertEqual([r['status'] for r in data['results']], ['applied', 'rejected'])
+
+    def test_future_times_are_rejected(self):
+        data = self._sync([self._action('signin', 0), self._action('signout', 60 * 24)])
+
+        self.assertEqual([r['status'] for r in data['results']], ['applied', 'rejected'])
+        self.assertEqual(data['results'][1]['error'], "Cannot log future time.")
+        self.signup.refresh_from_db()
+        self.assertIsNone(self.signup.sign_out_time)
+
+    def test_invalid_items_are_rejected_individually(self):
+        data = self._sync([{'action': 'signin'}, self._action('teleport', 0), self._action('signin', 0)])
+
+        self.assertEqual([r['status'] for r in data['results']], ['rejected', 'rejected', 'applied'])
+
+    def test_sign_ins_alone_do_not_touch_hours(self):
+        with mock.patch('core.attendance.hours_changed') as changed:
+            sync_attendance(self.activity, self.coordinator, [self._action('signin', 0)])
+            bulk_sign_out(VolunteerActivity.objects.create(
+                title='Empty', campus='ALL', description='d', details='d',
+                date_time=self.start, duration_hours=1, created_by=self.coordinator,
+            ), self.coordinator)
+
+        changed.assert_not_called()
+
+
+class CacheVersionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_the_keys(self):
+        before = versioned_cache_key('things', 'a')
+        bump_cache_version('things')
+        self.assertNotEqual(versioned_cache_key('things', 'a'), before)
+
+    def test_evicted_version_does_not_restart_at_an_old_number(self):
+        seen = {cache_version('things')}
+        for _ in range(3):
+            bump_cache_version('things')
+            seen.add(cache_version('things'))
+
+        cache.delete('things:version')
+        bump_cache_version('things')
+        self.assertNotIn(cache_version('things'), seen)
+        seen.add(cache_version('things'))
+
+        cache.delete('things:version')
+        self.assertNotIn(cache_version('things'), seen)
+
+
+class HoursLedgerTest(TestCase):
+    def setUp(self):
+        self.coordinator = User.objects.create_user(email='coord@example.com', password='pw', role='COORDINATOR')
+        self.start = timezone.now().replace(microsecond=0) - timedelta(days=1)
+        self.activity = VolunteerActivity.objects.create(
+            title='Food Drive', campus='ALL', description='d', details='d',
+            date_time=self.start, duration_hours=2, created_by=self.coordinator,
+        )
+        self.students = [
+            User.objects.create_user(email=f'student{i}@example.com', password='pw', role='STUDENT', campus='APB')
+            for i in range(3)
+        ]
+        # Early, inside the 5 minute grace period, and late
+        self.signups = [
+            ActivitySignup.objects.create(user=student, activity=self.activity, sign_in_time=self.start + timedelta(minutes=offset))
+            for student, offset in zip(self.students, (-10, 4, 6))
+        ]
+
+    def _ledger(self, student):
+        return StudentHoursLedger.objects.filter(user=student).values(
+            'activity_hours', 'events_count', 'early_count', 'on_time_count', 'late_count'
+        ).first()
+
+    def _assert_matches_live_totals(self):
+        self.assertEqual(verify_hours_ledger(), [])
+        self.assertEqual(StudentHoursLedger.objects.count(), len(list(_ledger_totals())))
+
+    def test_sign_out_fills_the_ledger_with_punctuality(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_sign_out(self.activity, self.coordinator)
+
+        self._assert_matches_live_totals()
+        early, grace, late = (self._ledger(student) for student in self.students)
+        self.assertEqual((early['early_count'], early['on_time_count'], early['late_count']), (1, 1, 0))
+        self.assertEqual((grace['early_count'], grace['on_time_count'], grace['late_count']), (0, 1, 0))
+        self.assertEqual((late['early_count'], late['on_time_count'], late['late_count']), (0, 0, 1))
+        self.assertEqual(early['activity_hours'], Decimal('2.00'))
+
+    def test_bonus_edit_leaves_activity_hours_alone(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_sign_out(self.activity, self.coordinator)
+        before = self._ledger(self.students[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.students[0].pk).update(manual_bonus_hours=10)
+            hours_changed([self.students[0].pk])
+
+        self.assertEqual(self._ledger(self.students[0]), before)
+        self._assert_matches_live_totals()
+
+    def test_signup_deletion_empties_the_ledger_row(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_sign_out(self.activity, self.coordinator)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.site._registry[ActivitySignup].delete_model(None, self.signups[0])
+
+        self.assertIsNone(self._ledger(self.students[0]))
+        self._assert_matches_live_totals()
+
+    def test_verify_reports_a_seeded_mismatch(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_sign_out(self.activity, self.coordinator)
+        StudentHoursLedger.objects.filter(user=self.students[0]).update(activity_hours='99.00')
+
+        mismatches = verify_hours_ledger()
+
+        self.assertEqual(len(mismatches), 1)
+        user_id, year, expected, stored = mismatches[0]
+        self.assertEqual((user_id, year), (self.students[0].pk, self.start.year))
+        self.assertEqual((expected[0], stored[0]), (Decimal('2.00'), Decimal('99.00')))
+
+        rebuild_hours_ledger()
+        self.assertEqual(verify_hours_ledger(), [])
+
+    def test_refresh_only_touches_the_given_students(self):
+        ActivitySignup.objects.filter(activity=self.activity).update(attended=True, hours_earned=1.5)
+
+        refresh_hours_ledger([self.students[0].pk])
+
+        self.assertEqual(self._ledger(self.students[0])['activity_hours'], Decimal('1.50'))
+        self.assertIsNone(self._ledger(self.students[1]))
+
+
+class RaceSnapshotTest(TestCase):
+    def setUp(self):
+        coordinator = User.objects.create_user(email='coord@example.com', password='pw', role='COORDINATOR')
+        self.today = timezone.localdate()
+        self.activities = {
+            days_ago: VolunteerActivity.objects.create(
+                title=f'Event {days_ago}', campus='ALL', description='d', details='d',
+                date_time=timezone.make_aware(datetime.combine(self.today - timedelta(days=days_ago), time(9))),
+                duration_hours=8, created_by=coordinator,
+            )
+            for days_ago in (3, 1)
+        }
+        self.students = [
+            User.objects.create_user(email=f'student{i}@example.com', password='pw', role='STUDENT', first_name=f'S{i}')
+            for i in range(RACE_TOP_K + 2)
+        ]
+        for hours, student in enumerate(self.students, start=1):
+            self._attend(student, 3, hours)
+        self._attend(self.students[0], 1, 20)
+
+    def _attend(self, student, days_ago, hours):
+        ActivitySignup.objects.create(user=student, activity=self.activities[days_ago], attended=True, hours_earned=hours)
+
+    def _frame(self, days_ago):
+        return LeaderboardRaceSnapshot.objects.get(date=self.today - timedelta(days=days_ago)).rankings
+
+    def test_daily_frames_hold_the_top_ten(self):
+        self.assertEqual(update_race_snapshots(), 4)
+
+        day3 = self._frame(3)
+        self.assertEqual(len(day3), RACE_TOP_K)
+        self.assertEqual([r['name'] for r in day3[:2]], ['S11', 'S10'])
+        self.assertEqual([r['hours'] for r in day3], sorted((r['hours'] for r in day3), reverse=True))
+        # Nobody earned hours on day 2, so it repeats day 3
+        self.assertEqual(self._frame(2), day3)
+        self.assertEqual(self._frame(1)[0], {'name': 'S0', 'hours': 21.0})
+        self.assertEqual(self._frame(0), self._frame(1))
+        self.assertEqual(update_race_snapshots(), 0)
+
+    def test_frames_written_concurrently_are_ignored(self):
+        real_bulk_create = LeaderboardRaceSnapshot.objects.bulk_create
+
+        def race(snapshots, **kwargs):
+            # Another request catches up the same days first
+            real_bulk_create([LeaderboardRaceSnapshot(date=s.date, rankings=s.rankings) for s in snapshots[:2]])
+            return real_bulk_create(snapshots, **kwargs)
+
+        with mock.patch.object(LeaderboardRaceSnapshot.objects, 'bulk_create', side_effect=race):
+            update_race_snapshots()
+
+        self.assertEqual(LeaderboardRaceSnapshot.objects.count(), 4)
+
+    def test_invalidated_days_are_rebuilt_from_the_new_hours(self):
+        update_race_snapshots()
+        self._attend(self.students[1], 1, 50)
+
+        invalidate_race_snapshots(self.activities[1].date_time)
+        self.assertEqual(LeaderboardRaceSnapshot.objects.count(), 2)
+
+        self.assertEqual(update_race_snapshots(), 2)
+        self.assertEqual(self._frame(1)[0], {'name': 'S1', 'hours': 52.0})
+        self.assertEqual(self._frame(3)[0]['name'], 'S11')
+
+    def test_race_endpoint_does_not_write(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(email='coord@example.com'))
+
+        response = client.get('/api/activities/leaderboard-race/')
+
+        self.assertEqual((response.status_code, response.data), (200, []))
+        self.assertFalse(LeaderboardRaceSnapshot.objects.exists())
+
+        update_race_snapshots()
+        self.assertEqual(len(client.get('/api/activities/leaderboard-race/').data), 4)
+
+
+class QuarterlyRollupTest(TestCase):
+    """The incremental rollup rows must always equal a fresh count of the signups."""
+
+    def setUp(self):
+        self.coordinator = User.objects.create_user(email='coord@example.com', password='pw', role='COORDINATOR')
+        self.students = [
+            User.objects.create_user(email=f'student{i}@example.com', password='pw', role='STUDENT', campus=campus)
+            for i, campus in enumerate(['APB', 'APB', 'SWC'])
+        ]
+        self.upcoming = VolunteerActivity.objects.create(
+            title='Upcoming', campus='ALL', description='d', details='d',
+            date_time=timezone.now() + timedelta(days=7), duration_hours=2, created_by=self.coordinator,
+        )
+        self.client = APIClient()
+
+    def _live(self):
+        totals = {}
+        for s in ActivitySignup.objects.select_related('user', 'activity'):
+            key = (*_quarter_of(s.activity.date_time), s.user.campus)
+            rsvps, attended, ontime, hours = totals.get(key, (0, 0, 0, Decimal('0')))
+            on_time = s.attended and s.sign_in_time is not None and s.sign_in_time <= s.activity.date_time + PUNCTUALITY_GRACE_PERIOD
+            totals[key] = (rsvps + 1, attended + s.attended, ontime + on_time, hours + (s.hours_earned if s.attended else 0))
+        return totals
+
+    def _rollup(self):
+        return {(r.year, r.quarter, r.campus): (r.rsvps, r.attended, r.ontime, r.hours) for r in QuarterlyCampusRollup.objects.all()}
+
+    def _rsvp(self, student):
+        self.client.force_authenticate(student)
+        response = self.client.post('/api/activities/signup/', {'activity': self.upcoming.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_rsvp_and_cancel(self):
+        for student in self.students:
+            self._rsvp(student)
+        self.assertEqual(self._rollup(), self._live())
+        self.assertEqual(self._rollup()[(*_quarter_of(self.upcoming.date_time), 'APB')][0], 2)
+
+        self.client.force_authenticate(self.students[2])
+        self.assertEqual(self.client.delete(f'/api/activities/{self.upcoming.pk}/signup/').status_code, 200)
+
+        self.assertEqual(self._rollup(), self._live())
+        self.assertNotIn('SWC', [campus for _, _, campus in self._rollup()])
+
+    def test_sign_out(self):
+        start = timezone.localtime(timezone.now()).replace(second=0, microsecond=0) - timedelta(hours=2)
+        activity = VolunteerActivity.objects.create(
+            title='Earlier', campus='ALL', description='d', details='d',
+            date_time=start, duration_hours=4, created_by=self.coordinator,
+        )
+        signups = [ActivitySignup.objects.create(user=student, activity=activity) for student in self.students[:2]]
+        actions = [
+            {'action_id': str(uuid.uuid4()), 'signup_id': signup.pk, 'action': action, 'time': (start + timedelta(minutes=minutes)).isoformat()}
+            for signup, late in zip(signups, (2, 20))
+            for action, minutes in (('signin', late), ('signout', 62))
+        ]
+
+        self.client.force_authenticate(self.coordinator)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/activities/{activity.pk}/attendance/sync/', {'actions': actions}, format='json')
+
+        self.assertEqual(self._rollup(), self._live())
+        self.assertEqual(self._rollup()[(*_quarter_of(start), 'APB')][1:3], (2, 1))
+
+    def test_moved_event_refreshes_its_old_and_new_quarter(self):
+        for student in self.students:
+            self._rsvp(student)
+        old_quarter = _quarter_of(self.upcoming.date_time)
+        # Two quarters on, past the current one
+        moved_to = self.upcoming.date_time + timedelta(days=200)
+
+        self.client.force_authenticate(self.coordinator)
+        with mock.patch('core.rollups.refresh_quarterly_rollup', wraps=refresh_quarterly_rollup) as refresh:
+            response = self.client.patch(f'/api/activities/{self.upcoming.pk}/', {'date_time': moved_to.isoformat()}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(c.args for c in refresh.call_args_list), sorted([old_quarter, _quarter_of(moved_to)]))
+        self.assertEqual(self._rollup(), self._live())
+        self.assertEqual({(y, q) for y, q, _ in self._rollup()}, {_quarter_of(moved_to)})
+
+
+class WaitlistTest(TestCase):
+    def setUp(self):
+        self.coordinator = User.objects.create_user(email='coord@example.com', password='pw', role='COORDINATOR')
+        self.activity = VolunteerActivity.objects.create(
+            title='Full Event', campus='ALL', description='d', details='d',
+            date_time=timezone.now() + timedelta(days=7), duration_hours=2,
+            total_spots=1, created_by=self.coordinator,
+        )
+        self.setup_role = ActivityRole.objects.create(activity=self.activity, role_type=ActivityRole.RoleTypes.SETUP)
+        self.students = [
+            User.objects.create_user(email=f'student{i}@example.com', password='pw', role='STUDENT', campus='APB', first_name=f'S{i}')
+            for i in range(4)
+        ]
+        self.assertEqual(self._as(self.students[0]).post('/api/activities/signup/', {'activity': self.activity.pk}, format='json').status_code, 201)
+        self._join(self.students[1], [self.setup_role.pk])
+        self._join(self.students[2])
+        OutboundEmail.objects.all().delete()
+
+    def _as(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def _join(self, student, roles=()):
+        response = self._as(student).post(f'/api/activities/{self.activity.pk}/waitlist/', {'selected_roles': list(roles)}, format='json')
+        self.assertEqual((response.status_code, response.data['on_waitlist']), (201, True))
+
+    def _signed_up(self):
+        return set(self.activity.signups.values_list('user__email', flat=True))
+
+    def _promotion_emails(self):
+        return list(OutboundEmail.objects.filter(subject__startswith='A Spot Opened Up').values_list('to', flat=True))
+
+    def test_cancel_promotes_the_next_in_line_with_their_roles(self):
+        response = self._as(self.students[0]).delete(f'/api/activities/{self.activity.pk}/signup/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._signed_up(), {'student1@example.com'})
+        signup = self.activity.signups.get()
+        self.assertEqual(list(signup.roles.all()), [self.setup_role])
+        self.assertEqual(self._promotion_emails(), [['student1@example.com']])
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.spots_taken, 1)
+        self.assertEqual(waitlist_positions(self.students[2]).get().position, 1)
+
+    def test_capacity_raise_promotes_with_one_merged_email(self):
+        response = self._as(self.coordinator).patch(f'/api/activities/{self.activity.pk}/', {'total_spots': 4}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._signed_up(), {'student0@example.com', 'student1@example.com', 'student2@example.com'})
+        self.assertFalse(WaitlistEntry.objects.exists())
+        self.assertEqual(self._promotion_emails(), [['student1@example.com', 'student2@example.com']])
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.spots_taken, 3)
+
+    def test_entries_already_signed_up_are_dropped_without_a_spot(self):
+        # Added to the event by hand while still queued
+        ActivitySignup.objects.create(user=self.students[1], activity=self.activity)
+        VolunteerActivity.objects.filter(pk=self.activity.pk).update(total_spots=2)
+
+        promoted = promote_waitlist(self.activity.pk)
+
+        self.assertEqual([signup.user for signup in promoted], [self.students[2]])
+        self.assertFalse(WaitlistEntry.objects.exists())
+        self.assertEqual(ActivitySignup.objects.filter(user=self.students[1], activity=self.activity).count(), 1)
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.spots_taken, 2)
+
+    def test_positions(self):
+        self._join(self.students[3])
+
+        positions = [
+            (entry.position, entry.waitlist_size)
+            for student in self.students[1:] for entry in waitlist_positions(student)
+        ]
+        self.assertEqual(positions, [(1, 3), (2, 3), (3, 3)])
+
+        self._as(self.students[1]).delete(f'/api/activities/{self.activity.pk}/waitlist/')
+        data = self._as(self.students[3]).get(f'/api/activities/{self.activity.pk}/waitlist/').data
+        self.assertEqual((data['on_waitlist'], data['position'], data['waitlist_size']), (True, 2, 2))
+        self.assertEqual([e['position'] for e in self._as(self.students[2]).get('/api/activities/waitlist/mine/').data], [1])
+
+    def test_joining_with_open_spots_is_refused(self):
+        VolunteerActivity.objects.filter(pk=self.activity.pk).update(total_spots=5)
+
+        response = self._as(self.students[3]).post(f'/api/activities/{self.activity.pk}/waitlist/', {}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WaitlistEntry.objects.filter(user=self.students[3]).exists())
+
+
+class CheckinTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.coordinator = User.objects.create_user(email='coord@example.com', password='pw', role='COORDINATOR')
+        self.start = timezone.localtime(timezone.now()).replace(second=0, microsecond=0) - timedelta(hours=2)
+        self.activity = VolunteerActivity.objects.create(
+            title='Beach Cleanup', campus='ALL', description='d', details='d',
+            date_time=self.start, duration_hours=4, created_by=self.coordinator,
+        )
+        self.student = User.objects.create_user(email='student@example.com', password='pw', role='STUDENT', campus='APB')
+        self.signup = ActivitySignup.objects.create(user=self.student, activity=self.activity)
+        self.client = APIClient()
+        self.client.force_authenticate(self.coordinator)
+
+    def _scan(self, minutes, **body):
+        body.setdefault('checkin_token', str(self.signup.checkin_token))
+        body['manual_time'] = (self.start + timedelta(minutes=minutes)).strftime('%H:%M')
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f'/api/activities/{self.activity.pk}/checkin/scan/', body, format='json')
+
+    def test_scans_sign_in_out_and_back_in(self):
+        with mock.patch('core.checkin.hours_changed', wraps=hours_changed) as changed:
+            first = self._scan(5)
+            self.assertEqual(changed.call_count, 0)
+            second = self._scan(65, checkin_token='', checkin_pin=get_checkin_pin(self.signup))
+            changed.assert_called_once_with([self.student.pk], since=self.activity.date_time)
+            third = self._scan(70)
+
+        self.assertEqual([r.data['action'] for r in (first, second, third)], ['signin', 'signout', 'resignin'])
+        self.assertEqual(second.data['hours'], 1.0)
+        self.assertEqual(float(StudentHoursLedger.objects.get(user=self.student).activity_hours), 1.0)
+        self.signup.refresh_from_db()
+        self.assertIsNone(self.signup.sign_out_time)
+
+    def test_a_second_scan_sees_the_first(self):
+        stale = ActivitySignup.objects.get(pk=self.signup.pk)
+        scan_checkin(self.activity, self.coordinator, stale, self.start + timedelta(minutes=5))
+
+        # Both scanners loaded the signup before either scan landed
+        result = scan_checkin(self.activity, self.coordinator, stale, self.start + timedelta(minutes=65))
+
+        self.assertEqual(result['action'], 'signout')
+        self.signup.refresh_from_db()
+        self.assertEqual(self.signup.sign_in_time, self.start + timedelta(minutes=5))
+
+    def test_unknown_or_cancelled_codes_are_rejected(self):
+        other = VolunteerActivity.objects.create(
+            title='Elsewhere', campus='ALL', description='d', details='d',
+            date_time=self.start, duration_hours=4, created_by=self.coordinator,
+        )
+        elsewhere = ActivitySignup.objects.create(user=self.student, activity=other)
+        cancelled_token = self.signup.checkin_token
+        ActivitySignup.objects.filter(pk=self.signup.pk).delete()
+
+        for token in (cancelled_token, elsewhere.checkin_token, uuid.uuid4(), 'not-a-uuid'):
+            self.assertEqual(self._scan(5, checkin_token=str(token)).status_code, 404)
+        self.assertEqual(self.client.get(f'/api/activities/checkin/{cancelled_token}/qr.png').status_code, 404)
+
+    def test_qr_is_rendered_once_and_served_as_png(self):
+        url = f'/api/activities/checkin/{self.signup.checkin_token}/qr.png'
+
+        with mock.patch('core.tickets.render_qr_png', return_value=b'png') as render:
+            first = self.client.get(url)
+            again = self.client.get(url)
+            unchanged = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual((first.status_code, first['Content-Type'], first.content), (200, 'image/png', b'png'))
+        self.assertEqual(again.content, b'png')
+        self.assertEqual(unchanged.status_code, 304)
+
+    def test_my_checkin_reports_a_pin_clash_as_retryable(self):
+        taken = ActivitySignup.objects.create(
+            user=User.objects.create_user(email='other@example.com', password='pw', role='STUDENT'),
+            activity=self.activity, checkin_pin='000000',
+        )
+        student = APIClient()
+        student.force_authenticate(self.student)
+
+        with mock.patch('core.checkin.draw_pins', return_value=[taken.checkin_pin]):
+            busy = student.get(f'/api/activities/{self.activity.pk}/checkin/')
+        ok = student.get(f'/api/activities/{self.activity.pk}/checkin/')
+
+        self.assertEqual((busy.status_code, busy['Retry-After']), (503, '1'))
+        self.assertEqual(ok.status_code, 200)
+        self.assertNotEqual(ok.data['checkin_pin'], taken.checkin_pin)
+        self.assertEqual(student.get(f'/api/activities/{self.activity.pk}/checkin/').data['checkin_pin'], ok.data['checkin_pin'])
+
+
+class BulkAttendanceTest(TestCase):
+    def setUp(self):
+        self.coordinator = User.objects.create_user(email='coord@example.com', password='pw', role='COORDINATOR')
+        # A one hour event that ended an hour ago
+        self.start = timezone.localtime(timezone.now()).replace(second=0, microsecond=0) - timedelta(hours=2)
+        self.activity = VolunteerActivity.objects.create(
+            title='Beach Cleanup', campus='ALL', description='d', details='d',
+            date_time=self.start, duration_hours=1, created_by=self.coordinator,
+        )
+        self.signups = [
+            ActivitySignup.objects.create(
+                user=User.objects.create_user(email=f'student{i}@example.com', password='pw', role='STUDENT', campus='APB'),
+                activity=self.activity,
+            )
+            for i in range(4)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.coordinator)
+
+    def _at(self, minutes):
+        return self.start + timedelta(minutes=minutes)
+
+    def _sign_in(self, signup_ids, minutes):
+        return self.client.post(
+            f'/api/activities/{self.activity.pk}/bulk_signin/',
+            {'signup_ids': signup_ids, 'manual_time': self._at(minutes).strftime('%H:%M')}, format='json',
+        )
+
+    def test_sign_in_skips_what_it_cannot_apply(self):
+        fresh, already = self.signups[:2]
+        ActivitySignup.objects.filter(pk=already.pk).update(sign_in_time=self._at(1))
+        own = ActivitySignup.objects.create(user=self.coordinator, activity=self.activity)
+
+        response = self._sign_in([fresh.pk, already.pk, own.pk, 999999, fresh.pk], 10)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(
+            [(r['signup_id'], r['status']) for r in response.data['results']],
+            [(fresh.pk, 'signed_in'), (already.pk, 'skipped'), (own.pk, 'skipped'), (999999, 'skipped')],
+        )
+        self.assertEqual(
+            dict(ActivitySignup.objects.filter(sign_in_time__isnull=False).values_list('pk', 'sign_in_time')),
+            {fresh.pk: self._at(10), already.pk: self._at(1)},
+        )
+
+    def test_sign_in_outside_the_event_is_refused(self):
+        for minutes, error in ((-30, "before event starts"), (90, "after event ended")):
+            response = self._sign_in([self.signups[0].pk], minutes)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(error, response.data['error'])
+
+        future = self.client.post(
+            f'/api/activities/{self.activity.pk}/bulk_signin/',
+            {'signup_ids': [self.signups[0].pk], 'manual_time': (timezone.localtime(timezone.now()) + timedelta(minutes=5)).strftime('%H:%M')},
+            format='json',
+        )
+        self.assertEqual(future.status_code, 400)
+        self.assertFalse(ActivitySignup.objects.filter(sign_in_time__isnull=False).exists())
+
+    def test_sign_out_closes_open_sessions_in_one_ledger_refresh(self):
+        early, late, done, absent = self.signups
+        self._sign_in([early.pk], 0)
+        self._sign_in([late.pk], 30)
+        self._sign_in([done.pk], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            scan_checkin(self.activity, self.coordinator, done, self._at(15))
+
+        with mock.patch('core.attendance.hours_changed', wraps=hours_changed) as changed:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(f'/api/activities/{self.activity.pk}/bulk_signout/')
+
+        changed.assert_called_once_with([early.user_id, late.user_id], since=self.activity.date_time)
+        self.assertEqual(
+            sorted((r['signup_id'], r['hours']) for r in response.data['results']),
+            [(early.pk, 1.0), (late.pk, 0.5)],
+        )
+        ledger = dict(StudentHoursLedger.objects.values_list('user_id', 'activity_hours'))
+        self.assertEqual({uid: float(h) for uid, h in ledger.items()}, {early.user_id: 1.0, late.user_id: 0.5, done.user_id: 0.25})
+        absent.refresh_from_db()
+        self.assertFalse(absent.attended)
+
+
+class LiveAwardsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.year = timezone.now().year
+        self.students = []
+        for i in range(9):
+            student = User.objects.create_user(
+                email=f'student{i}@example.com', password='pw', role='STUDENT', first_name=f'S{i}',
+                campus='APB' if i % 2 else 'SWC', volunteer_status='NEWCOMER' if i % 3 == 0 else 'SENIOR',
+                points=(i * 7) % 10 * 10, manual_bonus_hours=i % 2,
+            )
+            events = 1 + (i * 5) % 7
+            StudentHoursLedger.objects.create(
+                user=student, year=self.year, activity_hours=Decimal(3 * i + (i * 3) % 4),
+                events_count=events, early_count=min(events, i % 4),
+            )
+            self.students.append(student)
+
+    def _sorted_by_hand(self, weights):
+        """Every student's power score, computed one student at a time, best first."""
+        rows = [
+            (s.pk, s.volunteer_status, float(ledger.activity_hours) + float(s.manual_bonus_hours), ledger.events_count, s.points, ledger.early_count)
+            for s in self.students for ledger in [s.hours_ledger.get()]
+        ]
+        peaks = [max(r[i] for r in rows) or 1.0 for i in (2, 3, 4)]
+        scored = [
+            (round(
+                r[2] / peaks[0] * 100 * float(weights.hours_weight)
+                + r[3] / peaks[1] * 100 * float(weights.events_weight)
+                + r[4] / peaks[2] * 100 * float(weights.points_weight)
+                + r[5] / r[3] * 100 * float(weights.punctuality_weight), 2), r[0], r[1])
+            for r in rows
+        ]
+        return sorted(scored, reverse=True)
+
+    def _assert_matches_hand_sort(self, weights):
+        data = compute_live_awards()
+        expected = self._sorted_by_hand(weights)
+
+        self.assertEqual([(e['power_score'], e['id']) for e in data['overall']], [(p, pk) for p, pk, _ in expected[:LIVE_AWARDS_TOP_K]])
+        newcomers = [(p, pk) for p, pk, status in expected if status == 'NEWCOMER'][:LIVE_AWARDS_TOP_K]
+        self.assertEqual([(e['power_score'], e['id']) for e in data['newcomers']], newcomers)
+        return data
+
+    def test_heap_top_five_matches_a_full_sort(self):
+        data = self._assert_matches_hand_sort(PowerScoreWeights())
+
+        self.assertEqual(len(data['overall']), LIVE_AWARDS_TOP_K)
+        self.assertEqual({c['campus'] for c in data['campuses']}, {'APB', 'SWC'})
+
+    def test_scores_use_the_current_weights(self):
+        weights = PowerScoreWeights.objects.create(hours_weight=1, events_weight=0, points_weight=0, punctuality_weight=0)
+
+        data = self._assert_matches_hand_sort(weights)
+
+        self.assertEqual(data['overall'][0]['id'], self.students[-1].pk)
+        self.assertEqual(data['overall'][0]['power_score'], 100.0)
+
+    def test_cached_until_a_write_bumps_the_version(self):
+        unit = LearningUnit.objects.create(topic=Topic.objects.create(title='Safety'), title='Unit', content_text='t')
+        question = Question.objects.create(quiz=Quiz.objects.create(learning_unit=unit, title='Quiz'), text='q')
+        correct = Choice.objects.create(question=question, text='a', is_correct=True)
+        client = APIClient()
+        client.force_authenticate(self.students[0])
+        newcomer = APIClient()
+        newcomer.force_authenticate(User.objects.create_user(email='new@example.com', password='pw', role='STUDENT'))
+
+        writes = {
+            'weights': lambda: admin.site._registry[PowerScoreWeights].save_model(None, PowerScoreWeights(hours_weight=1), None, False),
+            'quiz': lambda: client.post(f'/api/lms/quizzes/{question.quiz_id}/submit/', {'answers': {str(question.pk): correct.pk}}, format='json'),
+            'hours': lambda: hours_changed([self.students[0].pk]),
+            'volunteer status': lambda: newcomer.post('/api/users/update-volunteer-status/', {'status': 'NEWCOMER'}, format='json'),
+        }
+        with mock.patch('core.awards.compute_live_awards', wraps=compute_live_awards) as compute:
+            get_live_awards()
+            get_live_awards()
+            self.assertEqual(compute.call_count, 1)
+
+            for calls, (name, write) in enumerate(writes.items(), start=2):
+                with self.subTest(name):
+                    with self.captureOnCommitCallbacks(execute=True):
+                        write()
+                    get_live_awards()
+                    get_live_awards()
+                    self.assertEqual(compute.call_count, calls)
+
+
+class QuarterlyReportCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        coordinator = User.objects.create_user(email='coord@example.com', password='pw', role='COORDINATOR')
+        self.student = User.objects.create_user(email='student@example.com', password='pw', role='STUDENT', campus='APB')
+        # Last year's event still belongs in the report
+        self.activity = VolunteerActivity.objects.create(
+            title='Last Year', campus='ALL', description='d', details='d',
+            date_time=timezone.now() - timedelta(days=400), duration_hours=3, created_by=coordinator,
+        )
+        ActivitySignup.objects.create(user=self.student, activity=self.activity, attended=True, hours_earned=3)
+        refresh_hours_ledger([self.student.pk])
+
+    def test_cached_context_equals_a_fresh_build(self):
+        self.assertEqual(get_quarterly_report_context(), build_quarterly_report_context())
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = get_quarterly_report_context()
+        self.assertEqual(cached['chart_labels'], '["Last Year"]')
+        self.assertEqual(cached['apb_total_hours'], 3.0)
+        self.assertFalse([q for q in queries if 'core_' in q['sql']])
+
+    def test_bump_refreshes_the_context(self):
+        get_quarterly_report_context()
+        Feedback.objects.create(user=self.student, message='More beach cleanups')
+        self.assertEqual(get_quarterly_report_context()['feedbacks'], [])
+
+        bump_cache_version('quarterly-report')
+
+        fresh = get_quarterly_report_context()
+        self.assertEqual(fresh['feedbacks'], [{'message': 'More beach cleanups'}])
+        self.assertEqual(fresh, build_quarterly_report_context())
+
+
+class TicketQRTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        student = User.objects.create_user(email='student@example.com', password='pw', role='STUDENT')
+        self.ticket = ExcursionTicket.objects.create(user=student, fallback_pin='123456')
+        self.url = f'/api/excursions/tickets/{self.ticket.ticket_uuid}/qr.png'
+
+    def test_png_is_rendered_once_and_revalidated(self):
+        with mock.patch('core.tickets.render_qr_png', return_value=b'png') as render:
+            first = self.client.get(self.url)
+            again = self.client.get(self.url)
+            unchanged = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual((first.status_code, first['Content-Type'], first.content), (200, 'image/png', b'png'))
+        self.assertEqual(again.content, b'png')
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertNotIn('immutable', first['Cache-Control'])
+
+    def test_revoked_and_unknown_tickets_get_no_code(self):
+        ExcursionTicket.objects.filter(pk=self.ticket.pk).update(status='revoked')
+
+        self.assertEqual(self.client.get(self.url).status_code, 410)
+        self.assertEqual(self.client.get(f'/api/excursions/tickets/{uuid.uuid4()}/qr.png').status_code, 404)
 
-# Create your tests here.
@@ -0,0 +1,130 @@
+import io
+import secrets
+import time
+
+import qrcode
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from users.outbox import outbound_emails, queue_emails
+from .ledger import get_total_hours
+from .models import ExcursionTicket
+
+# Base URL for links in emails, where there is no request to build them from
+SITE_URL = "https://cshaw.co.za"
+# Rendered QR PNGs (tickets and check-in codes) are cached server-side; the image for a uuid never changes
+TICKET_QR_CACHE_TTL = 60 * 60 * 24
+# Bump if the QR styling changes, so cached copies are not reused
+TICKET_QR_VERSION = 1
+
+PIN_DIGITS = 6
+# Retries when a concurrent request takes one of our PINs between the read and the insert
+PIN_ALLOCATION_ATTEMPTS = 3
+
+TICKET_EMAIL_SUBJECT = "🎉 You're Invited! Your Official C-SHAW Excursion Ticket is Inside! 🚌"
+TICKET_EVENT = {
+    'event_title': 'EMPOWERMENT HIKE',
+    'event_date': '28 August 2026',
+    'event_time': '08:00 – 16:00',
+    'location': 'UJ APK Gate 2',
+}
+
+
+def draw_pins(count, used):
+    """`count` distinct random PINs, none of them in the `used` set."""
+    space = 10 ** PIN_DIGITS
+    if count > space - len(used):
+        raise ValueError("Not enough unused PINs left.")
+    pins = set()
+    while len(pins) < count:
+        pin = f"{secrets.randbelow(space):0{PIN_DIGITS}d}"
+        if pin not in used:
+            pins.add(pin)
+    return list(pins)
+
+
+def create_tickets(snapshots):
+    """
+    Creates an active ticket for each leaderboard snapshot in one insert.
+    Used PINs are read once and new ones drawn around them; if another
+    request claims one of them first, the whole batch is retried.
+    """
+    for attempt in range(PIN_ALLOCATION_ATTEMPTS):
+        used = set(ExcursionTicket.objects.values_list('fallback_pin', flat=True))
+        tickets = [
+            ExcursionTicket(user=snap.user, fallback_pin=pin, status='active', locked_hours=snap.locked_hours)
+            for snap, pin in zip(snapshots, draw_pins(len(snapshots), used))
+        ]
+        try:
+            with transaction.atomic():
+                return ExcursionTicket.objects.bulk_create(tickets)
+        except IntegrityError:
+            if attempt == PIN_ALLOCATION_ATTEMPTS - 1:
+                raise
+
+
+def render_qr_png(data):
+    """PNG bytes of a QR code for `data`."""
+    qr = qrcode.QRCode(version=1, box_size=10, border=4)
+    qr.add_data(data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def ticket_qr_path(ticket_uuid):
+    return reverse('ticket-qr', kwargs={'ticket_uuid': ticket_uuid})
+
+
+def qr_etag(value):
+    return f"qr-{TICKET_QR_VERSION}-{value}"
+
+
+def get_qr_png(value):
+    """The QR PNG for `value` (a ticket or check-in uuid), rendered on first use and then served from the cache."""
+    key = f"qr:{TICKET_QR_VERSION}:{value}"
+    png = cache.get(key)
+    if png is None:
+        png = render_qr_png(str(value))
+        cache.set(key, png, TICKET_QR_CACHE_TTL)
+    return png
+
+
+def _ticket_email(ticket, user, total_hours):
+    attendee_name = f"{user.first_name} {user.last_name}".strip() or user.email
+    hours_val = ticket.locked_hours if ticket.locked_hours > 0 else total_hours
+    html_content = render_to_string('core/excursion_ticket_email.html', {
+        'first_name': user.first_name,
+        'attendee_name': attendee_name,
+        'campus': getattr(user, 'campus', '') or 'UJ Campus',
+        'hours': f"{hours_val:.1f}",
+        'pin': ticket.fallback_pin,
+        'qr_url': f"{SITE_URL}{ticket_qr_path(ticket.ticket_uuid)}",
+        **TICKET_EVENT,
+    })
+    return outbound_emails(TICKET_EMAIL_SUBJECT, [user.email], html_content)
+
+
+def issue_tickets(tickets_data):
+    """
+    Queues every ticket email in one outbox insert. `tickets_data` is
+    [{'user', 'ticket'}]. QR codes are not stored anywhere: the emails
+    link to the on-demand QR endpoint.
+    """
+    started = time.monotonic()
+    tickets = [data['ticket'] for data in tickets_data]
+    users = [data['user'] for data in tickets_data]
+
+    # Hours are only needed for tickets issued without locked hours
+    total_hours = get_total_hours([u for u, t in zip(users, tickets) if t.locked_hours <= 0])
+
+    emails = []
+    for user, ticket in zip(users, tickets):
+        emails.extend(_ticket_email(ticket, user, total_hours.get(user.id, 0.0)))
+    queue_emails(emails, source='tickets')
+
+    print(f"🎟️ Issued {len(tickets)} ticket(s) in {time.monotonic() - started:.2f}s")
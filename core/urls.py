@@ -20,8 +20,15 @@ urlpatterns = [
     path('api/users/stats/', views.StudentStatsView.as_view(), name='student-stats'),
     path('api/activities/mine/', views.CoordinatorMyEventsView.as_view(), name='my-created-events'),
     path('api/activities/<int:pk>/signup/', views.SignupCreateView.as_view(), name='activity-signup'),
+    path('api/activities/<int:pk>/waitlist/', views.WaitlistView.as_view(), name='activity-waitlist'),
+    path('api/activities/waitlist/mine/', views.my_waitlist_view, name='my-waitlist'),
     path('api/activities/executive-list/', views.ExecutiveCampusEventsView.as_view(), name='executive-campus-events'),
     path('api/activities/<int:pk>/bulk_signout/', views.bulk_signout_view, name='bulk-signout'),
+    path('api/activities/<int:pk>/bulk_signin/', views.bulk_signin_view, name='bulk-signin'),
+    path('api/activities/<int:pk>/attendance/sync/', views.attendance_sync_view, name='attendance-sync'),
+    path('api/activities/<int:pk>/checkin/', views.MyCheckinView.as_view(), name='my-checkin'),
+    path('api/activities/<int:pk>/checkin/scan/', views.checkin_scan_view, name='checkin-scan'),
+    path('api/activities/checkin/<uuid:checkin_token>/qr.png', views.checkin_qr_view, name='checkin-qr'),
     path('api/activities/<int:pk>/export_rsvps/', views.export_rsvps_csv, name='export-rsvps'),
     path('api/reports/event/<int:pk>/', views.event_report_view, name='event-report'),
     path('api/reports/quarterly/', views.quarterly_report_view, name='quarterly-report'),
@@ -29,8 +36,12 @@ urlpatterns = [
     path('api/reports/event/<int:pk>/email/', views.email_report_pdf, name='report-email'),
     path('api/reports/quarterly/download/', views.download_quarterly_pdf, name='quarterly-download'),
     path('api/reports/quarterly/email/', views.email_quarterly_pdf, name='quarterly-email'),
+    path('api/reports/jobs/<int:job_id>/', views.report_job_status, name='report-job-status'),
+    path('api/reports/jobs/<int:job_id>/download/', views.report_job_download, name='report-job-download'),
     path('api/users/leaderboard/', views.LeaderboardAPIView.as_view(), name='api-leaderboard'),
     path('api/communications/announce/', views.SendAnnouncementView.as_view(), name='send-announcement'),
+    path('api/communications/campaigns/<int:campaign_id>/', views.email_campaign_progress, name='email-campaign-progress'),
+    path('api/communications/email-metrics/', views.email_metrics, name='email-metrics'),
     path('feedback/', views.StudentFeedbackView.as_view(), name='student-feedback'),
     path('feedback-dashboard/', views.AdminFeedbackDashboard.as_view(), name='admin-feedback'),
     path('timeline-race/', views.leaderboard_page_view, name='leaderboard_race_page'),
@@ -42,6 +53,7 @@ urlpatterns = [
     
     # Excursion Endpoints
     path('excursions/scanner/', excursion_views.scanner_dashboard_view, name='scanner-dashboard'),
+    path('api/excursions/tickets/<uuid:ticket_uuid>/qr.png', excursion_views.ticket_qr_view, name='ticket-qr'),
     path('api/excursions/my-ticket/', excursion_views.MyHikingTicketAPIView.as_view(), name='my-hiking-ticket'),
     path('api/excursions/generate/', excursion_views.GenerateTicketsAPIView.as_view(), name='generate-tickets'),
     path('api/excursions/revoke/', excursion_views.RevokeTicketAPIView.as_view(), name='revoke-ticket'),
@@ -1,4 +1,7 @@
+import secrets
 from io import BytesIO
+from django.core.cache import cache
+from django.utils.http import parse_etags, quote_etag
 from django.template.loader import get_template
 from xhtml2pdf import pisa
 
@@ -9,4 +12,43 @@ def render_to_pdf(template_src, context_dict):
     pdf = pisa.pisaDocument(BytesIO(html.encode("ISO-8859-1")), result)
     if not pdf.err:
         return result.getvalue()
-    return None
\ No newline at end of file
+    return None
+
+
+def _fresh_version():
+    # Random start: a version key that was evicted must not restart at a
+    # number it held before, or entries cached under that number come back
+    return secrets.randbelow(2 ** 48)
+
+
+def cache_version(namespace):
+    """
+    Current version number of a cache namespace. Cached entries embed this in
+    their key, so bumping the version invalidates all of them at once.
+    """
+    return cache.get_or_set(f"{namespace}:version", _fresh_version, timeout=None)
+
+
+def bump_cache_version(namespace):
+    try:
+        cache.incr(f"{namespace}:version")
+    except ValueError:
+        # Key was evicted (or never set), start a fresh version
+        cache.set(f"{namespace}:version", _fresh_version(), timeout=None)
+
+
+def versioned_cache_key(namespace, *parts):
+    suffix = ':'.join(str(p) for p in parts)
+    return f"{namespace}:v{cache_version(namespace)}:{suffix}"
+
+
+def etag_matches(request, etag):
+    """True when the client's If-None-Match already names this ETag."""
+    return quote_etag(etag) in parse_etags(request.headers.get('If-None-Match', ''))
+
+
+def set_http_cache_headers(response, etag, max_age):
+    response['ETag'] = quote_etag(etag)
+    # Data is behind a login, so only the browser may keep a copy
+    response['Cache-Control'] = f"private, max-age={max_age}"
+    return response
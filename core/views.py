@@ -4,7 +4,7 @@ from django.contrib.auth.decorators import login_required
 from django.urls import reverse_lazy
 from rest_framework import generics, permissions
 from core.forms import FeedbackForm
-from .models import CareerToolkitAsset, VolunteerActivity, ActivitySignup, Feedback, Feedback
+from .models import CareerToolkitAsset, VolunteerActivity, ActivitySignup, Feedback, Feedback, ReportArtifact, ReportJob, WaitlistEntry
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -16,18 +16,36 @@ from .serializers import VolunteerActivitySerializer, ActivitySignupSerializer,
 from users.permissions import IsCoordinator, IsAuthorizedExecutiveOrCoordinator 
 from django.db.models.functions import ExtractMonth, ExtractYear
 import calendar
-from django.db.models import Sum, Count, F, Case, When, Value, IntegerField
+from django.db.models import Sum, Count, F, Case, When, Value, IntegerField, Max
 from datetime import date, timedelta, datetime
 from users.services import BackgroundEmailService, send_new_event_email, send_signup_confirmation_email , send_series_event_email
+from users.audience import Audience
+from users.metrics import email_metrics_summary
+from users.outbox import campaign_progress, start_campaign
 from django.db.models import Q
-from .reports import get_event_stats, get_comparative_stats, get_or_create_ai_insight, get_detailed_quarterly_stats
+from .reports import get_event_stats, get_comparative_stats, get_or_create_ai_insight, get_detailed_quarterly_stats, get_quarterly_report_context
 from django.db.models.functions import TruncQuarter
-from .utils import render_to_pdf
+from .utils import render_to_pdf, etag_matches, set_http_cache_headers, bump_cache_version
+from .ledger import hours_changed
+from .rsvp import handle_promotions, promote_waitlist, release_spot, reserve_spot, waitlist_positions
+from .checkin import checkin_qr_path, get_checkin_pin, next_checkin_action, scan_checkin
+from .tickets import get_qr_png, qr_etag
+from .attendance import SYNC_ACTIONS, SYNC_MAX_ACTIONS, bulk_sign_in, bulk_sign_out, close_session, event_window, parse_action_time, sync_attendance
+from .leaderboard import get_leaderboard, page_rankings
+from .awards import get_live_awards
+from .race import get_race_timeline, RACE_CACHE_MAX_AGE
+from .dashboard import build_dashboard, parse_sections
+from .rollups import rollups_changed
+from .report_jobs import request_report
+from .digests import digest_event
+from django.db import IntegrityError, transaction
 from django.core.mail import EmailMessage
 from django.conf import settings
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import quote_etag
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.mail import EmailMultiAlternatives, get_connection
-from users.models import User, VolunteerBadge
+from users.models import EmailCampaign, User, VolunteerBadge
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.views.generic import CreateView, CreateView, TemplateView
@@ -201,7 +219,11 @@ class ActivityCreateView(generics.CreateAPIView):
                 created_events_data.append(serializer.data)
 
             # ✅ ADDED: Send ONE email for the entire series after the loop finishes
-            if saved_activities:
+            if saved_activities and settings.EVENT_DIGEST_ENABLED:
+                # Every day is its own event in the next digest, like single events
+                for activity in saved_activities:
+                    digest_event(activity)
+            elif saved_activities:
                 # You will need to import this new function at the top of your views.py
                 send_series_event_email(saved_activities, original_title) 
 
@@ -213,8 +235,11 @@ class ActivityCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         # Standard save hook
         activity = serializer.save(created_by=self.request.user)
-        # Assuming you have this function imported or defined in utils.py
-        send_new_event_email(activity)
+        if settings.EVENT_DIGEST_ENABLED:
+            # Announced by the next send_event_digest run
+            digest_event(activity)
+        else:
+            send_new_event_email(activity)
     
 
 class ActivityDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -230,11 +255,30 @@ class ActivityDetailView(generics.RetrieveUpdateDestroyAPIView):
         # FIX: Remove the .filter(created_by=...)
         return VolunteerActivity.objects.all()
 
+    def perform_update(self, serializer):
+        old_date = serializer.instance.date_time
+        with transaction.atomic():
+            super().perform_update(serializer)
+            activity = serializer.instance
+            # The event date decides the ledger year of signups without a
+            # sign-out, punctuality and the quarterly rollups
+            if activity.date_time != old_date:
+                attendee_ids = list(activity.signups.filter(attended=True).values_list('user_id', flat=True))
+                hours_changed(attendee_ids, since=[old_date, activity.date_time])
+
+        # Raising total_spots hands the new spots to the waitlist
+        handle_promotions(activity, promote_waitlist(activity.pk))
+
     def perform_destroy(self, instance):
         # Optional: Extra check to ensure only Coordinators can delete
         if self.request.user.role != 'COORDINATOR':
              raise PermissionDenied("Only Coordinators can delete events.")
-        instance.delete()
+
+        # Deleting the event cascades to its signups, so the attendees' hours change too
+        with transaction.atomic():
+            attendee_ids = list(instance.signups.filter(attended=True).values_list('user_id', flat=True))
+            instance.delete()
+            hours_changed(attendee_ids, since=instance.date_time)
 
 
 class SignupCreateView(generics.CreateAPIView):
@@ -257,21 +301,24 @@ class SignupCreateView(generics.CreateAPIView):
         if ActivitySignup.objects.filter(user=user, activity_id=activity_id).exists():
             raise ValidationError("You have already signed up for this event.")
         
-        # 3. UPDATED: Capacity Check
-        # Only check if full IF total_spots is set (not None)
-        if activity.total_spots is not None and activity.spots_taken >= activity.total_spots:
-            raise ValidationError("Sorry, this event is fully booked.")
-        
-        # 4. Save Signup
-        signup_instance = serializer.save(user=user)
-
-        if role_ids:
-            valid_roles = activity.roles.filter(id__in=role_ids)
-            signup_instance.roles.set(valid_roles)
+        # 3. Reserve a spot and save the signup together: a conditional UPDATE
+        # takes the spot, so concurrent RSVPs can't oversell the event
+        try:
+            with transaction.atomic():
+                if not reserve_spot(activity.pk):
+                    raise ValidationError("Sorry, this event is fully booked. You can join the waitlist instead.")
+
+                signup_instance = serializer.save(user=user)
+                WaitlistEntry.objects.filter(user=user, activity=activity).delete()
+
+                if role_ids:
+                    valid_roles = activity.roles.filter(id__in=role_ids)
+                    signup_instance.roles.set(valid_roles)
+        except IntegrityError:
+            # A concurrent request from the same student got in first
+            raise ValidationError("You have already signed up for this event.")
 
-        # 5. Update Counter
-        activity.spots_taken += 1
-        activity.save()
+        rollups_changed(activity.date_time)
 
         send_signup_confirmation_email(user, activity)
 
@@ -294,17 +341,98 @@ class SignupCreateView(generics.CreateAPIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        signup.delete()
+        with transaction.atomic():
+            # Only the request that actually deletes the signup gives the spot back
+            _, deleted = ActivitySignup.objects.filter(pk=signup.pk).delete()
+            if deleted.get(ActivitySignup._meta.label):
+                release_spot(activity.pk)
+                # The freed spot goes straight to the next student in line
+                promoted = promote_waitlist(activity.pk)
+            else:
+                promoted = []
 
-        if activity.spots_taken > 0:
-            activity.spots_taken -= 1
-            activity.save()
+        handle_promotions(activity, promoted)
+        rollups_changed(activity.date_time)
 
         return Response(
             {"message": "Sign up cancelled successfully."},
             status=status.HTTP_200_OK
         )
 
+def _waitlist_entry_data(entry):
+    return {
+        "activity_id": entry.activity_id,
+        "title": entry.activity.title,
+        "date_time": entry.activity.date_time,
+        "position": entry.position,
+        "waitlist_size": entry.waitlist_size,
+        "joined_at": entry.created_at,
+    }
+
+
+class WaitlistView(views.APIView):
+    """
+    GET: the student's place in line for the activity.
+    POST: join the waitlist of a fully booked activity (body: selected_roles).
+    DELETE: leave it.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        activity = get_object_or_404(VolunteerActivity, pk=pk)
+        entry = waitlist_positions(request.user).filter(activity=activity).first()
+        if entry is None:
+            return Response({
+                "on_waitlist": False,
+                "waitlist_size": activity.waitlist.count(),
+                "spots_left": activity.spots_left,
+            })
+        return Response({"on_waitlist": True, "spots_left": activity.spots_left, **_waitlist_entry_data(entry)})
+
+    def post(self, request, pk):
+        user = request.user
+        activity = get_object_or_404(VolunteerActivity, pk=pk)
+
+        if activity.campus != 'ALL' and activity.campus != user.campus:
+            raise ValidationError(
+                f"You cannot RSVP for {activity.campus} events. You are registered at {user.campus}."
+            )
+        if activity.date_time <= timezone.now():
+            raise ValidationError("This event has already started.")
+        if ActivitySignup.objects.filter(user=user, activity=activity).exists():
+            raise ValidationError("You have already signed up for this event.")
+        if activity.spots_left is None or activity.spots_left > 0:
+            raise ValidationError("This event still has open spots. RSVP instead.")
+
+        role_ids = [int(role_id) for role_id in request.data.get('selected_roles', []) if str(role_id).isdigit()]
+        try:
+            WaitlistEntry.objects.create(activity=activity, user=user, role_ids=role_ids)
+        except IntegrityError:
+            raise ValidationError("You are already on the waitlist for this event.")
+
+        # A spot may have opened up between the check and the insert
+        handle_promotions(activity, promote_waitlist(activity.pk))
+
+        entry = waitlist_positions(user).filter(activity=activity).first()
+        if entry is None:
+            return Response({"on_waitlist": False, "message": "A spot opened up, you're signed up!"}, status=status.HTTP_201_CREATED)
+        return Response({"on_waitlist": True, **_waitlist_entry_data(entry)}, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, pk):
+        deleted, _ = WaitlistEntry.objects.filter(activity_id=pk, user=request.user).delete()
+        if not deleted:
+            return Response({"error": "You are not on the waitlist for this event."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"message": "You have left the waitlist."})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def my_waitlist_view(request):
+    """Every waitlist the student is on, with their positions, in one query."""
+    entries = waitlist_positions(request.user).order_by('activity__date_time')
+    return Response([_waitlist_entry_data(entry) for entry in entries])
+
+
 class AttendanceActionView(views.APIView):
     permission_classes = [IsAuthorizedExecutiveOrCoordinator]
 
@@ -398,35 +526,12 @@ class AttendanceActionView(views.APIView):
             if action_time <= signup.sign_in_time:
                 return Response({"error": "Sign-out time cannot be before or equal to Sign-in time."}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Record the audited time
-            signup.sign_out_time = action_time
-
-            # --- STRICT TIME BOUNDING CALCULATION ---
-            effective_sign_in = max(signup.sign_in_time, event_start_local)
-            
-            # We don't need min() here anymore because we already capped action_time above!
-            duration = signup.sign_out_time - effective_sign_in
-            actual_hours = max(0.0, duration.total_seconds() / 3600)
-
-            max_allowed = float(signup.activity.duration_hours or 0)
-            
-            # 🚨 FIX: Track this specific session chunk
-            session_data = {
-                "in": effective_sign_in.isoformat(),
-                "out": signup.sign_out_time.isoformat(),
-                "hours": round(actual_hours, 2)
-            }
-            if not isinstance(signup.session_history, list):
-                signup.session_history = []
-            signup.session_history.append(session_data)
-            
-            # Add to total accumulated hours
-            new_total = float(signup.hours_earned) + actual_hours
-
-            signup.hours_earned = round(new_total, 2)
+            # Record the audited time and add the session's hours (strictly bounded by the event start)
+            close_session(signup, action_time, event_start_local)
             signup.sign_out_facilitator = request.user
-            signup.attended = True
-            signup.save()
+            with transaction.atomic():
+                signup.save()
+                hours_changed([signup.user_id], since=signup.activity.date_time)
 
             return Response({
                 "message": "Signed Out",
@@ -447,7 +552,10 @@ class AttendanceActionView(views.APIView):
 
             signup.sign_in_time = action_time
             signup.sign_out_time = None  # Resets them to "In Progress"
-            signup.save()
+            with transaction.atomic():
+                signup.save()
+                # The new sign-in time changes their punctuality counters
+                hours_changed([signup.user_id], since=signup.activity.date_time)
 
             return Response({"message": "Re-Signed In", "time": signup.sign_in_time})
 
@@ -468,50 +576,194 @@ def bulk_signout_view(request, pk):
     if not activity.duration_hours:
          return Response({"error": "Cannot auto-sign out: No duration set for this activity."}, status=status.HTTP_400_BAD_REQUEST)
 
-    end_time = activity.date_time + timedelta(hours=float(activity.duration_hours))
+    # 2. Sign out everyone still "In Progress" at the official end time in one write
+    results = bulk_sign_out(activity, request.user)
+    if not results:
+        return Response({"message": "No pending students to sign out."})
 
-    # 2. Find students who are "In Progress" (Signed In but NOT Signed Out)
-    pending_signups = ActivitySignup.objects.filter(
-        activity=activity,
-        sign_in_time__isnull=False,
-        sign_out_time__isnull=True
-    )
+    return Response({
+        "message": f"Successfully signed out {len(results)} students.",
+        "count": len(results),
+        "results": results,
+    })
 
-    if not pending_signups.exists():
-        return Response({"message": "No pending students to sign out."})
+@api_view(['POST'])
+@permission_classes([IsAuthorizedExecutiveOrCoordinator])
+def bulk_signin_view(request, pk):
+    """
+    Signs in a walk-up queue of students at once.
+    Body: {"signup_ids": [...], "manual_time": "HH:MM" (optional, default now)}
+    """
+    try:
+        activity = VolunteerActivity.objects.get(pk=pk)
+    except VolunteerActivity.DoesNotExist:
+        return Response({"error": "Activity not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    count = 0
-    for signup in pending_signups:
-        # A. Set time to Official End Time (Not "Now")
-        signup.sign_out_time = end_time
-        
-        # B. Calculate Hours
-        # --- STRICT TIME BOUNDING CALCULATION ---
-        effective_sign_in = max(signup.sign_in_time, activity.date_time)
-        
-        duration = signup.sign_out_time - effective_sign_in
-        actual_hours = max(0.0, duration.total_seconds() / 3600)
-        
-        # 🚨 FIX: Track this specific session chunk
-        session_data = {
-            "in": effective_sign_in.isoformat(),
-            "out": signup.sign_out_time.isoformat(),
-            "hours": round(actual_hours, 2)
-        }
-        if not isinstance(signup.session_history, list):
-            signup.session_history = []
-        signup.session_history.append(session_data)
-        
-        # Add to total accumulated hours (DO NOT OVERWRITE!)
-        new_total = float(signup.hours_earned) + actual_hours
-        
-        signup.hours_earned = round(new_total, 2)
-        signup.sign_out_facilitator = request.user
-        signup.attended = True
-        signup.save()
-        count += 1
+    if request.user.role == 'STUDENT' and activity.campus not in ('ALL', request.user.campus):
+        return Response(
+            {"error": "You can only manage attendance for your own campus or 'All Campus' events."},
+            status=status.HTTP_403_FORBIDDEN)
+
+    signup_ids = request.data.get('signup_ids')
+    if not isinstance(signup_ids, list) or not signup_ids:
+        return Response({"error": "Provide a list of signup_ids."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        signup_ids = [int(signup_id) for signup_id in signup_ids]
+    except (TypeError, ValueError):
+        return Response({"error": "Invalid signup_ids."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        action_time = parse_action_time(activity, request.data.get('manual_time'))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Same window rules as a single sign-in
+    event_start, event_end = event_window(activity)
+    if action_time.date() != event_start.date():
+        return Response({"error": f"Date mismatch. Event is on {event_start.date().strftime('%d %B')}."}, status=status.HTTP_400_BAD_REQUEST)
+    if action_time < event_start:
+        return Response({"error": f"Cannot sign in before event starts at {event_start.strftime('%H:%M')}."}, status=status.HTTP_400_BAD_REQUEST)
+    if action_time > event_end:
+        return Response({"error": f"Cannot sign in after event ended at {event_end.strftime('%H:%M')}."}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = bulk_sign_in(activity, request.user, signup_ids, action_time)
+    signed_in = sum(1 for r in results if r['status'] == 'signed_in')
+    return Response({
+        "message": f"Signed in {signed_in} of {len(results)} students.",
+        "count": signed_in,
+        "results": results,
+    })
+
+@api_view(['POST'])
+@permission_classes([IsAuthorizedExecutiveOrCoordinator])
+def attendance_sync_view(request, pk):
+    """
+    Uploads attendance recorded offline by a scanner, in one round-trip.
+    Body: {"actions": [{"action_id": "<uuid>", "signup_id": 12, "action": "signin", "time": "<ISO 8601>"}, ...]}
+    Re-sending actions is safe: already applied action_ids return their stored result.
+    """
+    try:
+        activity = VolunteerActivity.objects.get(pk=pk)
+    except VolunteerActivity.DoesNotExist:
+        return Response({"error": "Activity not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.user.role == 'STUDENT' and activity.campus not in ('ALL', request.user.campus):
+        return Response(
+            {"error": "You can only manage attendance for your own campus or 'All Campus' events."},
+            status=status.HTTP_403_FORBIDDEN)
+
+    actions = request.data.get('actions')
+    if not isinstance(actions, list):
+        return Response({"error": "Provide a list of actions."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(actions) > SYNC_MAX_ACTIONS:
+        return Response({"error": f"Send at most {SYNC_MAX_ACTIONS} actions per sync."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        results = sync_attendance(activity, request.user, actions)
+    except IntegrityError:
+        # Another upload of the same actions committed first; retrying returns its results
+        return Response({"error": "These actions are already being synced. Please retry."}, status=status.HTTP_409_CONFLICT)
+
+    applied = sum(1 for r in results if r['status'] == 'applied')
+    return Response({
+        "message": f"Synced {applied} of {len(results)} actions.",
+        "applied": applied,
+        "rejected": sum(1 for r in results if r['status'] == 'rejected'),
+        "duplicates": sum(1 for r in results if r.get('duplicate')),
+        "results": results,
+    })
+
+CHECKIN_MESSAGES = {'signin': "Signed In", 'signout': "Signed Out", 'resignin': "Re-Signed In"}
+
+
+class MyCheckinView(views.APIView):
+    """The student's check-in QR code and PIN for an activity they RSVPed to."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        signup = ActivitySignup.objects.filter(activity_id=pk, user=request.user).first()
+        if not signup:
+            return Response({"error": "You are not signed up for this event."}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            checkin_pin = get_checkin_pin(signup)
+        except IntegrityError:
+            # Every draw clashed with a concurrent one; a moment later there is room
+            return Response(
+                {"error": "Your check-in code is busy being set up. Please try again in a moment."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"}
+            )
+
+        return Response({
+            "signup_id": signup.id,
+            "checkin_token": str(signup.checkin_token),
+            "checkin_pin": checkin_pin,
+            "qr_url": checkin_qr_path(signup.checkin_token),
+            "next_action": next_checkin_action(signup),
+        })
+
+
+def checkin_qr_view(request, checkin_token):
+    """
+    A signup's check-in QR code as a PNG. Like ticket QR codes, the uuid is
+    the secret and the image never changes.
+    """
+    if not ActivitySignup.objects.filter(checkin_token=checkin_token).exists():
+        raise Http404("Check-in code not found.")
+
+    etag = qr_etag(checkin_token)
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(get_qr_png(checkin_token), content_type='image/png')
+    response['ETag'] = quote_etag(etag)
+    response['Cache-Control'] = "public, max-age=31536000, immutable"
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthorizedExecutiveOrCoordinator])
+def checkin_scan_view(request, pk):
+    """
+    One scan at the door signs the student in (or out, or back in).
+    Body: {"checkin_token": "<uuid from the QR>"} or {"checkin_pin": "123456"},
+    optionally "action" to force signin/signout/resignin and "manual_time" ("HH:MM").
+    """
+    try:
+        activity = VolunteerActivity.objects.get(pk=pk)
+    except VolunteerActivity.DoesNotExist:
+        return Response({"error": "Activity not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.user.role == 'STUDENT' and activity.campus not in ('ALL', request.user.campus):
+        return Response(
+            {"error": "You can only manage attendance for your own campus or 'All Campus' events."},
+            status=status.HTTP_403_FORBIDDEN)
+
+    checkin_token = request.data.get('checkin_token')
+    checkin_pin = request.data.get('checkin_pin')
+    signups = ActivitySignup.objects.filter(activity=activity)
+    try:
+        if checkin_token:
+            signup = signups.filter(checkin_token=checkin_token).first()
+        elif checkin_pin:
+            signup = signups.filter(checkin_pin=str(checkin_pin)).first()
+        else:
+            return Response({"error": "Scan a QR code or enter a PIN."}, status=status.HTTP_400_BAD_REQUEST)
+    except DjangoValidationError:
+        # Not a uuid, e.g. a QR code from something else
+        signup = None
+    if not signup:
+        return Response({"error": "Invalid check-in code for this event."}, status=status.HTTP_404_NOT_FOUND)
+
+    action = request.data.get('action') or None
+    if action and action not in SYNC_ACTIONS:
+        return Response({"error": "Invalid action"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        action_time = parse_action_time(activity, request.data.get('manual_time'))
+        result = scan_checkin(activity, request.user, signup, action_time, action)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    return Response({"message": f"Successfully signed out {count} students."})
+    return Response({"message": CHECKIN_MESSAGES[result['action']], **result})
 
 @api_view(['GET'])
 @permission_classes([IsAuthorizedExecutiveOrCoordinator])
@@ -576,216 +828,29 @@ class CoordinatorMyEventsView(generics.ListAPIView):
         return VolunteerActivity.objects.exclude(description="Manual hours allocation event").order_by('-date_time')
 
 class StudentStatsView(APIView):
+    """
+    The student dashboard. The payload is assembled from independently
+    cached sections (see core.dashboard); ?sections=hours,badges returns
+    only those, and If-None-Match gets a 304 when none of them changed.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        TARGET_HOURS = 80.00
-        current_year = timezone.now().year 
-        
-        stats = ActivitySignup.objects.filter(
-            user=user, 
-            attended=True, 
-            sign_out_time__year=current_year 
-        ).aggregate(
-            total_hours=Sum('hours_earned'),
-            total_events=Count('id')
-        )
-        
-        # --- TOTAL HOURS CALCULATION ---
-        activity_hours = float(stats['total_hours'] or 0.00)
-        bonus_hours = float(getattr(user, 'manual_bonus_hours', 0.00)) 
-        total_hours = activity_hours + bonus_hours 
-        
-        events_count = stats['total_events'] or 0
-        remaining = round(max(0, TARGET_HOURS - total_hours), 2)
-        progress_percent = round(min(100, (total_hours / TARGET_HOURS) * 100), 1)
-        
-        # --- MOTIVATION LOGIC ---
-        if total_hours >= 80:
-            motivation = "👑 GOAT STATUS! 80+ hours? You really left no crumbs. Absolute legend."
-        elif total_hours >= 70:
-            motivation = "🔥 70 Hours? You're eating this up. Final stretch, champ!"
-        elif total_hours >= 60:
-            motivation = "💅 60 Hours done. Highkey impressive."
-        elif total_hours >= 50:
-            motivation = "✨ 50 Hours! You have officially entered your Volunteer Era."
-        elif total_hours >= 40:
-            motivation = "🔋 Halfway Point! 40 hours locked in. Main character energy."
-        elif total_hours >= 30:
-            motivation = "🫡 30 Hours deep. The dedication is real. We see you!"
-        elif total_hours >= 20:
-            motivation = "👨‍🍳 20 Hours? Okay, hold up... you are cooking!"
-        elif total_hours >= 10:
-            motivation = "⚡ Double digits (10h)! Huge W. Keep that momentum going."
-        elif total_hours > 0:
-            motivation = "👀 You started! The first hour is always the hardest. Let's get this bread."
-        else:
-            motivation = f"👋 Welcome to {current_year}! New year, new grind. Let's get it."
+        try:
+            sections = parse_sections(request.query_params.get('sections'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        recruits_count = user.recruits.count()
-        
-        # 1. Get all students
-        # (Assuming your User model is imported. Adjust import if needed)
-        from users.models import User, VolunteerBadge 
-        all_students = User.objects.filter(role=User.Roles.STUDENT)
-        
-        # 2. Start a dictionary with EVERY student's bonus hours
-        peer_totals = {u.id: float(u.manual_bonus_hours or 0.0) for u in all_students}
-        
-        # 3. Add their actual activity hours for the current year
-        yearly_activity = ActivitySignup.objects.filter(
-            attended=True,
-            sign_out_time__year=current_year,
-            user__role=User.Roles.STUDENT
-        ).values('user').annotate(
-            hours=Sum('hours_earned')
-        )
-        
-        for item in yearly_activity:
-            uid = item['user']
-            if uid in peer_totals:
-                peer_totals[uid] += float(item['hours'] or 0.0)
-                
-        # 4. Calculate Global Rank (Compare against ALL students)
-        global_rank = 1
-        for uid, peer_hours in peer_totals.items():
-            if peer_hours > total_hours and uid != user.id:
-                global_rank += 1
-                
-        # 5. Calculate Campus Rank (Compare ONLY against their campus)
-        campus_rank = 1
-        campus_student_ids = set(all_students.filter(campus=user.campus).values_list('id', flat=True))
-        for uid, peer_hours in peer_totals.items():
-            if uid in campus_student_ids and peer_hours > total_hours and uid != user.id:
-                campus_rank += 1
-                
-        
-        punctuality_data = ActivitySignup.objects.filter(
-            user=user, 
-            attended=True, 
-            sign_out_time__year=current_year,
-            sign_in_time__isnull=False # Ensure they actually signed in
-        ).annotate(
-            is_early=Case(
-                When(sign_in_time__lte=F('activity__date_time'), then=Value(1)),
-                default=Value(0),
-                output_field=IntegerField()
-            ),
-            is_late=Case(
-                When(sign_in_time__gt=F('activity__date_time'), then=Value(1)),
-                default=Value(0),
-                output_field=IntegerField()
-            )
-        ).aggregate(
-            early_total=Sum('is_early'),
-            late_total=Sum('is_late')
-        )
+        payload, section_etags = build_dashboard(request.user, sections)
+        etag = '-'.join(section_etags[section] for section in sections)
 
-        early_count = punctuality_data['early_total'] or 0
-        late_count = punctuality_data['late_total'] or 0
-
-
-        if early_count > late_count:
-            punctuality_status = "Usually Early"
-            punc_color = "#10B981" # Success Green
-            punc_bg = "rgba(16, 185, 129, 0.15)"
-        elif late_count > early_count:
-            punctuality_status = "Usually Late"
-            punc_color = "#ef4444" # Danger Red
-            punc_bg = "rgba(239, 68, 68, 0.15)"
-        elif early_count == late_count and early_count > 0:
-            punctuality_status = "Perfectly Even"
-            punc_color = "#f59e0b" # Warning Orange
-            punc_bg = "rgba(245, 158, 11, 0.15)"
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
         else:
-            punctuality_status = "No Data Yet"
-            punc_color = "#64748b" # Muted Slate
-            punc_bg = "rgba(100, 116, 139, 0.15)"
-
-        # --- FORMAT MONTHLY DATA ---
-        monthly_data = ActivitySignup.objects.filter(
-            user=user, 
-            attended=True,
-            sign_out_time__year=current_year 
-        ).annotate(
-            month=ExtractMonth('sign_out_time')
-        ).values('month').annotate(
-            hours=Sum('hours_earned')
-        ).order_by('-month')
-
-        formatted_months = []
-        for item in monthly_data:
-            month_name = calendar.month_name[item['month']]
-            formatted_months.append({
-                'name': month_name,
-                'hours': item['hours']
-            })
-
-        user_awards = user.awards.all()
-        awards_data = [{'name': a.name, 'icon': a.icon, 'color': a.color, 'description': a.description, 'date_awarded': a.date_awarded} for a in user_awards]
-        
-        # --- BADGES LOGIC ---
-        if total_hours >= 40:
-            VolunteerBadge.objects.get_or_create(user=user, badge_type='40_hours')
-        if total_hours >= 80:
-            VolunteerBadge.objects.get_or_create(user=user, badge_type='80_hours')
-            
-        user_badges = VolunteerBadge.objects.filter(user=user)
-        badges_data = [{'type': b.badge_type, 'date_earned': b.date_earned.strftime("%b %d, %Y")} for b in user_badges]
-        
-        # --- LEARNING ACCOLADES LOGIC ---
-        from lms.models import StudentProgress
-        accolades = StudentProgress.objects.filter(user=user, score=100.0).select_related('quiz')
-        learning_accolades = [
-            {
-                'quiz_title': acc.quiz.title,
-                'date_completed': acc.completed_at.strftime("%b %d, %Y")
-            } for acc in accolades
-        ]
-        
-        recent_events = ActivitySignup.objects.filter(
-            user=user, 
-            attended=True,
-            sign_out_time__year=current_year 
-        ).order_by('-sign_out_time')
-        
-        events_list = [{
-            'title': e.activity.title,
-            'date': e.sign_out_time,
-            'hours': e.hours_earned,
-            'session_history': e.session_history
-        } for e in recent_events]
-
-        return Response({
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "campus": user.campus,  
-            "is_executive": bool(user.executive_position),
-            "current_year": current_year, 
-            "total_hours": total_hours,
-            "activity_hours": activity_hours,
-            "bonus_hours": bonus_hours,      
-            "events_count": events_count,
-            "recruits_count": recruits_count,
-            "target": TARGET_HOURS,
-            "remaining": remaining,
-            "progress_percent": progress_percent,
-            "motivation": motivation,
-            "rank_global": global_rank,   # 👈 Returning new global rank
-            "rank_campus": campus_rank,   # 👈 Returning new campus rank
-            "monthly": formatted_months,
-            "history": events_list,
-            "awards": awards_data,
-            "badges": badges_data,
-            "learning_accolades": learning_accolades,
-            "punctuality_status": punctuality_status,
-            "punctuality_color": punc_color,
-            "punctuality_bg": punc_bg,
-            "early_count": early_count,
-            "late_count": late_count,
-            "executive_position": user.executive_position,
-        })
+            response = Response(payload)
+        response['X-Section-ETags'] = ', '.join(f'{section}="{tag}"' for section, tag in section_etags.items())
+        # max-age=0: clients always revalidate, which is a cheap 304 when nothing moved
+        return set_http_cache_headers(response, etag, 0)
         
 
 @api_view(['GET'])
@@ -820,39 +885,46 @@ def quarterly_report_view(request):
     return Response({"year": year, "data": report_data})
 
 
+def _pdf_response(artifact):
+    response = HttpResponse(bytes(artifact.pdf), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{artifact.filename}"'
+    return response
+
+
+def _queued_report_response(job, message=None):
+    return Response({
+        "message": message or "Your report is being generated.",
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/reports/jobs/{job.id}/",
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+def _parse_recipients(emails_raw):
+    return [e.strip() for e in emails_raw.split(',') if e.strip()]
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthorizedExecutiveOrCoordinator])
 def download_report_pdf(request, pk):
     """
-    Generates and downloads the PDF directly.
+    Serves the stored PDF if the event's numbers haven't changed since it
+    was last rendered; otherwise queues a render and returns 202 with a job id.
     """
-    stats = get_event_stats(pk)
-    comparison = get_comparative_stats(pk)
-    activity = VolunteerActivity.objects.get(pk=pk)
-    
-    # Reuse the AI logic (fetch from DB or generate)
-    ai_analysis = get_or_create_ai_insight(activity, stats, comparison)
+    try:
+        artifact, job = request_report(ReportArtifact.ReportTypes.EVENT, pk, request.user)
+    except VolunteerActivity.DoesNotExist:
+        return Response({"error": "Activity not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    data = {
-        'stats': stats,
-        'comparison': comparison,
-        'ai_analysis': ai_analysis
-    }
-    
-    pdf = render_to_pdf('core/pdf_report.html', data)
-    
-    if pdf:
-        response = HttpResponse(pdf, content_type='application/pdf')
-        filename = f"Report_{stats['title'].replace(' ', '_')}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
-    return Response({"error": "PDF Generation Error"}, status=500)
+    if artifact:
+        return _pdf_response(artifact)
+    return _queued_report_response(job)
 
 @api_view(['POST'])
 @permission_classes([IsAuthorizedExecutiveOrCoordinator])
 def email_report_pdf(request, pk):
     """
-    Generates PDF and emails it to a list of recipients.
+    Queues the PDF to be emailed to a list of recipients.
     Expects JSON: { "emails": "a@b.com, c@d.com" }
     """
     emails_raw = request.data.get('emails', '')
@@ -860,57 +932,24 @@ def email_report_pdf(request, pk):
         return Response({"error": "No email addresses provided."}, status=400)
 
     # Clean email list
-    recipient_list = [e.strip() for e in emails_raw.split(',') if e.strip()]
-
-    # Generate Data & PDF
-    stats = get_event_stats(pk)
-    comparison = get_comparative_stats(pk)
-    activity = VolunteerActivity.objects.get(pk=pk)
-    ai_analysis = get_or_create_ai_insight(activity, stats, comparison)
-
-    data = {'stats': stats, 'comparison': comparison, 'ai_analysis': ai_analysis}
-    pdf = render_to_pdf('core/pdf_report.html', data)
+    recipient_list = _parse_recipients(emails_raw)
 
-    if not pdf:
-        return Response({"error": "PDF Generation Failed"}, status=500)
-
-    # Send Email
     try:
-        subject = f"Event Report: {stats['title']}"
-        message = f"Please find attached the performance report for the event '{stats['title']}' held on {stats['date']}."
-        email = EmailMessage(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL, # Ensure this is set in settings.py
-            recipient_list
-        )
-        filename = f"Report_{stats['title'].replace(' ', '_')}.pdf"
-        email.attach(filename, pdf, 'application/pdf')
-        email.send()
-        
-        return Response({"message": f"Report sent to {len(recipient_list)} recipients."})
-    except Exception as e:
-        print(f"Email Error: {e}")
-        return Response({"error": "Failed to send email."}, status=500)
+        _, job = request_report(ReportArtifact.ReportTypes.EVENT, pk, request.user, email_to=recipient_list)
+    except VolunteerActivity.DoesNotExist:
+        return Response({"error": "Activity not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    return _queued_report_response(job, f"Report will be sent to {len(recipient_list)} recipients shortly.")
     
 @api_view(['GET'])
 @permission_classes([IsAuthorizedExecutiveOrCoordinator])
 def download_quarterly_pdf(request):
     year = int(request.query_params.get('year', timezone.now().year))
-    report_data = get_detailed_quarterly_stats(year)
-    
-    data = {
-        'year': year,
-        'report_data': report_data
-    }
-    
-    pdf = render_to_pdf('core/quarterly_pdf.html', data)
-    
-    if pdf:
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="Annual_Report_{year}.pdf"'
-        return response
-    return Response({"error": "PDF Generation Error"}, status=500)
+    artifact, job = request_report(ReportArtifact.ReportTypes.ANNUAL, year, request.user)
+
+    if artifact:
+        return _pdf_response(artifact)
+    return _queued_report_response(job)
 
 @api_view(['POST'])
 @permission_classes([IsAuthorizedExecutiveOrCoordinator])
@@ -921,26 +960,29 @@ def email_quarterly_pdf(request):
     if not emails_raw:
         return Response({"error": "No email addresses provided."}, status=400)
 
-    recipient_list = [e.strip() for e in emails_raw.split(',') if e.strip()]
+    recipient_list = _parse_recipients(emails_raw)
+    _, job = request_report(ReportArtifact.ReportTypes.ANNUAL, year, request.user, email_to=recipient_list)
 
-    # Generate PDF
-    report_data = get_detailed_quarterly_stats(year)
-    data = {'year': year, 'report_data': report_data}
-    pdf = render_to_pdf('core/quarterly_pdf.html', data)
+    return _queued_report_response(job, f"Yearly report will be sent to {len(recipient_list)} recipients shortly.")
 
-    if not pdf:
-        return Response({"error": "PDF Generation Failed"}, status=500)
+@api_view(['GET'])
+@permission_classes([IsAuthorizedExecutiveOrCoordinator])
+def report_job_status(request, job_id):
+    job = get_object_or_404(ReportJob, pk=job_id)
+    data = {"job_id": job.id, "status": job.status}
+    if job.status == ReportJob.Status.DONE and job.artifact_id:
+        data["download_url"] = f"/api/reports/jobs/{job.id}/download/"
+    elif job.status == ReportJob.Status.FAILED:
+        data["error"] = "PDF Generation Error"
+    return Response(data)
 
-    try:
-        subject = f"Annual Volunteer Report: {year}"
-        message = f"Please find attached the quarterly breakdown and campus performance report for the year {year}."
-        email = EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, recipient_list)
-        email.attach(f"Annual_Report_{year}.pdf", pdf, 'application/pdf')
-        email.send()
-        return Response({"message": f"Yearly report sent to {len(recipient_list)} recipients."})
-    except Exception as e:
-        print(f"Email Error: {e}")
-        return Response({"error": "Failed to send email."}, status=500)
+@api_view(['GET'])
+@permission_classes([IsAuthorizedExecutiveOrCoordinator])
+def report_job_download(request, job_id):
+    job = get_object_or_404(ReportJob.objects.select_related('artifact'), pk=job_id)
+    if job.status != ReportJob.Status.DONE or job.artifact is None:
+        return Response({"error": "Report is not ready."}, status=status.HTTP_409_CONFLICT)
+    return _pdf_response(job.artifact)
     
 class SendAnnouncementView(APIView):
     permission_classes = [IsAuthorizedExecutiveOrCoordinator] 
@@ -954,19 +996,15 @@ class SendAnnouncementView(APIView):
         if not subject or not message:
             return Response({"error": "Subject and Message are required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 1. Select Recipients (DB Queries stay in the main thread)
+        # 1. Describe the audience; the outbox worker streams the actual recipients
+        audience, custom_emails = None, None
         if target_campus == 'CUSTOM':
             if not custom_emails_raw.strip():
                 return Response({"error": "No custom emails provided."}, status=status.HTTP_400_BAD_REQUEST)
-            recipient_list = [email.strip() for email in custom_emails_raw.split(',') if email.strip()]
-            
-        elif target_campus == 'ALL':
-            recipient_list = list(User.objects.filter(is_active=True).values_list('email', flat=True))
+            custom_emails = [email.strip() for email in custom_emails_raw.split(',') if email.strip()]
         else:
-            recipient_list = list(User.objects.filter(campus=target_campus, is_active=True).values_list('email', flat=True))
-        
-        if not recipient_list:
-            return Response({"error": "No users found for this selection."}, status=status.HTTP_404_NOT_FOUND)
+            # Opted-out users are skipped
+            audience = Audience(campus=target_campus)
 
         # 2. Render HTML Email (Rendering stays in the main thread)
         html_content = render_to_string('core/announcement.html', {
@@ -974,82 +1012,87 @@ class SendAnnouncementView(APIView):
             'message': message
         })
 
-        # 3. Offload the actual sending to the Background Thread!
+        # 3. Record the campaign; the outbox worker queues and sends it
         try:
-            BackgroundEmailService._send_async(
+            campaign = start_campaign(
                 subject=f"[C-SHAW] {subject}",
-                to_emails=[settings.DEFAULT_FROM_EMAIL], 
                 html_content=html_content,
-                bcc_emails=recipient_list 
+                audience=audience,
+                custom_emails=custom_emails,
+                created_by=request.user
             )
-
-            # Instantly return success to the frontend while emails send in the background
-            return Response({"message": f"Announcement queued to send to {len(recipient_list)} recipient(s)."})
-
         except Exception as e:
             print(f"Announcement Queue Error: {e}")
             return Response({"error": "Failed to queue emails."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        
+
+        if campaign is None:
+            return Response({"error": "No users found for this selection."}, status=status.HTTP_404_NOT_FOUND)
+
+        # Instantly return success to the frontend while emails send in the background
+        return Response({
+            "message": f"Announcement queued to send to {campaign.total_recipients} recipient(s).",
+            "campaign_id": campaign.id,
+            "progress_url": f"/api/communications/campaigns/{campaign.id}/",
+        })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthorizedExecutiveOrCoordinator])
+def email_campaign_progress(request, campaign_id):
+    campaign = get_object_or_404(EmailCampaign, pk=campaign_id)
+    return Response(campaign_progress(campaign))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsCoordinator])
+def email_metrics(request):
+    try:
+        hours = int(request.query_params.get('hours', 24))
+    except ValueError:
+        return Response({"error": "hours must be a whole number."}, status=status.HTTP_400_BAD_REQUEST)
+    if hours < 1:
+        return Response({"error": "hours must be at least 1."}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(email_metrics_summary(hours))
+
+
 class LeaderboardAPIView(APIView):
     # Only let coordinators and executives see the stats
     permission_classes = [IsAuthorizedExecutiveOrCoordinator] 
 
     def get(self, request):
-        # 1. Grab all active students
-        students = User.objects.filter(role=User.Roles.STUDENT, is_active=True)
-        leaderboard_data = []
-
-        # We will need some summary metrics for the header
-        total_volunteers = students.count()
-        total_calculated_hours = 0.0
+        """
+        Optional query params:
+        - campus: only rank students from this campus (e.g. ?campus=APB)
+        - limit / cursor: page through the rankings; `next_cursor` (the last
+          row's hours and user id) is returned while more rows remain. Without
+          a limit the full ranking is returned.
+        """
+        campus = request.query_params.get('campus') or None
+        if campus and campus not in User.Campuses.values:
+            return Response({"error": "Unknown campus."}, status=status.HTTP_400_BAD_REQUEST)
 
-        for student in students:
-            # Grab all signups where the student actually attended
-            attended_records = ActivitySignup.objects.filter(user=student, attended=True).select_related('activity')
-            
-            events_count = attended_records.count()
-            on_time_count = 0
-            late_count = 0
-            calculated_hours = 0.0
+        try:
+            limit = int(request.query_params['limit']) if request.query_params.get('limit') else None
+        except ValueError:
+            return Response({"error": "limit must be a whole number."}, status=status.HTTP_400_BAD_REQUEST)
+        if limit is not None and limit <= 0:
+            return Response({"error": "limit must be positive."}, status=status.HTTP_400_BAD_REQUEST)
 
-            for record in attended_records:
-                calculated_hours += float(record.hours_earned)
-                
-                if record.sign_in_time and record.activity.date_time:
-                    grace_period = record.activity.date_time + timedelta(minutes=5)
-                    if record.sign_in_time <= grace_period:
-                        on_time_count += 1
-                    else:
-                        late_count += 1
-
-            # 👇 FIXED: Add the manual bonus hours from your User model
-            manual_bonus = float(getattr(student, 'manual_bonus_hours', 0.00))
-            student_total_hours = calculated_hours + manual_bonus
-            
-            total_calculated_hours += student_total_hours
+        leaderboard = get_leaderboard(campus)
+        try:
+            rankings, next_cursor = page_rankings(leaderboard, limit, request.query_params.get('cursor') or None)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            # 2. Package it up for the Javascript, adding the student's campus
-            leaderboard_data.append({
-                'first_name': student.first_name,
-                'last_name': student.last_name,
-                'campus': student.get_campus_display() if hasattr(student, 'get_campus_display') else "Unknown Campus", # 👈 Added Campus!
-                'total_hours': round(student_total_hours, 1),
-                'events_attended': events_count,
-                'on_time_count': on_time_count,
-                'late_count': late_count,
-            })
-            
-        # Add summary data to the payload
+        # Summary always describes the whole (filtered) population, not just the page
         response_data = {
-            'summary': {
-                'volunteers': total_volunteers,
-                'hours': round(total_calculated_hours, 1)
-            },
-            'rankings': leaderboard_data
+            'summary': leaderboard['summary'],
+            'rankings': rankings,
         }
+        if limit:
+            response_data['next_cursor'] = next_cursor
 
-        return Response(response_data)    
+        return Response(response_data)
         
 class VideoGuidesView(TemplateView):
     template_name = 'core/video_guides.html' 
@@ -1082,82 +1125,29 @@ def leaderboard_page_view(request):
 @api_view(['GET'])
 @permission_classes([IsCoordinator])
 def leaderboard_race_data(request):
-    # 1. Fetch all regular event hours, chronologically
-    signups = ActivitySignup.objects.filter(
-        attended=True,
-        hours_earned__gt=0
-    ).select_related('user', 'activity').order_by('activity__date_time')
-
-    # 2. Fetch users who have manual bonus hours to give them a "Head Start"
-    users_with_bonus = User.objects.filter(manual_bonus_hours__gt=0)
-    
-    # Create our baseline dictionary
-    baseline_totals = {}
-    for u in users_with_bonus:
-        name = f"{u.first_name} {u.last_name}".strip()
-        if not name:
-            name = getattr(u, 'username', 'Unknown')
-        baseline_totals[name] = float(u.manual_bonus_hours)
-
-    # If there is absolutely no data in the system at all
-    if not signups.exists() and not users_with_bonus.exists():
-        return Response([])
-
-    # 3. Determine the start date of the race
-    if signups.exists():
-        start_date = signups.first().activity.date_time.date()
-    else:
-        # If no events exist yet, but someone has bonus hours, just start the timeline 7 days ago
-        start_date = timezone.now().date() - timedelta(days=7)
-        
-    end_date = timezone.now().date()
-    
-    # 4. Copy the baseline bonus hours into the running totals
-    user_totals = dict(baseline_totals)
-    race_timeline = []
-
-    signup_list = list(signups)
-    idx = 0
-    total_signups = len(signup_list)
-    current_date = start_date
-
-    # 5. Walk through history day by day
-    while current_date <= end_date:
-        
-        # Add any event hours earned on or before this current timeline day
-        while idx < total_signups and signup_list[idx].activity.date_time.date() <= current_date:
-            signup = signup_list[idx]
-            user = signup.user
-            
-            user_name = f"{user.first_name} {user.last_name}".strip()
-            if not user_name:
-                user_name = getattr(user, 'username', 'Unknown')
-
-            # If they don't have bonus hours, they start at 0
-            if user_name not in user_totals:
-                user_totals[user_name] = 0.0
-                
-            user_totals[user_name] += float(signup.hours_earned)
-            
-            idx += 1 
-
-        # Build the leaderboard for this specific day
-        rankings = []
-        for name, hours in user_totals.items():
-            if hours > 0:
-                rankings.append({"name": name, "hours": hours})
+    """
+    Serves the leaderboard race frames from the daily snapshot table.
+    Optional ?from=YYYY-MM-DD&to=YYYY-MM-DD limit the window.
+    """
+    try:
+        start = date.fromisoformat(request.query_params['from']) if request.query_params.get('from') else None
+        end = date.fromisoformat(request.query_params['to']) if request.query_params.get('to') else None
+    except ValueError:
+        return Response({"error": "'from' and 'to' must be dates in YYYY-MM-DD format."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Sort so highest hours are at the top, and take the Top 10
-        rankings.sort(key=lambda x: x['hours'], reverse=True)
-        
-        race_timeline.append({
-            "date": current_date.strftime("%Y-%m-%d"),
-            "rankings": rankings[:10]
-        })
+    snapshots = get_race_timeline(start, end)
 
-        current_date += timedelta(days=1)
+    # Frames only change when a snapshot is rewritten, so that is what the ETag tracks
+    state = snapshots.aggregate(frames=Count('id'), last_update=Max('updated_at'))
+    etag = f"race-{start}-{end}-{state['frames']}-{state['last_update'].timestamp() if state['last_update'] else 0}"
+    if etag_matches(request, etag):
+        return set_http_cache_headers(Response(status=status.HTTP_304_NOT_MODIFIED), etag, RACE_CACHE_MAX_AGE)
 
-    return Response(race_timeline)
+    race_timeline = [
+        {"date": snap['date'].strftime("%Y-%m-%d"), "rankings": snap['rankings']}
+        for snap in snapshots.values('date', 'rankings')
+    ]
+    return set_http_cache_headers(Response(race_timeline), etag, RACE_CACHE_MAX_AGE)
 
 class StudentFeedbackView(LoginRequiredMixin, CreateView):
     model = Feedback
@@ -1167,7 +1157,10 @@ class StudentFeedbackView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         messages.success(self.request, "Thank you! Your feedback has been securely submitted.")
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        # The quarterly report lists every piece of feedback
+        bump_cache_version('quarterly-report')
+        return response
 
     def form_invalid(self, form):
 
@@ -1187,158 +1180,8 @@ class AdminFeedbackDashboard(UserPassesTestMixin, TemplateView):
         return context
     
 def quarterly_report_view(request):
-    now = timezone.now()
-
-    # ==========================================
-    # 1. BASE QUERY: THE "TRUE ACTIVE" STUDENTS
-    # ==========================================
-    # This creates a reusable list of students who have > 5 total combined hours.
-    # We define it once here to make the rest of the code extremely fast.
-    
-    true_active_students = User.objects.filter(
-        role=User.Roles.STUDENT,
-        is_superuser=False
-    ).annotate(
-        # 1. Sum up all their physical sign-in hours (default to 0 if none)
-        total_event_hours=Coalesce(
-            Sum('activitysignup__hours_earned', filter=Q(activitysignup__attended=True)),
-            0.0,
-            output_field=DecimalField()
-        )
-    ).annotate(
-        # 2. Add their manual bonus hours to their event hours
-        grand_total=F('total_event_hours') + F('manual_bonus_hours')
-    ).filter(
-        # 3. Only keep students whose grand total is strictly greater than 5
-        grand_total__gt=5
-    )
-
-    # ==========================================
-    # 2. HERO METRICS
-    # ==========================================
-    total_registered = User.objects.filter(role=User.Roles.STUDENT, is_superuser=False).count()
-    
-    # We now just count that base query we built above!
-    active_peers = true_active_students.count()
-
-    # Hours calculation
-    event_hours_dict = ActivitySignup.objects.filter(attended=True).aggregate(Sum('hours_earned'))
-    event_hours = event_hours_dict['hours_earned__sum'] or 0.0
-
-    manual_hours_dict = User.objects.filter(role=User.Roles.STUDENT).aggregate(Sum('manual_bonus_hours'))
-    manual_hours = manual_hours_dict['manual_bonus_hours__sum'] or 0.0
-
-    total_hours = float(event_hours) + float(manual_hours)
-    total_events = VolunteerActivity.objects.filter(date_time__lte=now).count()
-
-    # ==========================================
-    # 3. CAMPUS BREAKDOWN DATA
-    # ==========================================
-    campuses = ['APB', 'DFC', 'APK', 'SWC']
-    campus_context = {}
-
-    for camp in campuses:
-        # Total Registered at this campus
-        total_pe_count = User.objects.filter(
-            role=User.Roles.STUDENT,
-            campus=camp,
-            is_superuser=False
-        ).count()
-
-        # Active PEs at this campus (We just filter our base query by campus!)
-        active_pe_count = true_active_students.filter(campus=camp).count()
-
-        # Hours for this campus
-        camp_event_hours_aggr = ActivitySignup.objects.filter(
-            user__campus=camp, attended=True
-        ).aggregate(Sum('hours_earned'))
-        camp_event_hours = camp_event_hours_aggr['hours_earned__sum'] or 0.0
-
-        camp_manual_hours_aggr = User.objects.filter(
-            role=User.Roles.STUDENT, campus=camp
-        ).aggregate(Sum('manual_bonus_hours'))
-        camp_manual_hours = camp_manual_hours_aggr['manual_bonus_hours__sum'] or 0.0
-
-        total_camp_hours = float(camp_event_hours) + float(camp_manual_hours)
-
-        # Average hours (Calculated against the new >5 hours Active peers metric)
-        avg_hours = (total_camp_hours / active_pe_count) if active_pe_count > 0 else 0.0
-
-        # Save to context
-        prefix = camp.lower()
-        campus_context[f'{prefix}_total_count'] = total_pe_count
-        campus_context[f'{prefix}_active_count'] = active_pe_count
-        campus_context[f'{prefix}_total_hours'] = round(total_camp_hours, 1)
-        campus_context[f'{prefix}_avg_hours'] = round(avg_hours, 1)
-    # ==========================================
-    # 3. ENGAGEMENT DATA (For the Charts)
-    # ==========================================
-    
-    # Get ALL completed events, ordered oldest to newest
-    all_past_events = VolunteerActivity.objects.filter(date_time__lte=now).order_by('date_time')
-    
-    turnout_labels = []
-    expected_data = []
-    actual_data = []
-
-    for event in all_past_events: 
-        turnout_labels.append(event.title)
-        
-        # 'Expected' = RSVPs
-        total_rsvps = ActivitySignup.objects.filter(activity=event).count()
-        expected_data.append(total_rsvps)
-        
-        # 'Actual' = Attended
-        attended_count = ActivitySignup.objects.filter(activity=event, attended=True).count()
-        actual_data.append(attended_count)
-
-    # Overall attendance percentage
-    all_time_rsvps = ActivitySignup.objects.count()
-    all_time_attended = ActivitySignup.objects.filter(attended=True).count()
-    attendance_rate = round((all_time_attended / all_time_rsvps) * 100) if all_time_rsvps > 0 else 0
-    # ==========================================
-    # 4. PUNCTUALITY METRICS
-    # ==========================================
-    late_count = ActivitySignup.objects.filter(
-        attended=True,
-        sign_in_time__isnull=False,
-        sign_in_time__gt=F('activity__date_time')
-    ).count()
-
-    # 2. Calculate On Time: Total attended minus the late comers
-    # (This safely gives the "benefit of the doubt" to anyone marked attended manually without a timestamp)
-    total_attended = ActivitySignup.objects.filter(attended=True).count()
-    on_time_count = total_attended - late_count
-
-    # 3. Calculate No Shows: RSVP'd but never attended
-    excused_count = ActivitySignup.objects.filter(attended=False).count() 
-
-    # ==========================================
-    # 5. FEEDBACK (Showing ALL feedback, no limits)
-    # ==========================================
-    all_feedbacks = Feedback.objects.select_related('user').order_by('-created_at')
-
-    # ==========================================
-    # 6. CONTEXT ASSEMBLY
-    # ==========================================
-    context = {
-        'total_hours': round(total_hours, 1),
-        'total_events': total_events,
-        'total_registered': total_registered,
-        'active_peers': active_peers,
-        # Javascript Charts 
-        'chart_labels': json.dumps(turnout_labels),
-        'chart_expected': expected_data,
-        'chart_actual': actual_data,
-        
-        'punctuality_on_time': on_time_count,
-        'punctuality_late': late_count,
-        'punctuality_excused': excused_count,
-        
-        'feedbacks': all_feedbacks,
-        # Unpack all campus dictionary variables dynamically
-        **campus_context, 
-    }
+    # Built in a handful of grouped queries by core.reports and cached per year
+    context = get_quarterly_report_context()
 
     return render(request, 'core/quarterly_report.html', context)
 
@@ -1688,31 +1531,35 @@ class ManualHoursAllocationAPIView(APIView):
         except ValueError:
             return Response({"error": "Invalid hours format."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Create a proxy activity for the manual allocation
-        activity = VolunteerActivity.objects.create(
-            title=event_name,
-            date_time=timezone.now(),
-            duration_hours=hours,
-            created_by=request.user,
-            description="Manual hours allocation event",
-            details="Manually allocated hours by coordinator."
-        )
-
         from users.models import User
         from users.services import BackgroundEmailService
-        students = User.objects.filter(id__in=student_ids, role=User.Roles.STUDENT)
+        students = list(User.objects.filter(id__in=student_ids, role=User.Roles.STUDENT))
+
+        with transaction.atomic():
+            # Create a proxy activity for the manual allocation
+            activity = VolunteerActivity.objects.create(
+                title=event_name,
+                date_time=timezone.now(),
+                duration_hours=hours,
+                created_by=request.user,
+                description="Manual hours allocation event",
+                details="Manually allocated hours by coordinator."
+            )
+
+            for student in students:
+                ActivitySignup.objects.create(
+                    user=student,
+                    activity=activity,
+                    attended=True,
+                    sign_in_time=timezone.now(),
+                    sign_out_time=timezone.now(),
+                    hours_earned=hours,
+                    session_history=[{"type": "Manual added hours", "hours": hours}]
+                )
+
+            hours_changed([student.id for student in students], since=activity.date_time)
 
         for student in students:
-            ActivitySignup.objects.create(
-                user=student,
-                activity=activity,
-                attended=True,
-                sign_in_time=timezone.now(),
-                sign_out_time=timezone.now(),
-                hours_earned=hours,
-                session_history=[{"type": "Manual added hours", "hours": hours}]
-            )
-            
             # Send Notification Email
             html_content = render_to_string('core/emails/manual_hours.html', {
                 'first_name': student.first_name,
@@ -1725,146 +1572,11 @@ class ManualHoursAllocationAPIView(APIView):
                 html_content=html_content
             )
 
-        return Response({"message": f"Successfully allocated {hours} hours to {students.count()} students for '{event_name}'."})
+        return Response({"message": f"Successfully allocated {hours} hours to {len(students)} students for '{event_name}'."})
 
 class LiveAwardsAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsCoordinator]
 
     def get(self, request):
-        from users.models import User
-        from django.db.models import Sum, Count, Case, When, Value, IntegerField, F
-        from django.utils import timezone
-        
-        current_year = timezone.now().year
-        
-        stats = ActivitySignup.objects.filter(
-            user__role=User.Roles.STUDENT,
-            attended=True,
-            sign_out_time__year=current_year
-        ).values('user').annotate(
-            total_hours=Sum('hours_earned'),
-            events_attended=Count('id'),
-            early_count=Sum(
-                Case(
-                    When(sign_in_time__lte=F('activity__date_time'), then=Value(1)),
-                    default=Value(0),
-                    output_field=IntegerField()
-                )
-            )
-        )
-        
-        user_stats_map = {}
-        for s in stats:
-            user_stats_map[s['user']] = {
-                'total_hours': float(s['total_hours'] or 0.0),
-                'events_attended': s['events_attended'],
-                'early_count': s['early_count'] or 0
-            }
-            
-        students = User.objects.filter(role=User.Roles.STUDENT)
-        all_students = students.values('id', 'first_name', 'last_name', 'points', 'manual_bonus_hours', 'campus', 'volunteer_status')
-        
-        max_hours = 0.0
-        max_events = 0
-        max_points = 0
-        
-        compiled_data = []
-        
-        for student in all_students:
-            uid = student['id']
-            base_points = student['points'] or 0
-            bonus = float(student['manual_bonus_hours'] or 0.0)
-            
-            s_data = user_stats_map.get(uid, {'total_hours': 0.0, 'events_attended': 0, 'early_count': 0})
-            
-            t_hours = s_data['total_hours'] + bonus
-            t_events = s_data['events_attended']
-            
-            if t_hours > max_hours:
-                max_hours = t_hours
-            if t_events > max_events:
-                max_events = t_events
-            if base_points > max_points:
-                max_points = base_points
-                
-            compiled_data.append({
-                'id': uid,
-                'name': f"{student['first_name']} {student['last_name']}",
-                'campus': student['campus'],
-                'volunteer_status': student['volunteer_status'],
-                'hours': t_hours,
-                'events': t_events,
-                'points': base_points,
-                'early_count': s_data['early_count']
-            })
-            
-        if max_hours == 0: max_hours = 1
-        if max_events == 0: max_events = 1
-        if max_points == 0: max_points = 1
-        
-        for data in compiled_data:
-            score_hours = (data['hours'] / max_hours) * 100 * 0.50
-            score_events = (data['events'] / max_events) * 100 * 0.25
-            score_points = (data['points'] / max_points) * 100 * 0.10
-            punctuality_pct = (data['early_count'] / data['events']) * 100 if data['events'] > 0 else 0
-            score_punctuality = punctuality_pct * 0.15
-            
-            data['punctuality_pct'] = round(punctuality_pct, 1)
-            data['score_hours'] = round(score_hours, 2)
-            data['score_events'] = round(score_events, 2)
-            data['score_points'] = round(score_points, 2)
-            data['score_punctuality'] = round(score_punctuality, 2)
-            
-            data['power_score'] = round(score_hours + score_events + score_points + score_punctuality, 2)
-            
-        compiled_data.sort(key=lambda x: x['power_score'], reverse=True)
-        overall_top_5 = compiled_data[:5]
-        
-        newcomers = [d for d in compiled_data if d['volunteer_status'] == 'NEWCOMER']
-        newcomers_top_5 = newcomers[:5]
-        
-        campus_totals = {}
-        for d in compiled_data:
-            c = d['campus']
-            if not c:
-                continue
-            if c not in campus_totals:
-                campus_totals[c] = {
-                    'total_score': 0, 'count': 0,
-                    'total_hours_score': 0, 'total_events_score': 0,
-                    'total_points_score': 0, 'total_punctuality_score': 0,
-                    'raw_hours': 0, 'raw_events': 0, 'raw_points': 0
-                }
-            campus_totals[c]['total_score'] += d['power_score']
-            campus_totals[c]['total_hours_score'] += d['score_hours']
-            campus_totals[c]['total_events_score'] += d['score_events']
-            campus_totals[c]['total_points_score'] += d['score_points']
-            campus_totals[c]['total_punctuality_score'] += d['score_punctuality']
-            campus_totals[c]['raw_hours'] += d['hours']
-            campus_totals[c]['raw_events'] += d['events']
-            campus_totals[c]['raw_points'] += d['points']
-            campus_totals[c]['count'] += 1
-            
-        campus_avg = []
-        for c, totals in campus_totals.items():
-            cnt = totals['count']
-            if cnt > 0:
-                campus_avg.append({
-                    'campus': c,
-                    'avg_score': round(totals['total_score'] / cnt, 2),
-                    'score_hours': round(totals['total_hours_score'] / cnt, 2),
-                    'score_events': round(totals['total_events_score'] / cnt, 2),
-                    'score_points': round(totals['total_points_score'] / cnt, 2),
-                    'score_punctuality': round(totals['total_punctuality_score'] / cnt, 2),
-                    'avg_raw_hours': round(totals['raw_hours'] / cnt, 1),
-                    'avg_raw_events': round(totals['raw_events'] / cnt, 1),
-                    'avg_raw_points': round(totals['raw_points'] / cnt, 1)
-                })
-            
-        campus_avg.sort(key=lambda x: x['avg_score'], reverse=True)
-        
-        return Response({
-            'overall': overall_top_5,
-            'newcomers': newcomers_top_5,
-            'campuses': campus_avg
-        })
+        # Scored by core.awards from the hours ledger and cached for a few seconds
+        return Response(get_live_awards())
@@ -8,6 +8,8 @@ from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 
 from users.permissions import IsCoordinator
+from core.dashboard import invalidate_dashboard
+from core.utils import bump_cache_version
 from .models import Topic, LearningUnit, Quiz, Question, Choice, StudentProgress
 from .serializers import (
     TopicSerializer, LearningUnitSerializer, QuizSerializer, 
@@ -116,6 +118,11 @@ class QuizViewSet(viewsets.ModelViewSet):
                 progress.points_earned = max(progress.points_earned, points_earned)
                 progress.save()
 
+            # A perfect score shows up as a learning accolade on the dashboard,
+            # and points feed the live awards power score
+            transaction.on_commit(lambda: invalidate_dashboard([user.id], ('learning',)))
+            transaction.on_commit(lambda: bump_cache_version('live-awards'))
+
         return Response({
             "score": score_percent,
             "passed": passed,
@@ -145,7 +152,8 @@ class QuizListView(APIView):
 from django.conf import settings
 import json
 from django.shortcuts import redirect
-from users.services import BackgroundEmailService
+from users.audience import Audience
+from users.outbox import start_campaign
 from django.template.loader import render_to_string
 from django.contrib.auth import get_user_model
 
@@ -247,10 +255,10 @@ class AdminContentUploadView(APIView):
             # ----- SEND BACKGROUND EMAIL NOTIFICATION -----
             try:
                 User = get_user_model()
-                students = User.objects.filter(role=User.Roles.STUDENT, receive_notifications=True)
-                student_emails = list(students.values_list('email', flat=True))
+                # Only an existence check here; the outbox worker streams the addresses
+                audience = Audience(role=User.Roles.STUDENT)
 
-                if student_emails:
+                if audience.exists():
                     hub_link = request.build_absolute_uri('/learning-hub/') if request else "https://cshaw.co.za/learning-hub/"
                     context = {
                         'topic_title': topic.title,
@@ -262,12 +270,7 @@ class AdminContentUploadView(APIView):
                     html_message = render_to_string('lms/emails/new_course.html', context)
                     subject = f"New Course Available: {topic.title} 📚"
 
-                    BackgroundEmailService._send_async(
-                        subject=subject,
-                        to_emails=[settings.DEFAULT_FROM_EMAIL],
-                        bcc_emails=student_emails,
-                        html_content=html_message
-                    )
+                    start_campaign(subject, html_message, audience=audience, created_by=request.user)
             except Exception as email_err:
                 print(f"⚠️ LMS Email Notification Error: {email_err}")
 
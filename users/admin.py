@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Award, User
+from django.db import transaction
+from .models import Award, EmailSendMetric, OutboundEmail, User
 
 @admin.register(Award)
 class AwardAdmin(admin.ModelAdmin):
@@ -54,7 +55,36 @@ class CustomUserAdmin(admin.ModelAdmin):
     # Adds a search bar to the 'recruited_by' dropdown so the page doesn't crash if you have 10,000 users
     autocomplete_fields = ('recruited_by',)
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Bonus hours feed every "total hours" read, so let the hours ledger know
+        if change and 'manual_bonus_hours' in form.changed_data:
+            from core.ledger import hours_changed
+            hours_changed([obj.pk])
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Awards (and profile fields) are shown on the student dashboard
+        if change:
+            from core.dashboard import invalidate_dashboard
+            user_id = form.instance.pk
+            transaction.on_commit(lambda: invalidate_dashboard([user_id], ('hours', 'badges')))
+
     # Helper method to display the @property `is_executive` in the list view
     @admin.display(boolean=True, description='Executive')
     def is_executive_display(self, obj):
-        return obj.is_executive
\ No newline at end of file
+        return obj.is_executive
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'last_error')
+    readonly_fields = ('claimed_at', 'sent_at', 'created_at')
+
+
+@admin.register(EmailSendMetric)
+class EmailSendMetricAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'kind', 'source', 'messages', 'recipients', 'sent', 'retried', 'failed', 'duration_ms', 'rate_wait_ms', 'provider_ms')
+    list_filter = ('kind', 'source')
@@ -0,0 +1,84 @@
+from django.db.models import Q
+
+from .models import User
+
+AUDIENCE_BATCH_SIZE = 500
+
+
+class Audience:
+    """
+    Who a notification goes to. Every option is a User field filter; None
+    means "don't filter on it". By default only active users who have not
+    opted out of notifications are included.
+
+        Audience(role=User.Roles.STUDENT, campus='APB').count()
+        for emails in Audience(campus='APB').address_batches(): ...
+
+    to_dict()/from_dict() round-trip the options through JSON, so a stored
+    campaign can rebuild its audience later.
+    """
+
+    # campus value for users with no campus set
+    NO_CAMPUS = 'NONE'
+
+    OPTIONS = ('role', 'campus', 'is_active', 'receive_notifications', 'volunteer_status', 'executive')
+
+    def __init__(self, role=None, campus=None, is_active=True, receive_notifications=True,
+                 volunteer_status=None, executive=None):
+        self.role = role
+        # 'ALL' is how activities and the announcement form spell "every campus"
+        self.campus = None if campus == 'ALL' else campus
+        self.is_active = is_active
+        self.receive_notifications = receive_notifications
+        self.volunteer_status = volunteer_status
+        self.executive = executive
+
+    @classmethod
+    def from_dict(cls, options):
+        return cls(**{key: value for key, value in options.items() if key in cls.OPTIONS})
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.OPTIONS if getattr(self, key) is not None}
+
+    def queryset(self):
+        # Equality filters first, in the order of the (role, campus, is_active,
+        # receive_notifications) index on User
+        filters = {
+            field: getattr(self, field)
+            for field in ('role', 'campus', 'is_active', 'receive_notifications', 'volunteer_status')
+            if getattr(self, field) is not None
+        }
+        users = User.objects.exclude(email='')
+        if self.campus == self.NO_CAMPUS:
+            # Older accounts and the admin form leave the campus blank rather than NULL
+            del filters['campus']
+            users = users.filter(Q(campus__isnull=True) | Q(campus=''))
+        users = users.filter(**filters)
+        if self.executive is not None:
+            has_position = Q(executive_position__isnull=False) & ~Q(executive_position='')
+            users = users.filter(has_position if self.executive else ~has_position)
+        return users
+
+    def count(self):
+        return self.queryset().count()
+
+    def exists(self):
+        return self.queryset().exists()
+
+    def batches(self, *fields, batch_size=AUDIENCE_BATCH_SIZE, after_id=0):
+        """
+        Yields lists of (id, *fields) tuples, `batch_size` users at a time,
+        paging by id so each query stays small whatever the audience size.
+        """
+        users = self.queryset().order_by('id')
+        while True:
+            batch = list(users.filter(id__gt=after_id).values_list('id', *fields)[:batch_size])
+            if not batch:
+                return
+            yield batch
+            after_id = batch[-1][0]
+
+    def address_batches(self, batch_size=AUDIENCE_BATCH_SIZE):
+        """Yields lists of email addresses."""
+        for batch in self.batches('email', batch_size=batch_size):
+            yield [email for _, email in batch]
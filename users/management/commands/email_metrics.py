@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from users.metrics import email_metrics_summary
+
+
+class Command(BaseCommand):
+    help = "Summarises outbox depth, queueing and sending metrics."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help="How far back to summarise.")
+
+    def handle(self, *args, **options):
+        summary = email_metrics_summary(options['hours'])
+        outbox, send, time_ms = summary['outbox'], summary['send'], summary['time_ms']
+
+        self.stdout.write(f"📬 Outbox: {outbox['due']} due (oldest {outbox['oldest_due_age_seconds']}s), "
+                          f"{outbox['retry_scheduled']} awaiting retry, {outbox['sending']} sending, "
+                          f"{outbox['failed_recently']} failed in the last {summary['hours']}h")
+        self.stdout.write(f"📨 Sent: {send['batches']} batch(es), {send['messages']} message(s) to {send['recipients']} recipient(s), "
+                          f"{send['retried']} retried, {send['failed']} failed, {send['messages_per_second']} messages/s")
+        self.stdout.write(f"⏱️  Batches: avg {send['avg_batch_ms']}ms, max {send['max_batch_ms']}ms, avg queue depth {send['avg_queue_depth']}")
+        self.stdout.write(f"⏱️  Time: rendering {time_ms['render']}ms, rate limit wait {time_ms['rate_limit_wait']}ms, provider {time_ms['provider']}ms")
+        for row in summary['queued']:
+            self.stdout.write(f"   {row['source']}: {row['runs']} enqueue(s), {row['queued_recipients']} recipient(s), "
+                              f"avg render {row['avg_render_ms']}ms, avg insert {row['avg_queue_ms']}ms")
+        for row in summary['top_errors']:
+            self.stdout.write(self.style.WARNING(f"   ❌ {row['error']} ({row['batches']} batch(es))"))
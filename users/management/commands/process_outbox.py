@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from users.outbox import OUTBOX_BATCH_SIZE, OUTBOX_MAX_WORKERS, OUTBOX_SEND_RATE, process_outbox
+
+
+class Command(BaseCommand):
+    help = "Delivers queued outbound emails. Runs forever unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the outbox once and exit.")
+        parser.add_argument('--sleep', type=float, default=2.0, help="Seconds to wait when the outbox is empty.")
+        parser.add_argument('--batch-size', type=int, default=OUTBOX_BATCH_SIZE, help="Emails claimed per batch.")
+        parser.add_argument('--workers', type=int, default=OUTBOX_MAX_WORKERS, help="Concurrent sending threads.")
+        parser.add_argument('--rate', type=float, default=OUTBOX_SEND_RATE, help="Provider API calls per second.")
+
+    def handle(self, *args, **options):
+        while True:
+            # A long-lived worker must drop connections the database has closed
+            close_old_connections()
+            try:
+                sent, failed = process_outbox(
+                    batch_size=options['batch_size'], max_workers=options['workers'], rate=options['rate']
+                )
+                if sent or failed:
+                    self.stdout.write(f"Sent {sent} email(s), {failed} failed or deferred.")
+            except Exception as e:
+                # One bad run (e.g. the database restarting) must not stop the worker
+                if options['once']:
+                    raise
+                self.stderr.write(f"❌ Outbox run failed: {e}")
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
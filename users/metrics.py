@@ -0,0 +1,124 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from .models import EmailSendMetric, OutboundEmail
+
+# Distinct provider errors kept per batch
+METRIC_ERROR_LIMIT = 5
+
+Kinds = EmailSendMetric.Kinds
+
+
+def _ms(seconds):
+    return int(round(seconds * 1000))
+
+
+def recipient_count(email):
+    return len(email.to) + len(email.bcc)
+
+
+def record_queue(source, emails, render_seconds=0.0, seconds=0.0):
+    """Records a bulk enqueue: how many messages/recipients and how long rendering and inserting took."""
+    EmailSendMetric.objects.create(
+        kind=Kinds.QUEUE,
+        source=source,
+        messages=len(emails),
+        recipients=sum(recipient_count(email) for email in emails),
+        render_ms=_ms(render_seconds),
+        duration_ms=_ms(seconds),
+    )
+
+
+def record_send_batch(batch, sent, retried, failed, queue_depth, seconds, rate_wait_seconds, provider_seconds, errors):
+    """Records one outbox worker batch."""
+    EmailSendMetric.objects.create(
+        kind=Kinds.SEND,
+        source='outbox',
+        messages=len(batch),
+        recipients=sum(recipient_count(email) for email in batch),
+        sent=sent,
+        retried=retried,
+        failed=failed,
+        queue_depth=queue_depth,
+        duration_ms=_ms(seconds),
+        rate_wait_ms=_ms(rate_wait_seconds),
+        provider_ms=_ms(provider_seconds),
+        errors=list(dict.fromkeys(str(e)[:200] for e in errors))[:METRIC_ERROR_LIMIT],
+    )
+
+
+def email_metrics_summary(hours=24):
+    """
+    Outbox depth right now plus queueing and sending totals over the last
+    `hours`, in a JSON-friendly dict. `time_ms` splits where the time went
+    (rendering, waiting on the rate limiter, inside the provider call).
+    """
+    now = timezone.now()
+    since = now - timedelta(hours=hours)
+    Status = OutboundEmail.Status
+
+    outbox = OutboundEmail.objects.aggregate(
+        due=Count('id', filter=Q(status=Status.PENDING, next_attempt_at__lte=now)),
+        retry_scheduled=Count('id', filter=Q(status=Status.PENDING, next_attempt_at__gt=now)),
+        sending=Count('id', filter=Q(status=Status.SENDING)),
+        failed_recently=Count('id', filter=Q(status=Status.FAILED, created_at__gte=since)),
+        oldest_due=Min('created_at', filter=Q(status=Status.PENDING, next_attempt_at__lte=now)),
+    )
+    oldest_due = outbox.pop('oldest_due')
+    outbox['oldest_due_age_seconds'] = int((now - oldest_due).total_seconds()) if oldest_due else 0
+
+    metrics = EmailSendMetric.objects.filter(created_at__gte=since)
+    send = metrics.filter(kind=Kinds.SEND).aggregate(
+        batches=Count('id'),
+        messages=Sum('messages'),
+        recipients=Sum('recipients'),
+        sent=Sum('sent'),
+        retried=Sum('retried'),
+        failed=Sum('failed'),
+        avg_batch_ms=Avg('duration_ms'),
+        max_batch_ms=Max('duration_ms'),
+        avg_queue_depth=Avg('queue_depth'),
+        total_ms=Sum('duration_ms'),
+        rate_wait_ms=Sum('rate_wait_ms'),
+        provider_ms=Sum('provider_ms'),
+    )
+    send = {key: value or 0 for key, value in send.items()}
+    send['messages_per_second'] = round(send['messages'] / (send['total_ms'] / 1000), 1) if send['total_ms'] else 0
+    send['avg_batch_ms'] = round(send['avg_batch_ms'])
+    send['avg_queue_depth'] = round(send['avg_queue_depth'], 1)
+
+    queued = list(
+        metrics.filter(kind=Kinds.QUEUE).values('source').annotate(
+            runs=Count('id'),
+            queued_messages=Sum('messages'),
+            queued_recipients=Sum('recipients'),
+            total_render_ms=Sum('render_ms'),
+            avg_render_ms=Avg('render_ms'),
+            avg_queue_ms=Avg('duration_ms'),
+        ).order_by('-queued_recipients')
+    )
+    for row in queued:
+        row['avg_render_ms'] = round(row['avg_render_ms'])
+        row['avg_queue_ms'] = round(row['avg_queue_ms'])
+
+    errors = Counter(
+        error
+        for batch_errors in metrics.filter(kind=Kinds.SEND).exclude(errors=[]).values_list('errors', flat=True)
+        for error in batch_errors
+    )
+
+    return {
+        'hours': hours,
+        'outbox': outbox,
+        'send': send,
+        'queued': queued,
+        'time_ms': {
+            'render': sum(row['total_render_ms'] for row in queued),
+            'rate_limit_wait': send['rate_wait_ms'],
+            'provider': send['provider_ms'],
+        },
+        'top_errors': [{'error': error, 'batches': count} for error, count in errors.most_common(METRIC_ERROR_LIMIT)],
+    }
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundemail',
+            name='merge_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
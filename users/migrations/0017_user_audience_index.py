@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 12:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0016_emailcampaign'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'campus', 'is_active', 'receive_notifications'], name='users_user_role_8a5a65_idx'),
+        ),
+    ]
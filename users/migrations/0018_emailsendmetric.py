@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0017_user_audience_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailSendMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('QUEUE', 'Queued'), ('SEND', 'Sent')], max_length=10)),
+                ('source', models.CharField(blank=True, default='', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('messages', models.PositiveIntegerField(default=0)),
+                ('recipients', models.PositiveIntegerField(default=0)),
+                ('sent', models.PositiveIntegerField(default=0)),
+                ('retried', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('queue_depth', models.PositiveIntegerField(default=0)),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+                ('render_ms', models.PositiveIntegerField(default=0)),
+                ('rate_wait_ms', models.PositiveIntegerField(default=0)),
+                ('provider_ms', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['kind', 'created_at'], name='users_email_kind_33f087_idx')],
+            },
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 class Award(models.Model):
@@ -88,6 +89,12 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = [] 
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Audience queries (users.audience) filter on these together
+            models.Index(fields=['role', 'campus', 'is_active', 'receive_notifications']),
+        ]
+
     from .managers import CustomUserManager 
     objects = CustomUserManager()
 
@@ -100,8 +107,9 @@ class User(AbstractUser):
     
     @property
     def total_hours(self):
+        # Read from the materialised hours ledger (one row per year) instead of summing every signup
         from django.db.models import Sum
-        activity_total = self.activitysignup_set.filter(attended=True).aggregate(sum=Sum('hours_earned'))['sum']
+        activity_total = self.hours_ledger.aggregate(sum=Sum('activity_hours'))['sum']
         calculated_hours = float(activity_total or 0.0)
         bonus_hours = float(self.manual_bonus_hours or 0.0)
         return calculated_hours + bonus_hours
@@ -121,3 +129,113 @@ class VolunteerBadge(models.Model):
 
     def __str__(self):
         return f"{self.user.email} - {self.get_badge_type_display()}"
+
+
+class OutboundEmail(models.Model):
+    """
+    One queued email. Rows are written in the request and delivered by the
+    `process_outbox` worker, so a mass notification never blocks a request.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        SENDING = 'SENDING', 'Sending'
+        SENT = 'SENT', 'Sent'
+        FAILED = 'FAILED', 'Failed'
+
+    subject = models.CharField(max_length=255)
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    bcc = models.JSONField(default=list, blank=True)
+    html_body = models.TextField()
+    text_body = models.TextField(blank=True, default="")
+    # {email: {field: value}} for merge sends: the bodies hold {{field}}
+    # placeholders and every address in `to` gets its own message
+    merge_data = models.JSONField(null=True, blank=True)
+    campaign = models.ForeignKey('EmailCampaign', on_delete=models.SET_NULL, null=True, blank=True, related_name='emails')
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.subject} -> {len(self.to) + len(self.bcc)} recipient(s) ({self.status})"
+
+
+class EmailCampaign(models.Model):
+    """
+    A BCC send to an audience of users. The outbox worker expands the
+    audience into OutboundEmail rows chunk by chunk, saving its position
+    (`last_user_id`) after each chunk so a crashed run resumes where it
+    stopped instead of starting over.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        QUEUEING = 'QUEUEING', 'Queueing'
+        QUEUED = 'QUEUED', 'Queued'
+
+    subject = models.CharField(max_length=255)
+    html_body = models.TextField()
+    # users.audience.Audience options, e.g. {"campus": "APB", "role": "STUDENT"}
+    audience = models.JSONField(default=dict, blank=True)
+    # Hand-typed recipients, used instead of `audience` when present
+    custom_emails = models.JSONField(default=list, blank=True)
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    total_recipients = models.PositiveIntegerField(default=0)
+    queued_recipients = models.PositiveIntegerField(default=0)
+    last_user_id = models.BigIntegerField(default=0)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='email_campaigns')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.subject} ({self.queued_recipients}/{self.total_recipients} queued)"
+
+
+class EmailSendMetric(models.Model):
+    """
+    Timing and outcome of one unit of email work (see users.metrics):
+    a bulk enqueue (QUEUE), or an outbox worker batch (SEND).
+    """
+    class Kinds(models.TextChoices):
+        QUEUE = 'QUEUE', 'Queued'
+        SEND = 'SEND', 'Sent'
+
+    kind = models.CharField(max_length=10, choices=Kinds.choices)
+    source = models.CharField(max_length=50, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    messages = models.PositiveIntegerField(default=0)
+    recipients = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    retried = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    # Due emails waiting in the outbox when a SEND batch was claimed
+    queue_depth = models.PositiveIntegerField(default=0)
+
+    duration_ms = models.PositiveIntegerField(default=0)
+    render_ms = models.PositiveIntegerField(default=0)
+    # Summed across sending threads: time blocked on the rate limiter / in the provider call
+    rate_wait_ms = models.PositiveIntegerField(default=0)
+    provider_ms = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['kind', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.kind} {self.source} {self.messages} message(s) in {self.duration_ms}ms"
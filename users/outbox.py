@@ -0,0 +1,421 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import SafeData, mark_safe
+
+from .audience import Audience
+from .metrics import record_queue, record_send_batch
+from .models import EmailCampaign, OutboundEmail
+
+# Postmark rejects more than 50 recipients per message; 45 leaves a buffer
+BCC_BATCH_SIZE = 45
+# Recipients per merge send; Postmark accepts 500 messages per batch
+MERGE_BATCH_SIZE = 500
+MERGE_FIELD_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+# A zero-width space between braces reads the same but is no longer merge syntax
+ZERO_WIDTH_SPACE = "\u200b"
+
+OUTBOX_BATCH_SIZE = 200
+OUTBOX_MAX_WORKERS = 4
+OUTBOX_MAX_ATTEMPTS = 5
+# Retries wait 1, 2, 4, 8... minutes
+OUTBOX_RETRY_BASE = timedelta(minutes=1)
+# A SENDING row older than this belongs to a worker that died mid-batch
+OUTBOX_STALE_AFTER = timedelta(minutes=15)
+# Provider API calls per second across all sending threads, with short bursts allowed
+OUTBOX_SEND_RATE = 10.0
+OUTBOX_SEND_BURST = 20
+# Campaign recipients read (and queued) per transaction
+CAMPAIGN_CHUNK_SIZE = BCC_BATCH_SIZE * 20
+
+Status = OutboundEmail.Status
+
+
+def outbound_emails(subject, to_emails, html_content, bcc_emails=None):
+    """
+    Unsaved OutboundEmail rows for one logical email. Large BCC lists are
+    split into rows of BCC_BATCH_SIZE recipients.
+    """
+    common = {
+        'subject': subject,
+        'from_email': settings.DEFAULT_FROM_EMAIL,
+        'to': list(to_emails),
+        'html_body': html_content,
+        'text_body': strip_tags(html_content),
+    }
+    if not bcc_emails:
+        return [OutboundEmail(**common)]
+    bcc_emails = list(bcc_emails)
+    return [
+        OutboundEmail(**common, bcc=bcc_emails[i:i + BCC_BATCH_SIZE])
+        for i in range(0, len(bcc_emails), BCC_BATCH_SIZE)
+    ]
+
+
+def neutralise_merge_syntax(value):
+    """
+    Breaks up "{{" in user-supplied text (event titles, descriptions) so
+    neither our merge nor Postmark's treats it as a placeholder and blanks it.
+    """
+    if not isinstance(value, str):
+        return value
+    neutralised = re.sub(r"\{(?=\{)", "{" + ZERO_WIDTH_SPACE, value)
+    return mark_safe(neutralised) if isinstance(value, SafeData) else neutralised
+
+
+def render_merge_template(template_name, context, merge_fields):
+    """
+    Renders a template once, leaving {{field}} placeholders (Postmark's
+    Mustachio syntax) where each of `merge_fields` would go. Braces in the
+    context values are neutralised, so only these placeholders get merged.
+    """
+    context = {key: neutralise_merge_syntax(value) for key, value in context.items()}
+    placeholders = {field: mark_safe(f"{{{{{field}}}}}") for field in merge_fields}
+    return render_to_string(template_name, {**context, **placeholders})
+
+
+def merged_outbound_emails(subject, html_content, merge_data):
+    """
+    Unsaved OutboundEmail rows for a personalised send: one row per
+    MERGE_BATCH_SIZE recipients, carrying their slice of `merge_data`
+    ({email: {field: value}}).
+    """
+    recipients = list(merge_data)
+    text_content = strip_tags(html_content)
+    # The subject is plain text (often an event title), never a template
+    subject = neutralise_merge_syntax(subject)
+    return [
+        OutboundEmail(
+            subject=subject,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=batch,
+            html_body=html_content,
+            text_body=text_content,
+            merge_data={email: merge_data[email] for email in batch},
+        )
+        for batch in (recipients[i:i + MERGE_BATCH_SIZE] for i in range(0, len(recipients), MERGE_BATCH_SIZE))
+    ]
+
+
+def queue_emails(emails, source=None, render_seconds=0.0):
+    """
+    Writes OutboundEmail rows in bulk. Returns the number queued.
+    Fan-out paths pass a `source` label to have the enqueue recorded as an
+    EmailSendMetric, with the time they spent rendering.
+    """
+    started = time.monotonic()
+    OutboundEmail.objects.bulk_create(emails, batch_size=500)
+    if source:
+        record_queue(source, emails, render_seconds, time.monotonic() - started)
+    return len(emails)
+
+
+def start_campaign(subject, html_content, audience=None, custom_emails=None, created_by=None):
+    """
+    Records a BCC send to everyone in `audience` (an Audience), or to
+    `custom_emails`. Only the recipients are counted here; the outbox
+    worker queues the emails. Returns None, saving nothing, when there is
+    no one to send to.
+    """
+    custom_emails = list(custom_emails or [])
+    audience = audience.to_dict() if audience else {}
+    total_recipients = len(custom_emails) if custom_emails else Audience.from_dict(audience).count()
+    if not total_recipients:
+        return None
+
+    return EmailCampaign.objects.create(
+        subject=subject,
+        html_body=html_content,
+        audience=audience,
+        custom_emails=custom_emails,
+        total_recipients=total_recipients,
+        created_by=created_by,
+    )
+
+
+def claim_campaign():
+    """
+    Marks the oldest campaign still to be queued as QUEUEING and returns it,
+    or None. A QUEUEING campaign whose worker stopped updating it is reclaimed.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        campaign = EmailCampaign.objects.select_for_update(skip_locked=True).filter(
+            Q(status=EmailCampaign.Status.PENDING) |
+            Q(status=EmailCampaign.Status.QUEUEING, claimed_at__lt=now - OUTBOX_STALE_AFTER)
+        ).order_by('created_at').first()
+        if campaign is None:
+            return None
+        campaign.status = EmailCampaign.Status.QUEUEING
+        campaign.claimed_at = now
+        campaign.save(update_fields=['status', 'claimed_at', 'updated_at'])
+    return campaign
+
+
+def _queue_campaign_chunk(campaign, addresses, last_user_id):
+    emails = outbound_emails(campaign.subject, [settings.DEFAULT_FROM_EMAIL], campaign.html_body, bcc_emails=addresses)
+    for email in emails:
+        email.campaign = campaign
+    queue_emails(emails, source='campaign')
+    campaign.last_user_id = last_user_id
+    campaign.queued_recipients += len(addresses)
+    campaign.claimed_at = timezone.now()
+    campaign.save(update_fields=['last_user_id', 'queued_recipients', 'claimed_at', 'updated_at'])
+
+
+def queue_campaign(campaign):
+    """
+    Queues a campaign's emails, CAMPAIGN_CHUNK_SIZE recipients at a time.
+    Recipients are paged by id from `last_user_id`, and each chunk's emails
+    and the new position are saved together, so memory stays flat and a
+    rerun never queues anyone twice.
+    """
+    if campaign.custom_emails:
+        with transaction.atomic():
+            _queue_campaign_chunk(campaign, campaign.custom_emails, campaign.last_user_id)
+    else:
+        batches = Audience.from_dict(campaign.audience).batches(
+            'email', batch_size=CAMPAIGN_CHUNK_SIZE, after_id=campaign.last_user_id
+        )
+        for chunk in batches:
+            with transaction.atomic():
+                _queue_campaign_chunk(campaign, [email for _, email in chunk], chunk[-1][0])
+
+    campaign.status = EmailCampaign.Status.QUEUED
+    campaign.save(update_fields=['status', 'updated_at'])
+    print(f"📬 Campaign {campaign.pk} '{campaign.subject}' queued for {campaign.queued_recipients} recipient(s)")
+
+
+def queue_campaigns():
+    """Queues every waiting campaign. Returns the number handled."""
+    handled = 0
+    while (campaign := claim_campaign()) is not None:
+        queue_campaign(campaign)
+        handled += 1
+    return handled
+
+
+def campaign_progress(campaign):
+    messages = dict(
+        campaign.emails.order_by().values_list('status').annotate(count=Count('id'))
+    )
+    return {
+        'id': campaign.id,
+        'subject': campaign.subject,
+        'status': campaign.status,
+        'total_recipients': campaign.total_recipients,
+        'queued_recipients': campaign.queued_recipients,
+        'messages': {status: messages.get(status, 0) for status in Status.values},
+        'created_at': campaign.created_at,
+    }
+
+
+def claim_outbox_batch(limit=OUTBOX_BATCH_SIZE):
+    """
+    Marks up to `limit` due emails as SENDING and returns them.
+    SKIP LOCKED lets several workers drain the outbox without double sends.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True).filter(
+                Q(status=Status.PENDING, next_attempt_at__lte=now) |
+                Q(status=Status.SENDING, claimed_at__lt=now - OUTBOX_STALE_AFTER)
+            ).order_by('next_attempt_at').values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        OutboundEmail.objects.filter(id__in=ids).update(
+            status=Status.SENDING, claimed_at=now, attempts=F('attempts') + 1
+        )
+    return list(OutboundEmail.objects.filter(id__in=ids))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens are added per second up to
+    `capacity`, and take() blocks until enough are available.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, count=1):
+        """
+        Blocks until `count` tokens are taken. Returns the seconds spent waiting.
+        More than `capacity` tokens are paid for a bucketful at a time, so
+        a large merge batch is charged in full rather than capped.
+        """
+        waited = 0.0
+        while count > 0:
+            chunk = min(count, self.capacity)
+            waited += self._take(chunk)
+            count -= chunk
+        return waited
+
+    def _take(self, count):
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= count:
+                    self.tokens -= count
+                    return waited
+                wait = (count - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+def _merge(template, values, html=False):
+    def field(match):
+        value = str(values.get(match.group(1), ""))
+        return escape(value) if html else value
+    return MERGE_FIELD_RE.sub(field, template)
+
+
+def _messages(email, native_merge):
+    """
+    EmailMultiAlternatives for one outbox row. With native merge (anymail)
+    a merge row is a single message carrying merge_data; otherwise it is
+    expanded here into one message per recipient.
+    """
+    def build(subject, text_body, html_body, to, bcc=()):
+        msg = EmailMultiAlternatives(subject=subject, body=text_body, from_email=email.from_email, to=to, bcc=list(bcc))
+        msg.attach_alternative(html_body, "text/html")
+        return msg
+
+    if email.merge_data is None:
+        return [build(email.subject, email.text_body, email.html_body, email.to, email.bcc)]
+    if native_merge:
+        msg = build(email.subject, email.text_body, email.html_body, email.to)
+        msg.merge_data = email.merge_data
+        return [msg]
+    return [
+        build(
+            _merge(email.subject, values),
+            _merge(email.text_body, values),
+            _merge(email.html_body, values, html=True),
+            [address],
+        )
+        for address, values in email.merge_data.items()
+    ]
+
+
+def _deliver(emails, bucket):
+    """
+    Sends `emails` over a single connection (plus one bulk-API connection
+    for merge rows), paced by the shared token bucket. Runs in a pool
+    thread, so it only talks to the mail backend and returns
+    ([(email, error or None)], seconds waiting on the bucket, seconds in the provider).
+    """
+    connections = {}
+
+    def connection_for(merge):
+        if merge not in connections:
+            # Anymail's Postmark backend only accepts merge_data on inline
+            # content through the bulk API; other backends ignore the flag
+            connection = get_connection(fail_silently=False, **({'use_bulk_api': True} if merge else {}))
+            connection.open()
+            connections[merge] = connection
+        return connections[merge]
+
+    results = []
+    rate_wait = provider = 0.0
+    try:
+        for email in emails:
+            try:
+                connection = connection_for(email.merge_data is not None)
+                messages = _messages(email, native_merge=hasattr(connection, 'esp_name'))
+                rate_wait += bucket.take(len(messages))
+                started = time.monotonic()
+                try:
+                    connection.send_messages(messages)
+                finally:
+                    provider += time.monotonic() - started
+                results.append((email, None))
+            except Exception as e:
+                results.append((email, e))
+    finally:
+        for connection in connections.values():
+            connection.close()
+    return results, rate_wait, provider
+
+
+def _record_results(results):
+    """Saves each email's outcome. Returns (sent, retried, failed) counts."""
+    now = timezone.now()
+    sent_ids, failed = [], []
+    gave_up = 0
+    for email, error in results:
+        if error is None:
+            sent_ids.append(email.pk)
+            continue
+        email.last_error = str(error)
+        if email.attempts >= OUTBOX_MAX_ATTEMPTS:
+            email.status = Status.FAILED
+            gave_up += 1
+            print(f"❌ Giving up on email {email.pk} '{email.subject}' after {email.attempts} attempts: {error}")
+        else:
+            email.status = Status.PENDING
+            email.next_attempt_at = now + OUTBOX_RETRY_BASE * 2 ** (email.attempts - 1)
+        failed.append(email)
+
+    if sent_ids:
+        OutboundEmail.objects.filter(id__in=sent_ids).update(status=Status.SENT, sent_at=now, last_error="")
+    if failed:
+        OutboundEmail.objects.bulk_update(failed, ['status', 'next_attempt_at', 'last_error'])
+    return len(sent_ids), len(failed) - gave_up, gave_up
+
+
+def process_outbox(batch_size=OUTBOX_BATCH_SIZE, max_workers=OUTBOX_MAX_WORKERS, limit=None, rate=OUTBOX_SEND_RATE):
+    """
+    Queues waiting campaigns, then drains due emails batch by batch. Each
+    batch is split across at most `max_workers` threads, each reusing one
+    backend connection, and all of them share one rate limiter. Prints timing and failures per batch.
+    Returns (sent, failed) counts.
+    """
+    queue_campaigns()
+    bucket = TokenBucket(rate, max(OUTBOX_SEND_BURST, max_workers))
+    sent = failed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while limit is None or sent + failed < limit:
+            queue_depth = OutboundEmail.objects.filter(status=Status.PENDING, next_attempt_at__lte=timezone.now()).count()
+            batch = claim_outbox_batch(batch_size if limit is None else min(batch_size, limit - sent - failed))
+            if not batch:
+                break
+            started = time.monotonic()
+            chunks = [batch[i::max_workers] for i in range(min(max_workers, len(batch)))]
+            results, rate_wait, provider = [], 0.0, 0.0
+            for chunk_results, chunk_wait, chunk_provider in pool.map(_deliver, chunks, [bucket] * len(chunks)):
+                results.extend(chunk_results)
+                rate_wait += chunk_wait
+                provider += chunk_provider
+            batch_sent, batch_retried, batch_failed = _record_results(results)
+            elapsed = time.monotonic() - started
+            record_send_batch(
+                batch, batch_sent, batch_retried, batch_failed, queue_depth, elapsed, rate_wait, provider,
+                [error for _, error in results if error is not None]
+            )
+            print(
+                f"📨 Outbox batch: {batch_sent} sent, {batch_retried} retrying, {batch_failed} failed "
+                f"in {elapsed:.2f}s ({len(batch) / elapsed if elapsed else 0:.1f} emails/s)"
+            )
+            sent += batch_sent
+            failed += batch_retried + batch_failed
+    return sent, failed
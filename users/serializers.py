@@ -77,11 +77,12 @@ class StudentListSerializer(serializers.ModelSerializer):
         ]
 
     def get_total_hours(self, obj):
-        # 1. Get the sum of all attended events
-        activity_total = obj.activitysignup_set.filter(attended=True).aggregate(sum=Sum('hours_earned'))['sum']
-        
+        # 1. Use the ledger sum annotated by the list view, if present
+        if not hasattr(obj, 'ledger_hours'):
+            return obj.total_hours
+
         # 2. Convert to float (default to 0.0 if None)
-        calculated_hours = float(activity_total or 0.0)
+        calculated_hours = float(obj.ledger_hours or 0.0)
         
         # 3. Add the manual bonus hours from the Admin panel
         bonus_hours = float(obj.manual_bonus_hours or 0.0)
@@ -1,66 +1,22 @@
-import threading
 import time
-from django.core.mail import EmailMultiAlternatives
+
 from django.template.loader import render_to_string
-from django.utils.html import strip_tags
-from django.conf import settings
+from .audience import Audience
 from .models import User
+from .outbox import MERGE_BATCH_SIZE, merged_outbound_emails, outbound_emails, queue_emails, render_merge_template, start_campaign
 
 class BackgroundEmailService:
     @staticmethod
     def _send_async(subject, to_emails, html_content, bcc_emails=None):
         """
-        Internal helper: Handles the actual network request in the background.
-        Automatically chunks large BCC lists to bypass Postmark's 50-recipient limit.
+        Queues the email in the outbox; the `process_outbox` worker delivers it.
+        Large BCC lists are split to stay under Postmark's 50-recipient limit.
         """
-        text_content = strip_tags(html_content)
-        from_email = settings.DEFAULT_FROM_EMAIL
-
-        def send():
-            try:
-                # 1. IF WE HAVE A LARGE LIST OF BCC EMAILS (Announcements, Mass Events)
-                if bcc_emails:
-                    batch_size = 45  # Postmark limit is 50. 45 gives us a safe buffer.
-                    
-                    for i in range(0, len(bcc_emails), batch_size):
-                        batch_bcc = bcc_emails[i:i + batch_size]
-                        
-                        msg = EmailMultiAlternatives(
-                            subject=subject,
-                            body=text_content,
-                            from_email=from_email,
-                            to=to_emails, 
-                            bcc=batch_bcc  # 👈 Pass the small batch here
-                        )
-                        msg.attach_alternative(html_content, "text/html")
-                        msg.send(fail_silently=False)
-                        
-                        # Pause for a fraction of a second to respect API rate limits
-                        time.sleep(0.2) 
-                    
-                    print(f"✅ Successfully sent: '{subject}' to {len(bcc_emails)} recipients in batches.")
-
-                # 2. IF WE HAVE NO BCC EMAILS (Single Welcome Emails, RSVP Confirmations)
-                else:
-                    msg = EmailMultiAlternatives(
-                        subject=subject,
-                        body=text_content,
-                        from_email=from_email,
-                        to=to_emails
-                    )
-                    msg.attach_alternative(html_content, "text/html")
-                    msg.send(fail_silently=False)
-                    print(f"✅ Successfully sent: '{subject}' to {to_emails}")
-
-            except Exception as e:
-                print(f"❌ Background Email Error: {e}")
-
-        # Standard thread (No daemon=True!)
-        thread = threading.Thread(target=send)
-        thread.start()
-
-
-# 👇 Notice how we render the HTML first, THEN send the strings to the background 👇
+        count = queue_emails(outbound_emails(subject, to_emails, html_content, bcc_emails))
+        print(f"📬 Queued: '{subject}' ({count} message(s))")
+
+
+# 👇 Render the HTML in the request, then queue the strings for the outbox worker 👇
 
 def send_welcome_email(user, role_name):
     subject = "Welcome to C-SHAW Hub! 🎉"
@@ -73,7 +29,7 @@ def send_welcome_email(user, role_name):
     }
     html_content = render_to_string('users/welcome_email.html', context)
 
-    # Pass only strings to the background thread
+    # Only strings go into the outbox
     BackgroundEmailService._send_async(
         subject=subject,
         to_emails=[user.email],
@@ -83,32 +39,31 @@ def send_welcome_email(user, role_name):
 def send_new_event_email(activity):
     subject = f"New Event: {activity.title} 📅"
 
-    # 1. Do the Database lookups in the MAIN thread
-    if activity.campus == 'ALL':
-        students = User.objects.filter(role=User.Roles.STUDENT)
-    else:
-        students = User.objects.filter(role=User.Roles.STUDENT, campus=activity.campus)
-    
-    if not students.exists():
+    # 1. Find the recipients (opted-in, active students)
+    audience = Audience(role=User.Roles.STUDENT, campus=activity.campus)
+
+    if not audience.exists():
         print("⚠️ No matching students found for email notification.")
         return 
         
-    for student in students:
-        context = {
-            'first_name': student.first_name,
-            'title': activity.title,
-            'date': activity.date_time.strftime('%d %B %Y at %H:%M'),
-            'location': activity.campus,
-            'description': activity.description,
-            'link': "https://cshaw.co.za/"
-        }
-        html_content = render_to_string('users/new_event_email.html', context)
-
-        BackgroundEmailService._send_async(
-            subject=subject,
-            to_emails=[student.email],
-            html_content=html_content
-        )
+    # 2. Render once; first_name is merged per recipient at send time
+    context = {
+        'title': activity.title,
+        'date': activity.date_time.strftime('%d %B %Y at %H:%M'),
+        'location': activity.campus,
+        'description': activity.description,
+        'link': "https://cshaw.co.za/"
+    }
+    started = time.monotonic()
+    html_content = render_merge_template('users/new_event_email.html', context, ['first_name'])
+    render_seconds = time.monotonic() - started
+    queued = 0
+    for batch in audience.batches('email', 'first_name', batch_size=MERGE_BATCH_SIZE):
+        merge_data = {email: {'first_name': first_name} for _, email, first_name in batch}
+        queue_emails(merged_outbound_emails(subject, html_content, merge_data), source='new-event', render_seconds=render_seconds)
+        queued += len(merge_data)
+        render_seconds = 0.0
+    print(f"📬 Queued '{subject}' for {queued} student(s)")
 
 def send_signup_confirmation_email(user, activity):
     subject = f"You're Going! ✅ {activity.title}"
@@ -128,7 +83,24 @@ def send_signup_confirmation_email(user, activity):
         to_emails=[user.email],
         html_content=html_content
     )
-        
+
+def send_waitlist_promotion_email(activity, users):
+    """Tells students moved off the waitlist that they have a spot, in one merged send."""
+    subject = f"A Spot Opened Up - You're Going! ✅ {activity.title}"
+
+    context = {
+        'title': activity.title,
+        'date': activity.date_time.strftime('%d %B %Y at %H:%M'),
+        'location': activity.campus or f"{activity.campus} Campus",
+        'description': activity.description,
+        'dashboard_link': "https://cshaw.co.za/"
+    }
+    started = time.monotonic()
+    html_content = render_merge_template('users/signup_confirmation.html', context, ['name'])
+    merge_data = {user.email: {'name': user.first_name} for user in users if user.email}
+    queue_emails(merged_outbound_emails(subject, html_content, merge_data), source='waitlist', render_seconds=time.monotonic() - started)
+    print(f"📬 Queued waitlist promotion for {len(merge_data)} student(s): {activity.title}")
+
 def send_series_event_email(activities, original_title):
     if not activities:
         return
@@ -137,14 +109,8 @@ def send_series_event_email(activities, original_title):
     last_event = activities[-1]
     campus = first_event.campus
     
-    # DB Queries in the main thread
-    if campus == 'ALL':
-        recipients = list(User.objects.filter(is_active=True).values_list('email', flat=True))
-    else:
-        recipients = list(User.objects.filter(campus=campus, is_active=True).values_list('email', flat=True))
-
-    if not recipients:
-        return
+    # Recipients are resolved by the outbox worker, a chunk at a time
+    audience = Audience(campus=campus)
 
     context = {
         'title': original_title,
@@ -160,9 +126,8 @@ def send_series_event_email(activities, original_title):
     html_content = render_to_string('users/series_event.html', context)
     subject = f"[C-SHAW] New Multi-Day Event: {original_title}"
 
-    BackgroundEmailService._send_async(
-        subject=subject,
-        to_emails=[settings.DEFAULT_FROM_EMAIL],
-        bcc_emails=recipients,
-        html_content=html_content
-    )
\ No newline at end of file
+    campaign = start_campaign(subject, html_content, audience=audience, created_by=first_event.created_by)
+    if campaign is None:
+        print("⚠️ No matching users found for the series notification.")
+        return
+    print(f"📬 Campaign {campaign.pk} '{subject}' started for {campaign.total_recipients} recipient(s)")
\ No newline at end of file
@@ -1,3 +1,227 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import VolunteerActivity
+from .audience import Audience
+from .metrics import email_metrics_summary
+from .models import EmailCampaign, EmailSendMetric, OutboundEmail, User
+from .outbox import (
+    BCC_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_BASE, OUTBOX_STALE_AFTER, TokenBucket,
+    _messages, _record_results, claim_outbox_batch, merged_outbound_emails, outbound_emails, process_outbox,
+    queue_campaigns, queue_emails, render_merge_template, start_campaign,
+)
+from .services import send_new_event_email
+
+Status = OutboundEmail.Status
+
+
+class OutboxTest(TestCase):
+    def _queue(self, count=1, **fields):
+        emails = [OutboundEmail(subject=f'Email {i}', from_email='hub@example.com', to=[f'to{i}@example.com'], html_body='<p>Hi</p>', **fields) for i in range(count)]
+        queue_emails(emails)
+        return list(OutboundEmail.objects.order_by('id'))
+
+    def test_large_bcc_lists_are_chunked(self):
+        bcc = [f'student{i}@example.com' for i in range(BCC_BATCH_SIZE * 2 + 10)]
+
+        rows = outbound_emails('Notice', ['hub@example.com'], '<p>Hi</p>', bcc_emails=bcc)
+
+        self.assertEqual([len(row.bcc) for row in rows], [BCC_BATCH_SIZE, BCC_BATCH_SIZE, 10])
+        self.assertEqual(sum((row.bcc for row in rows), []), bcc)
+        self.assertEqual(rows[0].text_body, 'Hi')
+
+    def test_claim_takes_due_emails_once(self):
+        due, later = self._queue(2)
+        OutboundEmail.objects.filter(pk=later.pk).update(next_attempt_at=timezone.now() + timedelta(minutes=5))
+
+        claimed = claim_outbox_batch()
+
+        self.assertEqual([e.pk for e in claimed], [due.pk])
+        self.assertEqual((claimed[0].status, claimed[0].attempts), (Status.SENDING, 1))
+        self.assertEqual(claim_outbox_batch(), [])
+
+    def test_stale_sending_rows_are_reclaimed(self):
+        stale, fresh = self._queue(2, status=Status.SENDING)
+        OutboundEmail.objects.filter(pk=stale.pk).update(claimed_at=timezone.now() - OUTBOX_STALE_AFTER - timedelta(minutes=1))
+        OutboundEmail.objects.filter(pk=fresh.pk).update(claimed_at=timezone.now())
+
+        self.assertEqual([e.pk for e in claim_outbox_batch()], [stale.pk])
+
+    def test_failures_back_off_exponentially(self):
+        email = self._queue()[0]
+        for attempt in range(1, OUTBOX_MAX_ATTEMPTS):
+            email = claim_outbox_batch()[0]
+            before = timezone.now()
+
+            self.assertEqual(_record_results([(email, RuntimeError('provider down'))]), (0, 1, 0))
+
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts, email.last_error), (Status.PENDING, attempt, 'provider down'))
+            delay = email.next_attempt_at - before
+            self.assertAlmostEqual(delay.total_seconds(), (OUTBOX_RETRY_BASE * 2 ** (attempt - 1)).total_seconds(), delta=1)
+            OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+
+    def test_gives_up_after_max_attempts(self):
+        email = self._queue()[0]
+        OutboundEmail.objects.filter(pk=email.pk).update(attempts=OUTBOX_MAX_ATTEMPTS - 1)
+        email = claim_outbox_batch()[0]
+
+        self.assertEqual(_record_results([(email, RuntimeError('bounced'))]), (0, 0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (Status.FAILED, OUTBOX_MAX_ATTEMPTS))
+        self.assertEqual(claim_outbox_batch(), [])
+
+    def test_process_outbox_delivers_and_marks_sent(self):
+        self._queue(3)
+
+        self.assertEqual(process_outbox(max_workers=2, rate=1000), (3, 0))
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutboundEmail.objects.exclude(status=Status.SENT).exists())
+
+
+class StartCampaignTest(TestCase):
+    def test_counts_the_audience(self):
+        User.objects.create_user(email='apb@example.com', password='pw', role='STUDENT', campus='APB')
+
+        campaign = start_campaign('Notice', '<p>Hi</p>', audience=Audience(campus='APB'))
+
+        self.assertEqual(campaign.total_recipients, 1)
+        self.assertEqual(campaign.status, EmailCampaign.Status.PENDING)
+
+    def test_no_recipients_saves_nothing(self):
+        self.assertIsNone(start_campaign('Notice', '<p>Hi</p>', audience=Audience(campus='SWC')))
+        self.assertFalse(EmailCampaign.objects.exists())
+
+
+class MergeTemplateTest(TestCase):
+    def test_braces_in_user_text_survive_the_merge(self):
+        html = render_merge_template('users/signup_confirmation.html', {
+            'title': 'Code {{club}}', 'date': 'Friday', 'location': 'APB',
+            'description': 'Bring {{{snacks}}}', 'dashboard_link': 'https://example.com/',
+        }, ['name'])
+        email = merged_outbound_emails('Going: {{club}}', html, {'ann@example.com': {'name': 'Ann'}})[0]
+
+        message = _messages(email, native_merge=False)[0]
+        html_body = message.alternatives[0][0]
+
+        self.assertIn('Ann', html_body)
+        self.assertNotRegex(html_body + message.subject, r'\{\{\s*\w+\s*\}\}')
+        self.assertIn('club', message.subject)
+        self.assertIn('club', html_body)
+        self.assertIn('snacks', html_body)
+
+
+class TokenBucketTest(TestCase):
+    def test_takes_more_than_capacity_in_full(self):
+        clock = [0.0]
+
+        def sleep(seconds):
+            clock[0] += seconds
+
+        with mock.patch('users.outbox.time.monotonic', side_effect=lambda: clock[0]), \
+                mock.patch('users.outbox.time.sleep', side_effect=sleep):
+            bucket = TokenBucket(rate=10, capacity=20)
+            waited = bucket.take(50)
+
+        # 20 from the full bucket, then 30 more at 10 per second
+        self.assertAlmostEqual(waited, 3.0)
+        self.assertAlmostEqual(bucket.tokens, 0.0)
+
+
+class AudienceTest(TestCase):
+    def test_no_campus_matches_null_and_blank(self):
+        for email, campus in [('null@example.com', None), ('blank@example.com', ''), ('apb@example.com', 'APB')]:
+            User.objects.create_user(email=email, password='pw', role='STUDENT', campus=campus)
+
+        emails = set(Audience(campus=Audience.NO_CAMPUS).queryset().values_list('email', flat=True))
+
+        self.assertEqual(emails, {'null@example.com', 'blank@example.com'})
+
+
+class EmailMetricsTest(TestCase):
+    def setUp(self):
+        self.coordinator = User.objects.create_user(email='coord@example.com', password='pw', role='COORDINATOR')
+        self.client = APIClient()
+        self.client.force_authenticate(self.coordinator)
+
+    def _send_all(self):
+        real_send = EmailBackend.send_messages
+
+        def send(backend, messages):
+            if any('bounce' in address for message in messages for address in message.to):
+                raise RuntimeError('mailbox full')
+            return real_send(backend, messages)
+
+        with mock.patch.object(EmailBackend, 'send_messages', autospec=True, side_effect=send):
+            return process_outbox(max_workers=1, rate=1000)
+
+    def test_summary_counts_queued_sent_and_failed(self):
+        emails = [
+            OutboundEmail(subject='Notice', from_email='hub@example.com', to=[to], html_body='<p>Hi</p>')
+            for to in ('ann@example.com', 'ben@example.com', 'bounce@example.com', 'bounce-again@example.com')
+        ]
+        queue_emails(emails, source='notice', render_seconds=0.25)
+        # One of the bounces is on its last attempt
+        OutboundEmail.objects.filter(to=['bounce-again@example.com']).update(attempts=OUTBOX_MAX_ATTEMPTS - 1)
+
+        self.assertEqual(self._send_all(), (2, 2))
+
+        summary = self.client.get('/api/communications/email-metrics/').data
+        self.assertEqual(
+            {k: summary['send'][k] for k in ('batches', 'messages', 'sent', 'retried', 'failed')},
+            {'batches': 1, 'messages': 4, 'sent': 2, 'retried': 1, 'failed': 1},
+        )
+        queued = summary['queued'][0]
+        self.assertEqual((queued['source'], queued['runs'], queued['queued_recipients'], queued['total_render_ms']), ('notice', 1, 4, 250))
+        self.assertEqual((summary['outbox']['retry_scheduled'], summary['outbox']['failed_recently']), (1, 1))
+        self.assertEqual(summary['top_errors'], [{'error': 'mailbox full', 'batches': 1}])
+
+    def test_render_time_is_recorded_once_per_send(self):
+        for i in range(5):
+            User.objects.create_user(email=f'student{i}@example.com', password='pw', role='STUDENT', campus='APB', first_name=f'S{i}')
+        activity = VolunteerActivity.objects.create(
+            title='Beach Cleanup', campus='APB', description='d', details='d',
+            date_time=timezone.now() + timedelta(days=7), duration_hours=2, created_by=self.coordinator,
+        )
+
+        with mock.patch('users.services.MERGE_BATCH_SIZE', 2), mock.patch('users.outbox.MERGE_BATCH_SIZE', 2), \
+                mock.patch('users.services.time') as clock:
+            clock.monotonic.side_effect = [10.0, 10.4]
+            send_new_event_email(activity)
+
+        runs = EmailSendMetric.objects.filter(kind=EmailSendMetric.Kinds.QUEUE, source='new-event').order_by('id')
+        self.assertEqual([(run.recipients, run.render_ms) for run in runs], [(2, 400), (2, 0), (1, 0)])
+        self.assertEqual(email_metrics_summary()['time_ms']['render'], 400)
+
+    def test_metrics_validate_hours_and_need_a_coordinator(self):
+        self.assertEqual(self.client.get('/api/communications/email-metrics/', {'hours': 'soon'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/communications/email-metrics/', {'hours': 0}).status_code, 400)
+        self.assertEqual(self.client.get('/api/communications/email-metrics/', {'hours': 2}).data['hours'], 2)
+
+        student = APIClient()
+        student.force_authenticate(User.objects.create_user(email='student@example.com', password='pw', role='STUDENT'))
+        self.assertEqual(student.get('/api/communications/email-metrics/').status_code, 403)
+
+    def test_campaign_progress(self):
+        campaign = start_campaign('Notice', '<p>Hi</p>', custom_emails=['ann@example.com', 'ben@example.com'])
+        url = f'/api/communications/campaigns/{campaign.pk}/'
+
+        self.assertEqual(self.client.get(url).data['queued_recipients'], 0)
+        queue_campaigns()
+        queued = self.client.get(url).data
+        self._send_all()
+        sent = self.client.get(url).data
+
+        self.assertEqual((queued['total_recipients'], queued['queued_recipients']), (2, 2))
+        self.assertEqual((queued['messages'][Status.PENDING], queued['messages'][Status.SENT]), (1, 0))
+        self.assertEqual((sent['messages'][Status.PENDING], sent['messages'][Status.SENT]), (0, 1))
+        self.assertEqual(self.client.get('/api/communications/campaigns/999999/').status_code, 404)
 
-# Create your tests here.
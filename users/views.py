@@ -21,6 +21,7 @@ from .serializers import (
     UserManageSerializer
 )
 from django.db import transaction
+from django.db.models import Sum
 from .services import BackgroundEmailService, send_welcome_email
 from .models import User, Award
 from .permissions import IsCoordinator
@@ -316,7 +317,10 @@ class StudentListView(generics.ListAPIView):
     permission_classes = [IsCoordinator]
 
     def get_queryset(self):
-        return User.objects.filter(role=User.Roles.STUDENT).order_by('campus', 'first_name')
+        # Pull each student's ledger hours in the same query as the list itself
+        return User.objects.filter(role=User.Roles.STUDENT).annotate(
+            ledger_hours=Sum('hours_ledger__activity_hours')
+        ).prefetch_related('awards').order_by('campus', 'first_name')
     
 
 class UserProfileView(generics.RetrieveUpdateAPIView):
@@ -457,6 +461,9 @@ class UpdateVolunteerStatusView(APIView):
 
         user.volunteer_status = status_value
         user.save()
+        # Newcomers have their own top 5 on the live awards screen
+        from core.utils import bump_cache_version
+        transaction.on_commit(lambda: bump_cache_version('live-awards'))
         return Response({"message": "Status updated successfully."})
         
 class UpdateDemographicsView(views.APIView):